@@ -5,11 +5,9 @@ Lê dados de umidade, temperatura, pH, condutividade elétrica, N, P, K
 Adaptado para Android usando usbserial4a com interface gráfica moderna
 """
 
-import time
-import json
 import os
+import queue
 from datetime import datetime
-from typing import Dict, Optional, List
 from kivy.app import App
 from kivy.uix.label import Label
 from kivy.uix.boxlayout import BoxLayout
@@ -21,36 +19,44 @@ from kivy.uix.progressbar import ProgressBar
 from kivy.clock import Clock
 from kivy.uix.popup import Popup
 from kivy.uix.textinput import TextInput
-from kivy.graphics import Color, RoundedRectangle
+from kivy.graphics import Color, RoundedRectangle, Line
 from kivy.uix.widget import Widget
 from kivy.metrics import dp
 from kivy.utils import get_color_from_hex
 
-# Importações para Android
-try:
-    import usb4a.usb as usb
-    import usbserial4a.serial4a as serial4a
-    ANDROID = True
-except ImportError:
-    import serial
-    import minimalmodbus
-    ANDROID = False
+from sensor_solo import SensorSolo7em1, ANDROID
+from aquisicao import TrabalhadorAquisicao
+from armazenamento import ArmazenamentoJSONL
+from sessao_binaria import EscritorSessaoBinaria
+from historico import HistoricoLimitado
+from catalogo import LoteLeituras
+from telemetria import ExportadorMetricas
+from decimacao import SeriesLeituras
+from polling_adaptativo import REGRAS_PADRAO
+from conexao import CONECTADO, AGUARDANDO_PERMISSAO, GerenciadorConexao
+
+if not ANDROID:
+    import serial.tools.list_ports
 
 class ColoredCard(Widget):
+    # As instruções gráficas são criadas uma vez; pos/size só movem os retângulos
     def __init__(self, color="#2196F3", **kwargs):
         super().__init__(**kwargs)
         self.color = color
-        self.bind(size=self.update_graphics, pos=self.update_graphics)
-        
-    def update_graphics(self, *args):
-        self.canvas.before.clear()
         with self.canvas.before:
-            Color(*get_color_from_hex(self.color), 1)  # Fundo sólido
-            RoundedRectangle(pos=self.pos, size=self.size, radius=[dp(18)])
+            self.bg_color_instr = Color(*get_color_from_hex(self.color), 1)  # Fundo sólido
+            self.bg_rect = RoundedRectangle(pos=self.pos, size=self.size, radius=[dp(18)])
             # Sombra discreta
             Color(0, 0, 0, 0.08)
-            RoundedRectangle(pos=(self.pos[0] + dp(2), self.pos[1] - dp(2)), 
-                           size=self.size, radius=[dp(18)])
+            self.shadow_rect = RoundedRectangle(pos=(self.pos[0] + dp(2), self.pos[1] - dp(2)),
+                                                size=self.size, radius=[dp(18)])
+        self.bind(size=self.update_graphics, pos=self.update_graphics)
+        
+    def update_graphics(self, *args):
+        self.bg_rect.pos = self.pos
+        self.bg_rect.size = self.size
+        self.shadow_rect.pos = (self.pos[0] + dp(2), self.pos[1] - dp(2))
+        self.shadow_rect.size = self.size
 
 class DataCard(BoxLayout):
     def __init__(self, title, value, unit, color="#000000FF", **kwargs):
@@ -96,7 +102,7 @@ class DataCard(BoxLayout):
         # Indicador de status (círculo colorido)
         self.status_indicator = Widget(size_hint=(None, 1), width=dp(14))
         with self.status_indicator.canvas:
-            Color(0, 1, 0, 1)  # Verde para OK
+            self.status_color = Color(0, 1, 0, 1)  # Verde para OK
             self.status_circle = RoundedRectangle(pos=(0, 0), size=(dp(14), dp(14)), radius=[dp(7)])
         self.status_indicator.bind(pos=self._update_status_indicator)
         value_row.add_widget(self.status_indicator)
@@ -129,26 +135,14 @@ class DataCard(BoxLayout):
         self.status_circle.pos = (self.status_indicator.right - dp(17), center_y)
     
     def update_value(self, value, timestamp=None):
+        # Só a cor do indicador muda; o círculo é o mesmo desde a criação do card
         if isinstance(value, (int, float)) and value is not None:
             self.value_label.text = f"{value:.1f}"
-            with self.status_indicator.canvas:
-                self.status_indicator.canvas.clear()
-                Color(0.2, 0.8, 0.2, 1)
-                self.status_circle = RoundedRectangle(
-                    pos=(self.status_indicator.right - dp(17), self.status_indicator.center_y - dp(7)), 
-                    size=(dp(14), dp(14)), 
-                    radius=[dp(7)]
-                )
+            self.status_color.rgba = (0.2, 0.8, 0.2, 1)
         else:
             self.value_label.text = "ERRO"
-            with self.status_indicator.canvas:
-                self.status_indicator.canvas.clear()
-                Color(0.8, 0.2, 0.2, 1)
-                self.status_circle = RoundedRectangle(
-                    pos=(self.status_indicator.right - dp(17), self.status_indicator.center_y - dp(7)), 
-                    size=(dp(14), dp(14)), 
-                    radius=[dp(7)]
-                )
+            self.status_color.rgba = (0.8, 0.2, 0.2, 1)
+        self._update_status_indicator()
         
         if timestamp:
             try:
@@ -174,7 +168,7 @@ class StatusCard(BoxLayout):
         # Fundo preto puro para contraste
         self.bg_color = "#000000"
         with self.canvas.before:
-            Color(*get_color_from_hex(self.bg_color), 1)
+            self.bg_color_instr = Color(*get_color_from_hex(self.bg_color), 1)
             self.bg_rect = RoundedRectangle(pos=self.pos, size=self.size, radius=[dp(18)])
             Color(0, 0, 0, 0.22)
             self.shadow_rect = RoundedRectangle(pos=(self.pos[0] + dp(2), self.pos[1] - dp(2)), size=self.size, radius=[dp(18)])
@@ -195,14 +189,11 @@ class StatusCard(BoxLayout):
         self.add_widget(content)
     
     def update_status(self, text, color="#000000"):
+        # Troca só a cor do fundo existente: o canvas não cresce a cada mudança de status
         self.status_label.text = text
-        self.bg_color = color
-        with self.canvas.before:
-            Color(*get_color_from_hex(self.bg_color), 1)
-            self.bg_rect = RoundedRectangle(pos=self.pos, size=self.size, radius=[dp(18)])
-            Color(0, 0, 0, 0.22)
-            self.shadow_rect = RoundedRectangle(pos=(self.pos[0] + dp(2), self.pos[1] - dp(2)), size=self.size, radius=[dp(18)])
-        self._update_bg()
+        if color != self.bg_color:
+            self.bg_color = color
+            self.bg_color_instr.rgba = get_color_from_hex(self.bg_color)[:3] + [1]
 
     def _update_bg(self, *args):
         self.bg_rect.pos = self.pos
@@ -220,298 +211,154 @@ class ModernButton(Button):
         self.size_hint_y = None
         self.height = dp(55)
         self.padding = [dp(8), 0]
-        self.bind(size=self.update_graphics, pos=self.update_graphics)
-        self.bind(state=self.on_state_change)
         self.bg_color = bg_color
         self.pressed = False
+        # Sombra e fundo criados uma vez; pressionar só troca as cores
+        with self.canvas.before:
+            self.shadow_color = Color(0, 0, 0, 0.18)
+            self.shadow_rect = RoundedRectangle(
+                pos=(self.pos[0] + dp(2), self.pos[1] - dp(3)),
+                size=self.size,
+                radius=[dp(28)]
+            )
+            self.bg_color_instr = Color(*get_color_from_hex(self.bg_color))
+            self.bg_rect = RoundedRectangle(pos=self.pos, size=self.size, radius=[dp(28)])
+        self.bind(size=self.update_graphics, pos=self.update_graphics)
+        self.bind(state=self.on_state_change)
         
     def update_graphics(self, *args):
-        self.canvas.before.clear()
-        with self.canvas.before:
-            if not self.pressed:
-                Color(0, 0, 0, 0.18)
-                RoundedRectangle(
-                    pos=(self.pos[0] + dp(2), self.pos[1] - dp(3)), 
-                    size=self.size, 
-                    radius=[dp(28)]
-                )
-            
-            color = get_color_from_hex(self.bg_color)
-            if self.pressed:
-                Color(color[0] * 0.8, color[1] * 0.8, color[2] * 0.8, 1)
-            else:
-                Color(*color)
-            RoundedRectangle(pos=self.pos, size=self.size, radius=[dp(28)])
+        self.shadow_rect.pos = (self.pos[0] + dp(2), self.pos[1] - dp(3))
+        self.shadow_rect.size = self.size
+        self.bg_rect.pos = self.pos
+        self.bg_rect.size = self.size
     
     def on_state_change(self, *args):
         self.pressed = self.state == 'down'
-        self.update_graphics()
-
-class SensorSolo7em1:
-    def __init__(self, porta_com: str = None, endereco_slave: int = 1, baudrate: int = 4800):
-        self.porta_com = porta_com
-        self.endereco_slave = endereco_slave
-        self.baudrate = baudrate
-        self.instrumento = None
-        self.serial_port = None
-        self.dados = {}
-
-        self.registradores = {
-            'umidade': 0x0015,
-            'temperatura': 0x0001,
-            'ph': 0x0024,
-            'condutividade': 0x0064,
-            'nitrogenio': 0x0012,
-            'fosforo': 0x0013,
-            'potassio': 0x0014
-        }
-
-        self.registradores_alternativos = {
-            'nitrogenio': [0x0004, 0x0012, 0x0025, 0x0030],
-            'fosforo': [0x0005, 0x0013, 0x0026, 0x0031],
-            'potassio': [0x0006, 0x0014, 0x0027, 0x0032]
-        }
-
-        self.conectar()
-
-    def conectar(self):
-        try:
-            if ANDROID:
-                usb_manager = usb.get_usb_manager()
-                usb_device_list = usb.get_usb_device_list()
-                
-                if not usb_device_list:
-                    print("Nenhum dispositivo USB encontrado")
-                    return
-                
-                device = None
-                for d in usb_device_list:
-                    if d.getVendorId() == 6790 and d.getProductId() == 29987:
-                        device = d
-                        break
-                
-                if not device:
-                    print("Dispositivo alvo (Vendor ID=6790, Product ID=29987) não encontrado")
-                    return
-                
-                if not usb.has_usb_permission(device):
-                    print("Solicitando permissão para acessar o dispositivo USB...")
-                    usb.request_usb_permission(device)
-                    timeout = 30
-                    interval = 1
-                    elapsed = 0
-                    while not usb.has_usb_permission(device) and elapsed < timeout:
-                        time.sleep(interval)
-                        elapsed += interval
-                    
-                    if not usb.has_usb_permission(device):
-                        print("Permissão USB não concedida. Reinicie o aplicativo.")
-                        return
-                
-                print("Permissão USB concedida.")
-                
-                self.serial_port = serial4a.get_serial_port(
-                    device.getDeviceName(),
-                    self.baudrate,
-                    8,
-                    'N',
-                    1,
-                    timeout=2.0
-                )
-                self.serial_port.DEFAULT_READ_BUFFER_SIZE = 16 * 1024
-                self.serial_port.USB_READ_TIMEOUT_MILLIS = 100
-                
-                if not self.serial_port.is_open:
-                    self.serial_port.open()
-                
-                print(f"Conectado ao sensor via USB no Android em {device.getDeviceName()}")
-            else:
-                self.instrumento = minimalmodbus.Instrument(self.porta_com, self.endereco_slave)
-                self.instrumento.serial.baudrate = self.baudrate
-                self.instrumento.serial.bytesize = 8
-                self.instrumento.serial.parity = serial.PARITY_NONE
-                self.instrumento.serial.stopbits = 1
-                self.instrumento.serial.timeout = 2.0
-                self.instrumento.mode = minimalmodbus.MODE_RTU
-                self.instrumento.clear_buffers_before_each_transaction = True
-                print(f"Conectado ao sensor na porta {self.porta_com}")
-
-        except Exception as e:
-            print(f"Erro ao conectar: {e}")
-            raise
-
-    def _calcular_crc16(self, data):
-        crc = 0xFFFF
-        for byte in data:
-            crc ^= byte
-            for _ in range(8):
-                if crc & 0x0001:
-                    crc = (crc >> 1) ^ 0xA001
-                else:
-                    crc >>= 1
-        return crc.to_bytes(2, byteorder='little')
-
-    def _criar_comando_modbus(self, slave_addr, function_code, register_addr, register_count=1):
-        cmd = bytearray([
-            slave_addr,
-            function_code,
-            register_addr >> 8,
-            register_addr & 0xFF,
-            register_count >> 8,
-            register_count & 0xFF,
-        ])
-        crc = self._calcular_crc16(cmd)
-        cmd.extend(crc)
-        return cmd
-
-    def ler_registrador(self, endereco: int, fator_escala: float = 0.1, tentativas: int = 3) -> Optional[float]:
-        for i in range(tentativas):
-            try:
-                if ANDROID:
-                    self.serial_port.reset_input_buffer()
-                    self.serial_port.reset_output_buffer()
-                    time.sleep(0.2)
-                    cmd = self._criar_comando_modbus(self.endereco_slave, 3, endereco)
-                    self.serial_port.write(cmd)
-                    time.sleep(0.1)
-                    resposta = self.serial_port.read(7)
-                    if len(resposta) >= 7 and resposta[0] == self.endereco_slave and resposta[1] == 3:
-                        valor_bruto = (resposta[3] << 8) | resposta[4]
-                        return valor_bruto * fator_escala
-                    raise Exception(f"Resposta inválida: {resposta.hex() if resposta else 'vazia'}")
-                else:
-                    self.instrumento.serial.reset_input_buffer()
-                    self.instrumento.serial.reset_output_buffer()
-                    time.sleep(0.2)
-                    valor_bruto = self.instrumento.read_register(endereco, 0)
-                    return valor_bruto * fator_escala
-            except Exception as e:
-                if i == tentativas - 1:
-                    print(f"Erro ao ler registrador {endereco}: {e}")
-                    return None
-                time.sleep(0.5)
-        return None
-
-    def ler_npk_alternativo(self, nutriente: str) -> Optional[float]:
-        if nutriente not in self.registradores_alternativos:
-            return None
-        fatores = [0.1, 1.0, 10.0]
-        for reg in self.registradores_alternativos[nutriente]:
-            for fator in fatores:
-                valor = self.ler_registrador(reg, fator)
-                if valor is not None and valor > 0:
-                    print(f"Encontrado {nutriente} no registrador 0x{reg:04X} com fator {fator}: {valor}")
-                    return valor
-        return 0.0
-
-    def ler_todos_dados(self) -> Dict[str, float]:
-        dados = {}
-        fatores_escala = {
-            'umidade': 0.1,
-            'temperatura': 0.1,
-            'ph': 0.1,
-            'condutividade': 1.0,
-            'nitrogenio': 1.0,
-            'fosforo': 1.0,
-            'potassio': 1.0
-        }
-
-        for parametro in ['umidade', 'temperatura', 'ph', 'condutividade']:
-            endereco = self.registradores[parametro]
-            fator = fatores_escala.get(parametro, 1.0)
-            valor = self.ler_registrador(endereco, fator)
-            dados[parametro] = valor
-            time.sleep(0.3)
-
-        for nutriente in ['nitrogenio', 'fosforo', 'potassio']:
-            endereco = self.registradores[nutriente]
-            fator = fatores_escala.get(nutriente, 1.0)
-            valor = self.ler_registrador(endereco, fator)
-            if valor is None or valor == 0:
-                valor = self.ler_npk_alternativo(nutriente)
-            dados[nutriente] = valor
-            time.sleep(0.3)
-
-        dados['timestamp'] = datetime.now().isoformat()
-        return dados
-
-    def salvar_dados(self, dados: Dict[str, float], arquivo_base: str = "dados_sensor_solo"):
-        try:
-            contagem = 1
-            arquivo = f"{arquivo_base}_{contagem}.json"
-            while os.path.exists(arquivo):
-                contagem += 1
-                arquivo = f"{arquivo_base}_{contagem}.json"
-            with open(arquivo, 'w', encoding='utf-8') as f:
-                json.dump(dados, f, indent=2, ensure_ascii=False)
-            print(f"Dados salvos em {arquivo}")
-            return arquivo
-        except Exception as e:
-            print(f"Erro ao salvar dados: {e}")
-            return None
-
-    def salvar_dados_continuo(self, dados: Dict[str, float], arquivo_base: str = "dados_sensor_solo_continuo"):
-        try:
-            contagem = 1
-            arquivo = f"{arquivo_base}_{contagem}.json"
-            while os.path.exists(arquivo):
-                contagem += 1
-                arquivo = f"{arquivo_base}_{contagem}.json"
-            with open(arquivo, 'w', encoding='utf-8') as f:
-                json.dump(dados, f, indent=2, ensure_ascii=False)
-            print(f"Dados salvos em {arquivo}")
-            return arquivo
-        except Exception as e:
-            print(f"Erro ao salvar dados contínuos: {e}")
-            return None
-
-    def salvar_media(self, leituras: List[Dict], media: Dict, arquivo_base: str = "dados_sensor_solo"):
-        try:
-            contagem = 1
-            arquivo = f"{arquivo_base}_{contagem}.json"
-            while os.path.exists(arquivo):
-                contagem += 1
-                arquivo = f"{arquivo_base}_media_{contagem}.json"
-            media_completa = {'media': media, 'leituras': leituras, 'timestamp': media['timestamp']}
-            with open(arquivo, 'w', encoding='utf-8') as f:
-                json.dump(media_completa, f, indent=2, ensure_ascii=False)
-            print(f"Média salva em {arquivo}")
-            return arquivo
-        except Exception as e:
-            print(f"Erro ao salvar média: {e}")
-            return None
+        color = get_color_from_hex(self.bg_color)
+        if self.pressed:
+            self.shadow_color.a = 0
+            self.bg_color_instr.rgba = (color[0] * 0.8, color[1] * 0.8, color[2] * 0.8, 1)
+        else:
+            self.shadow_color.a = 0.18
+            self.bg_color_instr.rgba = color
 
-    def desconectar(self):
-        try:
-            if ANDROID and self.serial_port and self.serial_port.is_open:
-                self.serial_port.close()
-            elif self.instrumento and self.instrumento.serial.is_open:
-                self.instrumento.serial.close()
-            print("Conexão fechada")
-        except Exception as e:
-            print(f"Erro ao fechar conexão: {e}")
+class GraficoTendencia(Widget):
+    # Linha única reaproveitada: cada redesenho troca só a lista de pontos, já
+    # reduzida à largura do widget (no máximo um ponto por pixel)
+    def __init__(self, color="#2196F3", **kwargs):
+        super().__init__(**kwargs)
+        self.serie = None
+        with self.canvas:
+            Color(0, 0, 0, 0.06)
+            self.fundo = RoundedRectangle(pos=self.pos, size=self.size, radius=[dp(8)])
+            Color(*get_color_from_hex(color))
+            self.linha = Line(points=[], width=dp(1.2))
+        self._redesenhar = Clock.create_trigger(self.redesenhar)
+        self.bind(pos=self._redesenhar, size=self._redesenhar)
+
+    def definir_serie(self, serie):
+        # Vários pedidos no mesmo quadro viram um só redesenho
+        self.serie = serie
+        self._redesenhar()
+
+    def redesenhar(self, *args):
+        self.fundo.pos = self.pos
+        self.fundo.size = self.size
+        if self.serie is None or len(self.serie) < 2 or self.width < 2:
+            self.linha.points = []
+            return
+        pontos = self.serie.decimar(max(int(self.width), 3))
+        margem = dp(4)
+        largura = self.width - 2 * margem
+        altura = self.height - 2 * margem
+        x0, x1 = self.serie.inicio, self.serie.fim
+        y0, y1 = self.serie.minimo, self.serie.maximo
+        escala_x = largura / (x1 - x0) if x1 > x0 else 0
+        escala_y = altura / (y1 - y0) if y1 > y0 else 0
+        base_x = self.x + margem
+        base_y = self.y + margem + (0 if escala_y else altura / 2)
+        coordenadas = []
+        for x, y in pontos:
+            coordenadas.append(base_x + (x - x0) * escala_x)
+            coordenadas.append(base_y + (y - y0) * escala_y)
+        self.linha.points = coordenadas
 
 class SensorApp(App):
     sensor_porta_com = None
     modo = None
     arquivo_continuo_atual = None
+    sessao_continua_id = None
+    lote_catalogo = None
+    armazenamento_continuo = None
+    # 'jsonl' (texto, uma leitura por linha) ou 'binario' (.tsb, 36 bytes por leitura)
+    formato_sessao = 'jsonl'
+    # Leituras mantidas em memória; as mais antigas são lidas do disco quando necessário
+    capacidade_historico = 1000
     leituras_continuas = None
+    # Modo Média: no máximo amostras_media leituras; com tolerancia_media (ex.: 0.02 = 2%)
+    # a coleta para assim que o intervalo de confiança de 95% de todos os parâmetros fica abaixo dela
+    amostras_media = 10
+    intervalo_media = 10.0
+    tolerancia_media = None
+    rejeitar_outliers = False
+    # Métricas do barramento em formato Prometheus, regravadas a cada periodo_metricas (None desliga)
+    arquivo_metricas = "metricas_sensor.prom"
+    periodo_metricas = 15.0
+    # Modo Contínuo: cada parâmetro no seu período (polling_adaptativo.REGRAS_PADRAO), com no
+    # máximo orcamento_barramento transações por minuto (None = sem limite). False volta aos 10 s fixos
+    polling_adaptativo = True
+    orcamento_barramento = None
+    # Baudrate e endereço vêm do perfil do dispositivo ou de uma varredura na conexão;
+    # promover_baud grava na sonda a maior velocidade suportada (9600 bps)
+    autobaud = True
+    promover_baud = False
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        # A conexão abre (e reabre depois de uma queda) em segundo plano: a interface não espera
         if not ANDROID:
-            self.sensor = SensorSolo7em1(porta_com=self.sensor_porta_com)
+            self.sensor = SensorSolo7em1(porta_com=self.sensor_porta_com, conectar_agora=False,
+                                         autobaud=self.autobaud, promover_baud=self.promover_baud)
         else:
-            self.sensor = SensorSolo7em1()
-        self.leituras = []
+            self.sensor = SensorSolo7em1(conectar_agora=False, autobaud=self.autobaud,
+                                         promover_baud=self.promover_baud)
+        self.conexao = GerenciadorConexao(self.sensor, ao_mudar=self._ao_mudar_conexao)
+        self.conexao.start()
+        self.leituras = HistoricoLimitado(self.capacidade_historico)
+        # Todo acesso ao sensor acontece na thread de aquisição
+        self.trabalhador = TrabalhadorAquisicao(self.sensor)
+        self.trabalhador.start()
+        self.geracao_atual = None
+        self.exportador_metricas = None
+        if self.arquivo_metricas:
+            self.exportador_metricas = ExportadorMetricas(self.sensor.telemetria, self.arquivo_metricas,
+                                                          self.periodo_metricas)
+            self.exportador_metricas.start()
+        self._evento_diagnostico = None
         self.file_input = TextInput(
             text="dados_sensor_solo", 
             multiline=False,
             font_size=dp(14),
             size_hint=(1, 0.8)
         )
+        self.amostras_input = TextInput(
+            text=str(self.amostras_media),
+            multiline=False,
+            input_filter='int',
+            font_size=dp(14)
+        )
+        self.intervalo_input = TextInput(
+            text=str(self.intervalo_media),
+            multiline=False,
+            input_filter='float',
+            font_size=dp(14)
+        )
         self.current_mode = None
         self.data_cards = {}
+        # Tendências da sessão contínua: memória fixa por parâmetro, qualquer duração
+        self.series = SeriesLeituras()
+        self.graficos = {}
+        self.rotulos_graficos = {}
 
     def build(self):
         # Layout principal com gradiente de fundo
@@ -605,13 +452,21 @@ class SensorApp(App):
         btn_arquivo = ModernButton(text="📁 Configurações", bg_color="#9C27B0")
         btn_arquivo.bind(on_press=self.show_file_popup)
         config_layout.add_widget(btn_arquivo)
+        btn_tendencias = ModernButton(text="📉", bg_color="#00796B")
+        btn_tendencias.bind(on_press=self.show_tendencias_popup)
+        btn_tendencias.size_hint_x = 0.2
+        config_layout.add_widget(btn_tendencias)
+        btn_diagnostico = ModernButton(text="🩺", bg_color="#455A64")
+        btn_diagnostico.bind(on_press=self.show_diagnostico_popup)
+        btn_diagnostico.size_hint_x = 0.2
+        config_layout.add_widget(btn_diagnostico)
         btn_info = ModernButton(text="ℹ️ Info", bg_color="#607D8B")
         btn_info.bind(on_press=self.show_info_popup)
         btn_info.size_hint_x = 0.3
         config_layout.add_widget(btn_info)
         main_layout.add_widget(config_layout)
         self.create_popups()
-        Clock.schedule_interval(self.update, 10.0)
+        Clock.schedule_interval(self.processar_resultados, 1 / 30)
         return main_layout
     
     def _update_bg(self, *args):
@@ -651,11 +506,18 @@ class SensorApp(App):
         ))
     
         file_content.add_widget(self.file_input)
+
+        media_layout = BoxLayout(orientation='horizontal', spacing=dp(10), size_hint_y=None, height=dp(40))
+        media_layout.add_widget(Label(text="Amostras (média):", font_size=dp(13)))
+        media_layout.add_widget(self.amostras_input)
+        media_layout.add_widget(Label(text="Intervalo (s):", font_size=dp(13)))
+        media_layout.add_widget(self.intervalo_input)
+        file_content.add_widget(media_layout)
     
         file_buttons = BoxLayout(orientation='horizontal', spacing=dp(10), size_hint_y=None, height=dp(50))
     
         btn_ok = ModernButton(text="OK", bg_color="#4CAF50")
-        btn_ok.bind(on_press=lambda x: self.file_popup.dismiss())
+        btn_ok.bind(on_press=self.aplicar_configuracoes)
     
         btn_cancel = ModernButton(text="Cancelar", bg_color="#F44336")
         btn_cancel.bind(on_press=lambda x: self.file_popup.dismiss())
@@ -667,14 +529,21 @@ class SensorApp(App):
         self.file_popup = Popup(
             title="Configurações de Arquivo",
             content=file_content,
-            size_hint=(0.8, 0.4),
+            size_hint=(0.8, 0.5),
             auto_dismiss=True
         )
     
         # Popup de informações
         info_content = BoxLayout(orientation='vertical', spacing=dp(15), padding=dp(20))
     
-        info_text = """
+        if self.polling_adaptativo:
+            umidade, npk = REGRAS_PADRAO['umidade'], REGRAS_PADRAO['nitrogenio']
+            continuo = (f"📊 Contínuo: cada parâmetro no seu ritmo (umidade a cada "
+                        f"{umidade.periodo_minimo:.0f}-{umidade.periodo_maximo:.0f}s, "
+                        f"NPK até {npk.periodo_maximo / 60:.0f} min)")
+        else:
+            continuo = "📊 Contínuo: Leituras automáticas a cada 10s"
+        info_text = f"""
         📊 Sensor de Solo 7 em 1
 
         Este aplicativo permite monitorar:
@@ -687,9 +556,9 @@ class SensorApp(App):
         - Potássio (mg/kg)
 
         Modos de operação:
-        📊 Contínuo: Leituras automáticas a cada 10s
+        {continuo}
         📸 Única: Uma leitura pontual
-        📈 Média: Média de 10 leituras
+        📈 Média: Média de até 10 leituras
 
         Desenvolvido para sensores Modbus RTU
         """
@@ -715,78 +584,271 @@ class SensorApp(App):
             auto_dismiss=True
         )
 
+        # Popup de diagnóstico do barramento
+        diagnostico_content = BoxLayout(orientation='vertical', spacing=dp(10), padding=dp(15))
+        self.diagnostico_label = Label(
+            text="",
+            halign='left',
+            valign='top',
+            font_size=dp(12),
+            markup=True
+        )
+        self.diagnostico_label.bind(size=self.diagnostico_label.setter('text_size'))
+        diagnostico_content.add_widget(self.diagnostico_label)
+        btn_fechar_diagnostico = ModernButton(text="Fechar", bg_color="#607D8B")
+        btn_fechar_diagnostico.bind(on_press=lambda x: self.diagnostico_popup.dismiss())
+        diagnostico_content.add_widget(btn_fechar_diagnostico)
+        self.diagnostico_popup = Popup(
+            title="Diagnóstico do Barramento",
+            content=diagnostico_content,
+            size_hint=(0.95, 0.8),
+            auto_dismiss=True
+        )
+        self.diagnostico_popup.bind(on_dismiss=self._parar_diagnostico)
+
+        # Popup de tendências: um gráfico por parâmetro da sessão contínua
+        tendencias_grid = GridLayout(cols=1, spacing=dp(6), size_hint_y=None, padding=dp(6))
+        tendencias_grid.bind(minimum_height=tendencias_grid.setter('height'))
+        cores = {'umidade': "#2196F3", 'temperatura': "#FF5722", 'ph': "#9C27B0", 'condutividade': "#607D8B",
+                 'nitrogenio': "#4CAF50", 'fosforo': "#FF9800", 'potassio': "#795548"}
+        for param, cor in cores.items():
+            rotulo = Label(text=param, size_hint_y=None, height=dp(22), font_size=dp(12),
+                           halign='left', valign='middle')
+            rotulo.bind(size=rotulo.setter('text_size'))
+            grafico = GraficoTendencia(cor, size_hint_y=None, height=dp(90))
+            grafico.definir_serie(self.series[param])
+            self.rotulos_graficos[param] = rotulo
+            self.graficos[param] = grafico
+            tendencias_grid.add_widget(rotulo)
+            tendencias_grid.add_widget(grafico)
+        tendencias_scroll = ScrollView()
+        tendencias_scroll.add_widget(tendencias_grid)
+        tendencias_content = BoxLayout(orientation='vertical', spacing=dp(10), padding=dp(10))
+        tendencias_content.add_widget(tendencias_scroll)
+        btn_fechar_tendencias = ModernButton(text="Fechar", bg_color="#607D8B")
+        btn_fechar_tendencias.bind(on_press=lambda x: self.tendencias_popup.dismiss())
+        tendencias_content.add_widget(btn_fechar_tendencias)
+        self.tendencias_popup = Popup(
+            title="Tendências da Sessão",
+            content=tendencias_content,
+            size_hint=(0.95, 0.9),
+            auto_dismiss=True
+        )
+
     def show_file_popup(self, instance):
         self.file_popup.open()
+
+    def aplicar_configuracoes(self, instance):
+        try:
+            self.amostras_media = max(int(self.amostras_input.text), 1)
+            self.intervalo_media = max(float(self.intervalo_input.text), 0.0)
+        except ValueError:
+            pass
+        self.amostras_input.text = str(self.amostras_media)
+        self.intervalo_input.text = str(self.intervalo_media)
+        self.file_popup.dismiss()
     
     def show_info_popup(self, instance):
         self.info_popup.open()
+
+    def show_tendencias_popup(self, instance):
+        self.atualizar_graficos()
+        self.tendencias_popup.open()
+
+    def atualizar_graficos(self):
+        for param, grafico in self.graficos.items():
+            serie = self.series[param]
+            if len(serie):
+                self.rotulos_graficos[param].text = (f"{param}: {serie.minimo:.1f} – {serie.maximo:.1f} "
+                                                     f"({len(serie)} leituras)")
+            else:
+                self.rotulos_graficos[param].text = f"{param}: sem leituras"
+            grafico.definir_serie(serie)
+
+    def show_diagnostico_popup(self, instance):
+        self.atualizar_diagnostico(0)
+        self._evento_diagnostico = Clock.schedule_interval(self.atualizar_diagnostico, 1.0)
+        self.diagnostico_popup.open()
+
+    def _parar_diagnostico(self, *args):
+        if self._evento_diagnostico is not None:
+            self._evento_diagnostico.cancel()
+            self._evento_diagnostico = None
+
+    def atualizar_diagnostico(self, dt):
+        instantaneo = self.sensor.telemetria.instantaneo()
+        linhas = []
+        for escravo, m in instantaneo['escravos'].items():
+            latencia = m['latencia']
+            media = f"{latencia['media'] * 1000:.0f} ms" if latencia['media'] is not None else "--"
+            linhas.append(f"[b]Escravo {escravo}[/b]: {m['requisicoes']} req, {m['novas_tentativas']} novas tentativas, "
+                          f"{m['timeouts']} timeouts, {m['respostas_invalidas']} inválidas, "
+                          f"{m['excecoes']} exceções, {m['falhas']} falhas")
+            linhas.append(f"   latência média {media}, {m['espera_novas_tentativas_s']:.1f}s em esperas")
+        for nome, m in instantaneo['registradores'].items():
+            erros = m['requisicoes'] - m['sucessos']
+            if erros:
+                linhas.append(f"   {nome}: {erros} erros em {m['requisicoes']} ({m['ultimo_erro'] or ''})"[:90])
+        disjuntores = self.sensor.estado_disjuntores()
+        escravo = disjuntores['escravo']
+        linhas.append(f"[b]Disjuntor do escravo[/b]: {escravo['estado']}, {escravo['rejeitadas']} leituras evitadas"
+                      + (f", teste em {escravo['proxima_tentativa_s']:.0f}s" if escravo['proxima_tentativa_s'] is not None else ""))
+        for nome, d in disjuntores['registradores'].items():
+            linhas.append(f"   {nome}: {d['estado']}, {d['rejeitadas']} leituras evitadas")
+        self.diagnostico_label.text = '\n'.join(linhas) or "Nenhuma transação ainda"
     
     def close_info_popup(self, instance):
         self.info_popup.dismiss()
 
     def set_modo(self, modo):
+        # Interrompe o comando em andamento antes de iniciar o novo modo
+        self.trabalhador.cancelar()
         self.modo = modo
         self.current_mode = modo
+        self.fechar_sessao_continua()
         if modo != 'continuo':
             self.arquivo_continuo_atual = None
             self.leituras_continuas = None
         if modo == 'continuo':
-            self.status_card.update_status("🔄 Modo Contínuo - Lendo a cada 10s", "#11151A")
+            if self.polling_adaptativo:
+                self.status_card.update_status("🔄 Modo Contínuo - Leitura adaptativa", "#11151A")
+            else:
+                self.status_card.update_status("🔄 Modo Contínuo - Lendo a cada 10s", "#11151A")
             self.progress_layout.height = 0
-            # Criar novo arquivo para a sessão
-            arquivo_base = self.file_input.text if self.file_input.text else "dados_sensor_solo_continuo"
-            contagem = 1
-            arquivo = f"{arquivo_base}_{contagem}.json"
-            while os.path.exists(arquivo):
-                contagem += 1
-                arquivo = f"{arquivo_base}_{contagem}.json"
+            # Criar novo arquivo para a sessão; o catálogo entrega o próximo nome livre
+            arquivo_base = f"{self.file_input.text or 'dados_sensor_solo'}_continuo"
+            extensao = '.tsb' if self.formato_sessao == 'binario' else '.jsonl'
+            self.sessao_continua_id, arquivo = self.sensor.catalogo.alocar_arquivo(
+                arquivo_base, extensao, 'continuo', self.sensor.endereco_slave)
+            # O catálogo é atualizado em lotes: um commit do SQLite por leitura travaria a interface
+            self.lote_catalogo = LoteLeituras(self.sensor.catalogo, self.sessao_continua_id)
+            if self.formato_sessao == 'binario':
+                self.armazenamento_continuo = EscritorSessaoBinaria(arquivo)
+            else:
+                self.armazenamento_continuo = ArmazenamentoJSONL(arquivo)
             self.arquivo_continuo_atual = arquivo
-            self.leituras_continuas = []
+            self.series = SeriesLeituras()
+            self.leituras_continuas = HistoricoLimitado(self.capacidade_historico, self.armazenamento_continuo,
+                                                        gravar_ao_adicionar=True)
+            self.geracao_atual = self.trabalhador.enviar('continuo', intervalo=10.0,
+                                                         adaptativo=self.polling_adaptativo,
+                                                         orcamento=self.orcamento_barramento)
         elif modo == 'unica':
             self.status_card.update_status("📸 Realizando leitura única...", "#1565C0")
             self.progress_layout.height = 0
-            self.leitura_unica()
+            self.geracao_atual = self.trabalhador.enviar('unica')
         elif modo == 'media':
-            self.status_card.update_status("📈 Modo Média - Coletando 10 amostras", "#FF9800")
+            self.status_card.update_status(f"📈 Modo Média - Coletando até {self.amostras_media} amostras", "#FF9800")
             self.progress_layout.height = dp(60)
-            self.leituras = []
+            self.leituras.fechar()
+            self.leituras = HistoricoLimitado(self.capacidade_historico)
             self.progress_bar.value = 0
-            Clock.schedule_once(self.iniciar_modo_media, 0)
-
-    def iniciar_modo_media(self, dt):
-        Clock.schedule_once(self.modo_media, 0)
-
-    def update(self, dt):
-        if self.modo == 'continuo':
+            self.geracao_atual = self.trabalhador.enviar('media', amostras=self.amostras_media,
+                                                         intervalo=self.intervalo_media,
+                                                         tolerancia=self.tolerancia_media,
+                                                         rejeitar_outliers=self.rejeitar_outliers)
+
+    def processar_resultados(self, dt):
+        # Esvazia a fila de resultados da thread de aquisição sem bloquear a interface
+        while True:
             try:
-                dados = self.sensor.ler_todos_dados()
-                self.update_data_cards(dados)
-                # Acumular leituras na sessão
-                if self.leituras_continuas is not None:
-                    self.leituras_continuas.append(dados)
-                    # Salvar todas as leituras da sessão no arquivo
-                    with open(self.arquivo_continuo_atual, 'w', encoding='utf-8') as f:
-                        json.dump({'leituras': self.leituras_continuas}, f, indent=2, ensure_ascii=False)
-                    timestamp = dados.get('timestamp', 'N/A').split('T')[1][:8] if 'T' in dados.get('timestamp', '') else 'N/A'
+                geracao, tipo, modo, conteudo = self.trabalhador.resultados.get_nowait()
+            except queue.Empty:
+                return
+            if geracao != self.geracao_atual:
+                continue
+            if tipo == 'erro':
+                self.status_card.update_status(f"❌ Erro: {conteudo[:50]}...", "#B71C1C")
+                if modo != 'continuo':
+                    self.current_mode = None
+            elif modo == 'continuo' and tipo == 'leitura':
+                self.update(conteudo)
+            elif modo == 'unica' and tipo == 'leitura':
+                self.leitura_unica(conteudo)
+            elif modo == 'media' and tipo == 'leitura':
+                self.modo_media(conteudo)
+            elif modo == 'media' and tipo == 'progresso':
+                self.progresso_media(*conteudo)
+            elif modo == 'media' and tipo == 'concluido':
+                self.calcular_media(conteudo)
+
+    def update(self, dados):
+        try:
+            self.update_data_cards(dados)
+            # Acumular leituras na sessão
+            if self.leituras_continuas is not None:
+                # Só a leitura nova é acrescentada ao arquivo da sessão; a memória guarda as últimas
+                self.leituras_continuas.adicionar(dados)
+                self.series.adicionar(dados)
+                if self.tendencias_popup.parent is not None:
+                    self.atualizar_graficos()
+                self.lote_catalogo.adicionar(dados.get('timestamp'))
+                timestamp = dados.get('timestamp', 'N/A').split('T')[1][:8] if 'T' in dados.get('timestamp', '') else 'N/A'
+                aviso = self.aviso_disjuntores()
+                if aviso:
+                    self.status_card.update_status(f"{aviso} ({timestamp})", "#E65100")
+                elif 'frescos' in dados:
+                    # Período atual da umidade, o parâmetro mais rápido da leitura adaptativa
+                    amostragem = self.trabalhador.amostragem
+                    ritmo = f"; umidade a cada {amostragem.periodos()['umidade']:.0f}s" if amostragem else ""
+                    self.status_card.update_status(
+                        f"✅ Última leitura: {timestamp} "
+                        f"({len(dados['frescos'])}/{len(self.data_cards)} atualizados{ritmo})",
+                        "#000000")
+                else:
                     self.status_card.update_status(f"✅ Última leitura: {timestamp}", "#000000")
-            except Exception as e:
-                self.status_card.update_status(f"❌ Erro: {str(e)[:50]}...", "#B71C1C")
-        elif self.modo is None:
-            # Não faz nada até o modo ser escolhido
-            pass
+        except Exception as e:
+            self.status_card.update_status(f"❌ Erro: {str(e)[:50]}...", "#B71C1C")
+
+    def _ao_mudar_conexao(self, estado, detalhe):
+        # Chamado na thread da conexão: a interface só é tocada no loop do Kivy
+        Clock.schedule_once(lambda dt: self.mostrar_conexao(estado, detalhe))
+
+    def mostrar_conexao(self, estado, detalhe):
+        if estado == CONECTADO:
+            if self.conexao.conexoes > 1:
+                # Só numa reconexão: na primeira conexão não há leitura atrasada a recuperar
+                self.trabalhador.retomar()
+                self.status_card.update_status("🔌 Sensor reconectado", "#2E7D32")
+        elif estado == AGUARDANDO_PERMISSAO:
+            self.status_card.update_status("🔑 Autorize o acesso ao adaptador USB", "#E65100")
+        else:
+            self.status_card.update_status("🔌 Sensor desconectado, procurando...", "#E65100")
+
+    def aviso_disjuntores(self):
+        # Disjuntor aberto: a leitura voltou vazia na hora, sem esperar as tentativas
+        estado = self.sensor.estado_disjuntores()
+        escravo = estado['escravo']
+        if escravo['estado'] == 'aberto':
+            return f"⚠️ Sonda sem resposta, nova tentativa em {escravo['proxima_tentativa_s']:.0f}s"
+        if estado['registradores']:
+            return f"⚠️ {len(estado['registradores'])} registrador(es) desativado(s)"
+        return None
+
+    def fechar_sessao_continua(self):
+        if self.armazenamento_continuo is not None:
+            self.armazenamento_continuo.fechar()
+            self.armazenamento_continuo = None
+        if self.lote_catalogo is not None:
+            self.lote_catalogo.fechar()
+            self.lote_catalogo = None
 
     def update_data_cards(self, dados):
+        # Na leitura adaptativa, os parâmetros repetidos da leitura anterior não mexem no card
+        frescos = dados.get('frescos')
         for param, card in self.data_cards.items():
-            if param in dados:
+            if param in dados and (frescos is None or param in frescos or dados[param] is None):
                 card.update_value(dados[param])
 
-    def leitura_unica(self):
+    def leitura_unica(self, dados):
         try:
-            dados = self.sensor.ler_todos_dados()
             self.update_data_cards(dados)
             arquivo_base = self.file_input.text if self.file_input.text else "dados_sensor_solo"
             arquivo_salvo = self.sensor.salvar_dados(dados, arquivo_base)
-            if arquivo_salvo:
+            aviso = self.aviso_disjuntores()
+            if arquivo_salvo and aviso:
+                self.status_card.update_status(f"{aviso} - salvo em {os.path.basename(arquivo_salvo)}", "#E65100")
+            elif arquivo_salvo:
                 self.status_card.update_status(f"✅ Leitura salva: {os.path.basename(arquivo_salvo)}", "#11151A")
             else:
                 self.status_card.update_status("❌ Erro ao salvar leitura", "#B71C1C")
@@ -794,40 +856,29 @@ class SensorApp(App):
             self.status_card.update_status(f"❌ Erro: {str(e)[:50]}...", "#B71C1C")
         self.current_mode = None
 
-    def modo_media(self, dt):
-        if len(self.leituras) < 10:
-            try:
-                dados = self.sensor.ler_todos_dados()
-                self.leituras.append(dados)
-                self.update_data_cards(dados)
-                # Atualizar progresso
-                progress = len(self.leituras)
-                self.progress_bar.value = progress
-                self.progress_label.text = f"Coletando amostra {progress}/10..."
-                Clock.schedule_once(self.modo_media, 10.0)  # 10 segundos entre leituras para modo média
-            except Exception as e:
-                self.status_card.update_status(f"❌ Erro: {str(e)[:50]}...", "#B71C1C")
-        else:
-            self.calcular_media()
+    def modo_media(self, dados):
+        self.leituras.adicionar(dados)
+        self.update_data_cards(dados)
+
+    def progresso_media(self, atual, total):
+        self.progress_bar.max = total
+        self.progress_bar.value = atual
+        self.progress_label.text = f"Coletando amostra {atual}/{total}..."
 
-    def calcular_media(self):
-        if not self.leituras:
+    def calcular_media(self, estatisticas):
+        # As estatísticas chegam prontas da thread de aquisição, calculadas amostra a amostra
+        if not self.leituras or estatisticas is None or not estatisticas.amostras:
             self.status_card.update_status("❌ Nenhuma leitura para calcular média", "#B71C1C")
             return
 
-        media = {'timestamp': datetime.now().isoformat()}
-        params = ['umidade', 'temperatura', 'ph', 'condutividade', 'nitrogenio', 'fosforo', 'potassio']
-        
-        for param in params:
-            valores = [d[param] for d in self.leituras if d[param] is not None and isinstance(d[param], (int, float))]
-            media[param] = round(sum(valores) / len(valores), 2) if valores else None
+        media = {'timestamp': datetime.now().isoformat(), **estatisticas.media()}
 
         # Atualizar cards com média
         self.update_data_cards(media)
         
         # Salvar média
         arquivo_base = self.file_input.text if self.file_input.text else "dados_sensor_solo"
-        arquivo_salvo = self.sensor.salvar_media(self.leituras, media, arquivo_base)
+        arquivo_salvo = self.sensor.salvar_media(list(self.leituras), media, arquivo_base, estatisticas.resumo())
         
         if arquivo_salvo:
             self.status_card.update_status(f"✅ Média salva: {os.path.basename(arquivo_salvo)}", "#11151A")
@@ -835,18 +886,34 @@ class SensorApp(App):
             self.status_card.update_status("❌ Erro ao salvar média", "#B71C1C")
         
         # Reset
-        self.leituras = []
+        self.leituras.fechar()
+        self.leituras = HistoricoLimitado(self.capacidade_historico)
         self.current_mode = None
         self.progress_layout.height = 0
         self.progress_bar.value = 0
         self.progress_label.text = ""
 
     def on_stop(self):
+        self.trabalhador.parar()
+        self.trabalhador.join(timeout=5)
+        if self.exportador_metricas is not None:
+            self.exportador_metricas.parar()
+        self.fechar_sessao_continua()
+        self.leituras.fechar()
+        self.conexao.parar()
         self.sensor.desconectar()
 
 if __name__ == "__main__":
-    if not ANDROID:
-        import serial.tools.list_ports
+    import sys
+    if not ANDROID and '--simulador' in sys.argv:
+        # Sem sonda física: o app conversa com o simulador num pseudo-terminal
+        from simulador import SimuladorSensor
+        simulador = SimuladorSensor(ruido=0.01)
+        SensorApp.sensor_porta_com = simulador.iniciar()
+        print(f"Usando sensor simulado em {SensorApp.sensor_porta_com}")
+        SensorApp().run()
+        simulador.encerrar()
+    elif not ANDROID:
         portas = list(serial.tools.list_ports.comports())
         if not portas:
             print("Nenhuma porta serial encontrada. Conecte o sensor e tente novamente.")
@@ -854,13 +921,19 @@ if __name__ == "__main__":
         print("Portas seriais disponíveis:")
         for i, porta in enumerate(portas):
             print(f"[{i}] {porta.device} - {porta.description}")
-        escolha = input("Escolha o número da porta a ser utilizada: ")
+        escolha = input("Escolha o número da porta a ser utilizada (várias separadas por vírgula): ")
         try:
-            idx = int(escolha)
-            porta_escolhida = portas[idx].device
+            indices = [int(i) for i in escolha.split(',')]
+            portas_escolhidas = [portas[idx].device for idx in indices]
         except (ValueError, IndexError):
             print("Escolha inválida.")
             exit(1)
+        if len(portas_escolhidas) > 1:
+            # Vários adaptadores: leitura em paralelo no terminal, uma thread por porta
+            from multiporta import executar_multiporta
+            executar_multiporta(portas_escolhidas)
+            exit(0)
+        porta_escolhida = portas_escolhidas[0]
         SensorApp.sensor_porta_com = porta_escolhida
         SensorApp().run()
     else:
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Trabalhador de aquisição em segundo plano para o Sensor de Solo 7 em 1
+Uma única thread faz todo o acesso ao barramento; a interface envia comandos
+por uma fila e recolhe os resultados por outra, sem nunca bloquear
+"""
+
+import queue
+import threading
+import time
+
+from estatisticas import EstatisticasLeituras
+from polling_adaptativo import AmostragemAdaptativa
+
+
+class TrabalhadorAquisicao(threading.Thread):
+    # Resultados publicados em self.resultados: (geracao, tipo, modo, conteudo)
+    #   tipo 'leitura'   -> conteudo é o dict de ler_todos_dados
+    #   tipo 'progresso' -> conteudo é (amostra atual, total)
+    #   tipo 'concluido' -> fim de um comando finito ('unica' ou 'media'); na média,
+    #                       conteudo é o EstatisticasLeituras acumulado
+    #   tipo 'erro'      -> conteudo é a mensagem da exceção
+
+    def __init__(self, sensor):
+        super().__init__(name="aquisicao-sensor", daemon=True)
+        self.sensor = sensor
+        self.comandos = queue.Queue()
+        self.resultados = queue.Queue()
+        self._lock = threading.Lock()
+        self._geracao = 0
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._retomar = threading.Event()
+        # Amostragem do modo contínuo adaptativo em andamento (a interface mostra os períodos)
+        self.amostragem = None
+
+    def enviar(self, modo: str, **parametros) -> int:
+        # Todo comando novo substitui o anterior; devolve a geração para a
+        # interface descartar resultados atrasados de comandos cancelados
+        with self._lock:
+            self._geracao += 1
+            geracao = self._geracao
+        self.comandos.put((geracao, modo, parametros))
+        self._acordar.set()
+        return geracao
+
+    def cancelar(self):
+        with self._lock:
+            self._geracao += 1
+        self._acordar.set()
+
+    def parar(self):
+        self._parar.set()
+        self.cancelar()
+
+    def retomar(self):
+        # Sensor reconectado: encurta a espera do modo contínuo e lê na hora
+        self._retomar.set()
+        self._acordar.set()
+
+    def _desconectado(self) -> bool:
+        conexao = getattr(self.sensor, 'conexao', None)
+        return conexao is not None and not conexao.disponivel()
+
+    def _ativo(self, geracao: int) -> bool:
+        return geracao == self._geracao and not self._parar.is_set()
+
+    def _esperar(self, segundos: float, geracao: int, retomavel: bool = False) -> bool:
+        # Espera interrompível: volta False se o comando foi cancelado no meio.
+        # retomavel: retomar() encerra a espera (só o modo contínuo lê na hora após reconectar)
+        limite = time.monotonic() + segundos
+        while self._ativo(geracao):
+            restante = limite - time.monotonic()
+            if restante <= 0 or (retomavel and self._retomar.is_set()):
+                return True
+            self._acordar.wait(restante)
+            self._acordar.clear()
+        return False
+
+    def _publicar(self, geracao: int, tipo: str, modo: str, conteudo=None):
+        if self._ativo(geracao):
+            self.resultados.put((geracao, tipo, modo, conteudo))
+
+    def run(self):
+        while not self._parar.is_set():
+            try:
+                geracao, modo, parametros = self.comandos.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if not self._ativo(geracao):
+                continue
+            # Uma reconexão anterior ao comando não deve encurtar as esperas dele
+            self._retomar.clear()
+            try:
+                if modo == 'unica':
+                    self._leitura_unica(geracao)
+                elif modo == 'continuo':
+                    self._modo_continuo(geracao, **parametros)
+                elif modo == 'media':
+                    self._modo_media(geracao, **parametros)
+            except Exception as e:
+                self._publicar(geracao, 'erro', modo, str(e))
+
+    def _leitura_unica(self, geracao: int):
+        dados = self.sensor.ler_todos_dados()
+        self._publicar(geracao, 'leitura', 'unica', dados)
+        self._publicar(geracao, 'concluido', 'unica')
+
+    def _modo_continuo(self, geracao: int, intervalo: float = 10.0, adaptativo: bool = False,
+                       orcamento: float = None):
+        # adaptativo: cada parâmetro no seu período (polling_adaptativo); intervalo é ignorado
+        if adaptativo:
+            return self._modo_adaptativo(geracao, orcamento)
+        while self._ativo(geracao):
+            inicio = time.monotonic()
+            self._retomar.clear()
+            # Sem conexão não há leitura (a sessão não enche de linhas vazias); retomar() acorda a espera
+            if self._desconectado():
+                if not self._esperar(intervalo, geracao, retomavel=True):
+                    return
+                continue
+            try:
+                dados = self.sensor.ler_todos_dados()
+                # A leitura interrompida pela queda da porta é descartada
+                if not self._desconectado():
+                    self._publicar(geracao, 'leitura', 'continuo', dados)
+            except Exception as e:
+                self._publicar(geracao, 'erro', 'continuo', str(e))
+            # O intervalo conta do início da leitura, não do fim
+            if not self._esperar(intervalo - (time.monotonic() - inicio), geracao, retomavel=True):
+                return
+
+    def _modo_adaptativo(self, geracao: int, orcamento: float = None):
+        amostragem = AmostragemAdaptativa(self.sensor, orcamento=orcamento)
+        self.amostragem = amostragem
+        while self._ativo(geracao):
+            if self._desconectado():
+                if not self._esperar(1.0, geracao, retomavel=True):
+                    return
+                continue
+            if self._retomar.is_set():
+                self._retomar.clear()
+                amostragem.antecipar()
+            try:
+                dados = amostragem.ler()
+                if dados is not None and not self._desconectado():
+                    self._publicar(geracao, 'leitura', 'continuo', dados)
+            except Exception as e:
+                self._publicar(geracao, 'erro', 'continuo', str(e))
+            if not self._esperar(amostragem.espera(), geracao, retomavel=True):
+                return
+
+    def _modo_media(self, geracao: int, amostras: int = 10, intervalo: float = 10.0,
+                    tolerancia: float = None, minimo_amostras: int = 3, rejeitar_outliers: bool = False):
+        # tolerancia: meia largura relativa do intervalo de confiança de 95% que encerra
+        # a coleta antes de completar as amostras; None coleta sempre todas
+        estatisticas = EstatisticasLeituras(rejeitar_outliers=rejeitar_outliers)
+        for i in range(amostras):
+            if i and not self._esperar(intervalo, geracao):
+                return
+            dados = self.sensor.ler_todos_dados()
+            estatisticas.adicionar(dados)
+            self._publicar(geracao, 'leitura', 'media', dados)
+            self._publicar(geracao, 'progresso', 'media', (i + 1, amostras))
+            if tolerancia is not None and estatisticas.convergiu(tolerancia, minimo_amostras=minimo_amostras):
+                break
+        self._publicar(geracao, 'concluido', 'media', estatisticas)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Armazenamento das leituras do Sensor de Solo 7 em 1
+Sessões contínuas em JSON Lines (uma leitura por linha, só acréscimo), leitura
+preguiçosa e conversão para o layout antigo {"leituras": [...]}
+"""
+
+import json
+import os
+from typing import Dict, Iterator, Optional
+
+
+class ArmazenamentoJSONL:
+    # Cada leitura é escrita uma única vez no fim do arquivo. flush_a_cada e
+    # fsync_a_cada controlam quantas leituras podem ficar no buffer do processo
+    # e no cache do sistema antes de ir para o disco
+
+    def __init__(self, caminho: str, flush_a_cada: int = 1, fsync_a_cada: int = 10):
+        self.caminho = caminho
+        self.flush_a_cada = max(flush_a_cada, 1)
+        self.fsync_a_cada = fsync_a_cada
+        self._arquivo = open(caminho, 'a', encoding='utf-8')
+        self._sem_flush = 0
+        self._sem_fsync = 0
+        self.total = 0
+
+    def adicionar(self, dados: Dict):
+        self._arquivo.write(json.dumps(dados, ensure_ascii=False) + '\n')
+        self.total += 1
+        self._sem_flush += 1
+        self._sem_fsync += 1
+        if self._sem_flush >= self.flush_a_cada:
+            self._arquivo.flush()
+            self._sem_flush = 0
+        if self.fsync_a_cada and self._sem_fsync >= self.fsync_a_cada:
+            self.sincronizar()
+
+    def flush(self):
+        self._arquivo.flush()
+        self._sem_flush = 0
+
+    def sincronizar(self):
+        self._arquivo.flush()
+        os.fsync(self._arquivo.fileno())
+        self._sem_flush = 0
+        self._sem_fsync = 0
+
+    def fechar(self):
+        if not self._arquivo.closed:
+            self.sincronizar()
+            self._arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fechar()
+
+
+def ler_jsonl(caminho: str) -> Iterator[Dict]:
+    with open(caminho, 'r', encoding='utf-8') as f:
+        for numero, linha in enumerate(f, 1):
+            linha = linha.strip()
+            if not linha:
+                continue
+            try:
+                yield json.loads(linha)
+            except ValueError:
+                # Normalmente a última linha, cortada por uma queda durante a escrita
+                print(f"Linha {numero} inválida ignorada em {caminho}")
+
+
+def converter_para_legado(caminho_jsonl: str, caminho_json: Optional[str] = None) -> str:
+    # Gera o mesmo texto de json.dump({'leituras': [...]}, indent=2) sem carregar a sessão inteira
+    if caminho_json is None:
+        caminho_json = os.path.splitext(caminho_jsonl)[0] + '.json'
+    with open(caminho_json, 'w', encoding='utf-8') as saida:
+        saida.write('{\n  "leituras": [')
+        vazio = True
+        for dados in ler_jsonl(caminho_jsonl):
+            texto = json.dumps(dados, indent=2, ensure_ascii=False).replace('\n', '\n    ')
+            saida.write(('\n' if vazio else ',\n') + '    ' + texto)
+            vazio = False
+        saida.write(']\n}' if vazio else '\n  ]\n}')
+    return caminho_json
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Converte sessões .jsonl para o layout {\"leituras\": [...]}")
+    parser.add_argument('arquivos', nargs='+', help="Arquivos .jsonl de sessões contínuas")
+    args = parser.parse_args()
+    for arquivo in args.arquivos:
+        print(f"{arquivo} -> {converter_para_legado(arquivo)}")
@@ -0,0 +1,713 @@
+#!/usr/bin/env python3
+"""
+Arquivo frio das sessões do Sensor de Solo 7 em 1
+Sessões fechadas (JSON das leituras única, contínua e média, .jsonl e .tsb) são
+compactadas em segmentos gzip ou lzma, com horários e valores em deltas inteiros
+por coluna. O leitor percorre o segmento em fluxo, um bloco por vez, sem
+descompactá-lo inteiro na memória
+"""
+
+import glob
+import gzip
+import json
+import lzma
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ingestao import ARQUIVO_BINARIO, ARQUIVO_MANIFESTO, PADROES, detectar_layout
+from sessao_binaria import PARAMETROS
+
+MAGICO = b'SFR1'
+VERSAO = 1
+CODECS = {'lzma': '.seg.xz', 'gzip': '.seg.gz', 'nenhum': '.seg'}
+ARQUIVO_INDICE = 'indice.json'
+REGISTROS_POR_BLOCO = 4096
+# Valores com mais casas decimais são arredondados; a resolução do sensor é 0,1
+MAX_CASAS = 6
+
+_EPOCA = datetime(1970, 1, 1)
+_MICROSSEGUNDO = timedelta(microseconds=1)
+_CAMPOS = set(PARAMETROS) | {'timestamp'}
+
+# Cabeçalho de cada coluna: casas decimais nos 4 bits baixos
+_COM_NULOS = 0x80
+_SO_NULOS = 0x40
+
+
+def codec_do_segmento(caminho: str) -> str:
+    for codec, extensao in CODECS.items():
+        if caminho.endswith(extensao):
+            return codec
+    raise ValueError(f"{caminho}: extensão de segmento desconhecida")
+
+
+def _abrir(caminho: str, modo: str, codec: str, nivel: Optional[int] = None):
+    escrita = 'w' in modo
+    if codec == 'lzma':
+        return lzma.open(caminho, modo, **({'preset': nivel} if escrita and nivel is not None else {}))
+    if codec == 'gzip':
+        return gzip.open(caminho, modo, **({'compresslevel': 9 if nivel is None else nivel} if escrita else {}))
+    return open(caminho, modo)
+
+
+def _varints(valores: Iterable[int], saida: bytearray):
+    for valor in valores:
+        while valor >= 0x80:
+            saida.append((valor & 0x7F) | 0x80)
+            valor >>= 7
+        saida.append(valor)
+
+
+def _ler_varints(dados: bytes, posicao: int, quantidade: int) -> Tuple[List[int], int]:
+    fatia = dados[posicao:posicao + quantidade]
+    if len(fatia) == quantidade and (not fatia or max(fatia) < 0x80):
+        # Caso comum (deltas pequenos): todos os varints têm um byte
+        return list(fatia), posicao + quantidade
+    valores = []
+    for _ in range(quantidade):
+        byte = dados[posicao]
+        posicao += 1
+        if byte < 0x80:
+            valores.append(byte)
+            continue
+        valor = byte & 0x7F
+        deslocamento = 7
+        while True:
+            byte = dados[posicao]
+            posicao += 1
+            valor |= (byte & 0x7F) << deslocamento
+            if byte < 0x80:
+                break
+            deslocamento += 7
+        valores.append(valor)
+    return valores, posicao
+
+
+def _zigzag(valores: Iterable[int]) -> Iterator[int]:
+    # Deltas negativos pequenos viram inteiros positivos pequenos: 0, -1, 1, -2 -> 0, 1, 2, 3
+    return (2 * v if v >= 0 else -2 * v - 1 for v in valores)
+
+
+def _desfazer_zigzag(valores: Iterable[int]) -> List[int]:
+    return [(v >> 1) ^ -(v & 1) for v in valores]
+
+
+def _deltas(inteiros: List[int], ordem: int) -> List[int]:
+    for _ in range(ordem):
+        inteiros = inteiros[:1] + [b - a for a, b in zip(inteiros, inteiros[1:])]
+    return inteiros
+
+
+def _integrar(deltas: List[int], ordem: int) -> List[int]:
+    for _ in range(ordem):
+        deltas = list(accumulate(deltas))
+    return deltas
+
+
+def _casas(valores: List[float]) -> int:
+    # Menor número de casas decimais que representa todos os valores do bloco
+    for casas in range(MAX_CASAS + 1):
+        escala = 10 ** casas
+        if all(abs(v * escala - round(v * escala)) <= 1e-6 for v in valores):
+            return casas
+    return MAX_CASAS
+
+
+def _codificar_coluna(valores: List[Optional[float]], saida: bytearray, ordem: int = 1,
+                      casas: Optional[int] = None):
+    presentes = [v for v in valores if v is not None]
+    if not presentes:
+        saida.append(_SO_NULOS)
+        return
+    if casas is None:
+        casas = _casas(presentes)
+    escala = 10 ** casas
+    cabecalho = casas
+    if len(presentes) < len(valores):
+        cabecalho |= _COM_NULOS
+        mapa = bytearray((len(valores) + 7) // 8)
+        for i, valor in enumerate(valores):
+            if valor is not None:
+                mapa[i >> 3] |= 1 << (i & 7)
+        saida.append(cabecalho)
+        saida.extend(mapa)
+    else:
+        saida.append(cabecalho)
+    _varints(_zigzag(_deltas([round(v * escala) for v in presentes], ordem)), saida)
+
+
+def _decodificar_coluna(dados: bytes, posicao: int, quantidade: int, ordem: int = 1,
+                        inteiros: bool = False) -> Tuple[List, int]:
+    cabecalho = dados[posicao]
+    posicao += 1
+    if cabecalho & _SO_NULOS:
+        return [None] * quantidade, posicao
+    presenca = None
+    if cabecalho & _COM_NULOS:
+        tamanho = (quantidade + 7) // 8
+        mapa = dados[posicao:posicao + tamanho]
+        posicao += tamanho
+        presenca = [bool(mapa[i >> 3] & (1 << (i & 7))) for i in range(quantidade)]
+    brutos, posicao = _ler_varints(dados, posicao, sum(presenca) if presenca else quantidade)
+    valores = _integrar(_desfazer_zigzag(brutos), ordem)
+    casas = cabecalho & 0x0F
+    if not inteiros:
+        escala = 10 ** casas
+        valores = [v / escala for v in valores] if casas else [float(v) for v in valores]
+    if presenca is None:
+        return valores, posicao
+    completos = iter(valores)
+    return [next(completos) if presente else None for presente in presenca], posicao
+
+
+def _microssegundos(timestamp) -> Optional[int]:
+    # Só horários ISO sem fuso que voltam idênticos de isoformat(); os demais ficam nos extras
+    if not isinstance(timestamp, str):
+        return None
+    try:
+        instante = datetime.fromisoformat(timestamp)
+    except ValueError:
+        return None
+    if instante.tzinfo is not None or instante.isoformat() != timestamp:
+        return None
+    return (instante - _EPOCA) // _MICROSSEGUNDO
+
+
+def _numero(valor) -> bool:
+    return isinstance(valor, (int, float)) and not isinstance(valor, bool) and math.isfinite(valor)
+
+
+def codificar_bloco(leituras: List[Dict]) -> Tuple[bytes, Optional[int], Optional[int]]:
+    # -> (payload, menor e maior horário em µs; None se algum horário não é codificável)
+    saida = bytearray()
+    horarios = [_microssegundos(d.get('timestamp')) for d in leituras]
+    _codificar_coluna(horarios, saida, ordem=2, casas=0)
+    extras = []
+    for leitura in leituras:
+        extra = {k: v for k, v in leitura.items() if k not in _CAMPOS}
+        for parametro in PARAMETROS:
+            valor = leitura.get(parametro)
+            if valor is not None and not _numero(valor):
+                extra[parametro] = valor
+        extras.append(extra)
+    for i, horario in enumerate(horarios):
+        if horario is None and 'timestamp' in leituras[i]:
+            extras[i]['timestamp'] = leituras[i]['timestamp']
+    for parametro in PARAMETROS:
+        valores = [d.get(parametro) for d in leituras]
+        _codificar_coluna([v if _numero(v) else None for v in valores], saida)
+    if any(extras):
+        saida.extend(json.dumps([e or None for e in extras], ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    if None in horarios:
+        return bytes(saida), None, None
+    return bytes(saida), min(horarios), max(horarios)
+
+
+def decodificar_bloco(dados: bytes, quantidade: int) -> List[Dict]:
+    horarios, posicao = _decodificar_coluna(dados, 0, quantidade, ordem=2, inteiros=True)
+    colunas = []
+    for _ in PARAMETROS:
+        valores, posicao = _decodificar_coluna(dados, posicao, quantidade)
+        colunas.append(valores)
+    extras = json.loads(dados[posicao:].decode('utf-8')) if posicao < len(dados) else [None] * quantidade
+    leituras = []
+    for i, linha in enumerate(zip(*colunas)):
+        leitura = dict(zip(PARAMETROS, linha))
+        # Sem horário codificado, 'timestamp' só volta se estava nos extras (mesmo que nulo)
+        if horarios[i] is not None:
+            leitura['timestamp'] = (_EPOCA + timedelta(microseconds=horarios[i])).isoformat()
+        if extras[i]:
+            leitura.update(extras[i])
+        leituras.append(leitura)
+    return leituras
+
+
+def _iso(microssegundos: Optional[int]) -> Optional[str]:
+    return (_EPOCA + timedelta(microseconds=microssegundos)).isoformat() if microssegundos is not None else None
+
+
+class EscritorSegmento:
+    # Segmento: MAGICO, versão e, por sessão, 'S' + cabeçalho JSON, blocos 'B' e 'E';
+    # no fim 'F' + número de sessões. Sem o 'F' o segmento está truncado.
+    # Cada bloco 'B' leva quantidade, menor e maior horário (µs) e tamanho do payload
+
+    def __init__(self, caminho: str, nivel: Optional[int] = None):
+        self.caminho = caminho
+        self._temporario = f"{caminho}.tmp"
+        self._arquivo = _abrir(self._temporario, 'wb', codec_do_segmento(caminho), nivel)
+        self._arquivo.write(MAGICO + bytes([VERSAO]))
+        self.sessoes = 0
+        self.leituras = 0
+
+    def _escrever(self, marca: bytes, *inteiros: int, conteudo: bytes = b''):
+        cabecalho = bytearray(marca)
+        _varints(inteiros, cabecalho)
+        self._arquivo.write(bytes(cabecalho) + conteudo)
+
+    def adicionar_sessao(self, info: Dict, leituras: Iterable[Dict]) -> Dict:
+        # -> resumo da sessão (leituras, inicio, fim)
+        cabecalho = json.dumps(info, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self._escrever(b'S', len(cabecalho), conteudo=cabecalho)
+        total = 0
+        inicio = fim = None
+        bloco = []
+        for leitura in leituras:
+            bloco.append(leitura)
+            if len(bloco) == REGISTROS_POR_BLOCO:
+                inicio, fim = self._bloco(bloco, inicio, fim)
+                total += len(bloco)
+                bloco = []
+        if bloco:
+            inicio, fim = self._bloco(bloco, inicio, fim)
+            total += len(bloco)
+        self._arquivo.write(b'E')
+        self.sessoes += 1
+        self.leituras += total
+        return {'leituras': total, 'inicio': _iso(inicio), 'fim': _iso(fim)}
+
+    def _bloco(self, leituras: List[Dict], inicio: Optional[int], fim: Optional[int]):
+        payload, menor, maior = codificar_bloco(leituras)
+        # 0 nos limites = bloco com horário não codificável, nunca descartado pelo filtro
+        self._escrever(b'B', len(leituras), menor or 0, maior or 0, len(payload), conteudo=payload)
+        if menor is not None:
+            inicio = menor if inicio is None else min(inicio, menor)
+            fim = maior if fim is None else max(fim, maior)
+        return inicio, fim
+
+    def fechar(self):
+        if self._arquivo is None:
+            return
+        self._escrever(b'F', self.sessoes)
+        self._arquivo.close()
+        self._arquivo = None
+        with open(self._temporario, 'ab') as f:
+            os.fsync(f.fileno())
+        os.replace(self._temporario, self.caminho)
+
+    def descartar(self):
+        arquivo, self._arquivo = self._arquivo, None
+        if arquivo is not None:
+            try:
+                arquivo.close()
+            except OSError:
+                # Disco cheio: o temporário é apagado de qualquer forma
+                pass
+        if os.path.exists(self._temporario):
+            os.remove(self._temporario)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, *args):
+        if tipo is None:
+            self.fechar()
+        else:
+            self.descartar()
+
+
+class SessaoArquivada:
+    def __init__(self, info: Dict, leitor: 'LeitorSegmento'):
+        self.info = info
+        self._leitor = leitor
+        self._terminada = False
+
+    def blocos(self, inicio: Optional[str] = None, fim: Optional[str] = None,
+               decodificar: bool = True) -> Iterator[List[Dict]]:
+        # Blocos fora de [inicio, fim] (horários ISO) passam sem ser decodificados
+        limite_inicio = _microssegundos(inicio) if inicio else None
+        limite_fim = _microssegundos(fim) if fim else None
+        leitor = self._leitor
+        while not self._terminada:
+            marca = leitor._ler(1)
+            if marca == b'E':
+                self._terminada = True
+                return
+            if marca != b'B':
+                raise ValueError(f"{leitor.caminho}: bloco inválido")
+            quantidade, menor, maior, tamanho = (leitor._varint() for _ in range(4))
+            payload = leitor._ler(tamanho)
+            if not decodificar:
+                continue
+            if maior and ((limite_inicio is not None and maior < limite_inicio)
+                          or (limite_fim is not None and menor > limite_fim)):
+                continue
+            yield decodificar_bloco(payload, quantidade)
+
+    def leituras(self, inicio: Optional[str] = None, fim: Optional[str] = None) -> Iterator[Dict]:
+        for bloco in self.blocos(inicio, fim):
+            for leitura in bloco:
+                if ((inicio is None or (leitura.get('timestamp') or '') >= inicio)
+                        and (fim is None or (leitura.get('timestamp') or '') <= fim)):
+                    yield leitura
+
+    def _pular(self):
+        for _ in self.blocos(decodificar=False):
+            pass
+
+
+class LeitorSegmento:
+    # Leitura em fluxo: só o bloco atual (até REGISTROS_POR_BLOCO leituras) fica na memória
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._arquivo = _abrir(caminho, 'rb', codec_do_segmento(caminho))
+        if self._ler(len(MAGICO) + 1) != MAGICO + bytes([VERSAO]):
+            self._arquivo.close()
+            raise ValueError(f"{caminho} não é um segmento do arquivo frio compatível")
+
+    def _ler(self, tamanho: int) -> bytes:
+        dados = self._arquivo.read(tamanho)
+        if len(dados) != tamanho:
+            raise ValueError(f"{self.caminho}: segmento truncado")
+        return dados
+
+    def _varint(self) -> int:
+        valor = deslocamento = 0
+        while True:
+            byte = self._ler(1)[0]
+            valor |= (byte & 0x7F) << deslocamento
+            if byte < 0x80:
+                return valor
+            deslocamento += 7
+
+    def sessoes(self) -> Iterator[SessaoArquivada]:
+        # Leituras não consumidas de uma sessão são puladas ao pedir a próxima
+        total = 0
+        while True:
+            marca = self._ler(1)
+            if marca == b'F':
+                if self._varint() != total:
+                    raise ValueError(f"{self.caminho}: número de sessões não confere")
+                return
+            if marca != b'S':
+                raise ValueError(f"{self.caminho}: sessão inválida")
+            sessao = SessaoArquivada(json.loads(self._ler(self._varint()).decode('utf-8')), self)
+            total += 1
+            yield sessao
+            sessao._pular()
+
+    def fechar(self):
+        self._arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fechar()
+
+
+def leituras_arquivadas(caminho_segmento: str, arquivo: Optional[str] = None, inicio: Optional[str] = None,
+                        fim: Optional[str] = None) -> Iterator[Dict]:
+    # Leituras do segmento em fluxo, só da sessão 'arquivo' (caminho ou nome) e do intervalo pedidos
+    with LeitorSegmento(caminho_segmento) as leitor:
+        for sessao in leitor.sessoes():
+            if arquivo is not None and arquivo not in (sessao.info['arquivo'],
+                                                       os.path.basename(sessao.info['arquivo'])):
+                continue
+            yield from sessao.leituras(inicio, fim)
+
+
+def _ler_origem(caminho: str) -> Tuple[Optional[Dict], Iterable[Dict]]:
+    # -> (cabeçalho da sessão, leituras); cabeçalho None para JSON de layout desconhecido
+    info = {'arquivo': caminho, 'tamanho': os.path.getsize(caminho), 'mtime': os.path.getmtime(caminho)}
+    if caminho.endswith('.tsb'):
+        from sessao_binaria import SessaoBinaria
+
+        def registros():
+            with SessaoBinaria(caminho) as sessao:
+                yield from sessao.registros()
+        return {**info, 'formato': 'tsb', 'layout': 'continuo'}, registros()
+    if caminho.endswith('.jsonl'):
+        from armazenamento import ler_jsonl
+        return {**info, 'formato': 'jsonl', 'layout': 'continuo'}, ler_jsonl(caminho)
+    with open(caminho, 'r', encoding='utf-8') as f:
+        conteudo = json.load(f)
+    layout = detectar_layout(conteudo)
+    if layout is None:
+        return None, []
+    info.update(formato='json', layout=layout)
+    if layout == 'unica':
+        return info, [conteudo]
+    if isinstance(conteudo, list):
+        info['lista'] = True
+        return info, conteudo
+    # As demais chaves (na média: 'media', 'estatisticas', 'timestamp') voltam como estavam
+    info['raiz'] = {k: None if k == 'leituras' else v for k, v in conteudo.items()}
+    return info, conteudo['leituras']
+
+
+class _ErroOrigem(Exception):
+    pass
+
+
+def _da_origem(leituras: Iterable) -> Iterator[Dict]:
+    # Separa os erros de leitura do arquivo original dos erros de gravação do segmento
+    iterador = iter(leituras)
+    while True:
+        try:
+            leitura = next(iterador)
+        except StopIteration:
+            return
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            raise _ErroOrigem(e) from e
+        if isinstance(leitura, dict):
+            yield leitura
+
+
+def restaurar(caminho_segmento: str, arquivo: str, destino: Optional[str] = None) -> str:
+    # Regrava a sessão no formato original (JSON indentado como o app, .jsonl ou .tsb)
+    with LeitorSegmento(caminho_segmento) as leitor:
+        for sessao in leitor.sessoes():
+            info = sessao.info
+            if arquivo not in (info['arquivo'], os.path.basename(info['arquivo'])):
+                continue
+            destino = destino or info['arquivo']
+            if info['formato'] == 'tsb':
+                from sessao_binaria import EscritorSessaoBinaria
+                with EscritorSessaoBinaria(destino, flush_a_cada=1024) as escritor:
+                    for leitura in sessao.leituras():
+                        escritor.adicionar(leitura)
+            elif info['formato'] == 'jsonl':
+                with open(destino, 'w', encoding='utf-8') as f:
+                    for leitura in sessao.leituras():
+                        f.write(json.dumps(leitura, ensure_ascii=False) + '\n')
+            else:
+                leituras = list(sessao.leituras())
+                if info['layout'] == 'unica':
+                    conteudo = leituras[0]
+                elif info.get('lista'):
+                    conteudo = leituras
+                else:
+                    conteudo = {k: leituras if k == 'leituras' else v for k, v in info['raiz'].items()}
+                with open(destino, 'w', encoding='utf-8') as f:
+                    json.dump(conteudo, f, indent=2, ensure_ascii=False)
+            return destino
+    raise FileNotFoundError(f"{arquivo} não está em {caminho_segmento}")
+
+
+class ArquivadorSessoes:
+    # Só arquivos sem alteração há idade_minima segundos contam como sessões fechadas.
+    # Os originais só são apagados depois que o segmento foi gravado, relido e indexado
+
+    def __init__(self, pasta_arquivo: str = "arquivo_frio", codec: str = 'lzma', nivel: Optional[int] = None,
+                 idade_minima: float = 3600.0, leituras_por_segmento: int = 1_000_000,
+                 remover_originais: bool = True):
+        if codec not in CODECS:
+            raise ValueError(f"Codec {codec} desconhecido: use {', '.join(CODECS)}")
+        self.pasta_arquivo = pasta_arquivo
+        self.codec = codec
+        self.nivel = nivel
+        self.idade_minima = idade_minima
+        self.leituras_por_segmento = leituras_por_segmento
+        self.remover_originais = remover_originais
+        self.caminho_indice = os.path.join(pasta_arquivo, ARQUIVO_INDICE)
+
+    def carregar_indice(self) -> Dict:
+        try:
+            with open(self.caminho_indice, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'segmentos': {}, 'sessoes': {}}
+
+    def _salvar_indice(self, indice: Dict):
+        temporario = f"{self.caminho_indice}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(indice, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.caminho_indice)
+
+    def listar(self, entradas: Iterable[str], padroes: Iterable[str] = PADROES) -> List[str]:
+        pasta = os.path.abspath(self.pasta_arquivo)
+        limite = time.time() - self.idade_minima
+        arquivos = set()
+        for entrada in entradas:
+            if os.path.isdir(entrada):
+                for padrao in padroes:
+                    arquivos.update(glob.iglob(os.path.join(glob.escape(entrada), '**', padrao), recursive=True))
+            else:
+                arquivos.add(entrada)
+        # Sem a pasta do arquivo e sem os produtos da ingestão
+        return sorted((os.path.abspath(c) for c in arquivos
+                       if os.path.isfile(c) and not os.path.abspath(c).startswith(pasta + os.sep)
+                       and os.path.basename(c) not in (ARQUIVO_MANIFESTO, ARQUIVO_BINARIO)
+                       and os.path.getmtime(c) <= limite),
+                      key=os.path.getmtime)
+
+    def _remover(self, caminho: str, item: Dict, erros: Dict[str, str]):
+        # Só o arquivo que foi arquivado: se mudou depois, fica
+        try:
+            if os.path.getsize(caminho) == item['tamanho'] and os.path.getmtime(caminho) == item['mtime']:
+                os.remove(caminho)
+        except OSError as e:
+            erros[caminho] = f"Erro ao remover: {e}"
+
+    def arquivar(self, entradas: Iterable[str], padroes: Iterable[str] = PADROES) -> Dict:
+        # -> resumo; 'erros' ({arquivo: mensagem}) traz as sessões que falharam e 'erro',
+        # o que interrompeu o arquivamento (None se foi até o fim)
+        os.makedirs(self.pasta_arquivo, exist_ok=True)
+        indice = self.carregar_indice()
+        resumo = {'sessoes': 0, 'leituras': 0, 'bytes_originais': 0, 'bytes_arquivo': 0,
+                  'segmentos': [], 'ignorados': [], 'erros': {}, 'erro': None}
+        pendentes = []
+        for caminho in self.listar(entradas, padroes):
+            item = indice['sessoes'].get(caminho)
+            if item is not None and os.path.getmtime(caminho) == item['mtime']:
+                # Arquivado numa execução interrompida antes de apagar o original
+                if self.remover_originais:
+                    self._remover(caminho, item, resumo['erros'])
+                continue
+            pendentes.append(caminho)
+
+        while pendentes:
+            nome = f"segmento_{len(indice['segmentos']) + 1:05d}{CODECS[self.codec]}"
+            caminho_segmento = os.path.join(self.pasta_arquivo, nome)
+            try:
+                arquivadas = self._gravar_segmento(caminho_segmento, nome, pendentes, resumo)
+                if not arquivadas:
+                    if os.path.exists(caminho_segmento):
+                        os.remove(caminho_segmento)
+                    continue
+                self._verificar(caminho_segmento, arquivadas)
+            except (OSError, ValueError) as e:
+                # Disco cheio ou segmento ilegível: para aqui, os originais pendentes ficam
+                resumo['erro'] = f"Erro ao gravar {caminho_segmento}: {e}"
+                break
+            indice['segmentos'][nome] = {
+                'codec': self.codec,
+                'sessoes': len(arquivadas),
+                'leituras': sum(i['leituras'] for i in arquivadas.values()),
+                'bytes': os.path.getsize(caminho_segmento),
+                'bytes_originais': sum(i['tamanho'] for i in arquivadas.values()),
+                'inicio': min((i['inicio'] for i in arquivadas.values() if i['inicio']), default=None),
+                'fim': max((i['fim'] for i in arquivadas.values() if i['fim']), default=None),
+            }
+            indice['sessoes'].update(arquivadas)
+            self._salvar_indice(indice)
+            if self.remover_originais:
+                for caminho, item in arquivadas.items():
+                    self._remover(caminho, item, resumo['erros'])
+            resumo['sessoes'] += len(arquivadas)
+            resumo['leituras'] += indice['segmentos'][nome]['leituras']
+            resumo['bytes_originais'] += indice['segmentos'][nome]['bytes_originais']
+            resumo['bytes_arquivo'] += indice['segmentos'][nome]['bytes']
+            resumo['segmentos'].append(nome)
+        return resumo
+
+    def _gravar_segmento(self, caminho_segmento: str, nome: str, pendentes: List[str],
+                         resumo: Dict) -> Dict[str, Dict]:
+        # Consome pendentes até encher o segmento. Se a leitura de uma sessão falha no meio,
+        # o segmento é descartado e refeito sem ela. Erros de gravação do segmento sobem
+        # com os pendentes intactos
+        while True:
+            arquivadas = {}
+            usados = []
+            ignorados_tentativa = []
+            erros_tentativa = {}
+            falha = None
+            escritor = EscritorSegmento(caminho_segmento, self.nivel)
+            try:
+                for caminho in pendentes:
+                    if escritor.leituras >= self.leituras_por_segmento:
+                        break
+                    usados.append(caminho)
+                    try:
+                        info, leituras = _ler_origem(caminho)
+                    except (OSError, ValueError, UnicodeDecodeError) as e:
+                        erros_tentativa[caminho] = f"Erro ao ler: {e}"
+                        info = None
+                    if info is None:
+                        ignorados_tentativa.append(caminho)
+                        continue
+                    try:
+                        item = escritor.adicionar_sessao(info, _da_origem(leituras))
+                    except _ErroOrigem as e:
+                        resumo['erros'][caminho] = f"Erro ao ler: {e}"
+                        falha = caminho
+                        break
+                    item.update(segmento=nome, formato=info['formato'], layout=info['layout'],
+                                tamanho=info['tamanho'], mtime=info['mtime'])
+                    arquivadas[caminho] = item
+                if falha is None:
+                    escritor.fechar()
+            finally:
+                escritor.descartar()
+            if falha is not None:
+                resumo['ignorados'].append(falha)
+                pendentes.remove(falha)
+                continue
+            resumo['ignorados'].extend(ignorados_tentativa)
+            resumo['erros'].update(erros_tentativa)
+            del pendentes[:len(usados)]
+            return arquivadas
+
+    def _verificar(self, caminho_segmento: str, arquivadas: Dict[str, Dict]):
+        # Relê o segmento inteiro antes de apagar qualquer original
+        with LeitorSegmento(caminho_segmento) as leitor:
+            contagem = {s.info['arquivo']: sum(len(b) for b in s.blocos()) for s in leitor.sessoes()}
+        esperado = {c: i['leituras'] for c, i in arquivadas.items()}
+        if contagem != esperado:
+            os.remove(caminho_segmento)
+            raise ValueError(f"{caminho_segmento}: verificação falhou, nenhum original foi removido")
+
+    def segmentos_entre(self, inicio: str, fim: str) -> List[str]:
+        # Segmentos com alguma leitura no intervalo [inicio, fim] (horários ISO)
+        indice = self.carregar_indice()
+        return [os.path.join(self.pasta_arquivo, nome) for nome, item in sorted(indice['segmentos'].items())
+                if item['inicio'] is None or (item['inicio'] <= fim and item['fim'] >= inicio)]
+
+    def leituras_entre(self, inicio: str, fim: str) -> Iterator[Dict]:
+        for caminho in self.segmentos_entre(inicio, fim):
+            yield from leituras_arquivadas(caminho, inicio=inicio, fim=fim)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Arquivo frio das sessões do sensor de solo 7 em 1")
+    acoes = parser.add_subparsers(dest='acao', required=True)
+    arquivar = acoes.add_parser('arquivar', help="Compacta as sessões fechadas em segmentos")
+    arquivar.add_argument('entradas', nargs='+', help="Pastas ou arquivos de sessão")
+    arquivar.add_argument('--pasta', default="arquivo_frio", help="Pasta dos segmentos e do índice")
+    arquivar.add_argument('--codec', choices=list(CODECS), default='lzma')
+    arquivar.add_argument('--nivel', type=int, default=None, help="Nível de compressão (lzma 0-9, gzip 1-9)")
+    arquivar.add_argument('--idade-minima', type=float, default=3600.0,
+                          help="Segundos sem alteração para a sessão contar como fechada")
+    arquivar.add_argument('--manter-originais', action='store_true')
+    ler = acoes.add_parser('ler', help="Imprime as leituras de um segmento em JSON Lines")
+    ler.add_argument('segmento')
+    ler.add_argument('--arquivo', help="Só a sessão deste arquivo original")
+    ler.add_argument('--inicio', help="Horário ISO inicial")
+    ler.add_argument('--fim', help="Horário ISO final")
+    restaurar_ = acoes.add_parser('restaurar', help="Regrava uma sessão no formato original")
+    restaurar_.add_argument('segmento')
+    restaurar_.add_argument('arquivo')
+    restaurar_.add_argument('--destino')
+    args = parser.parse_args()
+
+    if args.acao == 'arquivar':
+        arquivador = ArquivadorSessoes(args.pasta, args.codec, args.nivel, args.idade_minima,
+                                       remover_originais=not args.manter_originais)
+        resumo = arquivador.arquivar(args.entradas)
+        razao = resumo['bytes_originais'] / resumo['bytes_arquivo'] if resumo['bytes_arquivo'] else 0
+        print(f"{resumo['sessoes']} sessões, {resumo['leituras']} leituras: "
+              f"{resumo['bytes_originais'] / 1e6:.1f} MB -> {resumo['bytes_arquivo'] / 1e6:.2f} MB ({razao:.0f}x) "
+              f"em {', '.join(resumo['segmentos']) or 'nenhum segmento'}")
+        if resumo['ignorados']:
+            print(f"{len(resumo['ignorados'])} arquivos ignorados (layout desconhecido ou erro)")
+        for caminho, erro in resumo['erros'].items():
+            print(f"{caminho}: {erro}")
+        if resumo['erro']:
+            print(f"Arquivamento interrompido: {resumo['erro']}")
+    elif args.acao == 'ler':
+        for leitura in leituras_arquivadas(args.segmento, args.arquivo, args.inicio, args.fim):
+            print(json.dumps(leitura, ensure_ascii=False))
+    else:
+        print(f"{args.arquivo} -> {restaurar(args.segmento, args.arquivo, args.destino)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Detecção automática de baudrate e endereço do Sensor de Solo 7 em 1
+Varre as velocidades e os endereços candidatos lendo um registrador conhecido,
+pode passar a sonda para a maior velocidade suportada e guarda o resultado no
+perfil do dispositivo, para as próximas conexões pularem a varredura
+"""
+
+import time
+from typing import Iterable, Optional, Tuple
+
+import modbus_rtu
+from temporizacao import TemporizadorModbus
+
+# Registradores de configuração da sonda (função 06 grava, função 03 lê)
+REGISTRADOR_ENDERECO = 0x07D0
+REGISTRADOR_BAUD = 0x07D1
+CODIGOS_BAUD = {2400: 0, 4800: 1, 9600: 2}
+
+# Padrão de fábrica primeiro: é onde a maioria das sondas está
+BAUDRATES_CANDIDATOS = (4800, 9600, 2400)
+
+# Tempo de processamento aceito por sondagem: a sonda responde em dezenas de ms,
+# e cada candidato errado custa esse prazo mais a transmissão
+ESPERA_SONDAGEM = 0.1
+
+
+def _trocar_velocidade(porta, baudrate: int):
+    if porta.baudrate != baudrate:
+        porta.baudrate = baudrate
+    if hasattr(porta, 'reset_input_buffer'):
+        # Bytes recebidos na velocidade errada são lixo
+        porta.reset_input_buffer()
+
+
+def sondar(porta, baudrate: int, endereco: int) -> bool:
+    # Qualquer quadro íntegro do endereço, mesmo de exceção, confirma velocidade e endereço
+    _trocar_velocidade(porta, baudrate)
+    temporizador = TemporizadorModbus(baudrate, resposta_inicial=ESPERA_SONDAGEM / 2)
+    try:
+        modbus_rtu.ler_registradores(porta, endereco, REGISTRADOR_ENDERECO, 1, temporizador=temporizador)
+    except modbus_rtu.ExcecaoModbus:
+        return True
+    except modbus_rtu.ErroModbus:
+        return False
+    return True
+
+
+def detectar(porta, enderecos: Iterable[int] = (1,),
+             baudrates: Iterable[int] = BAUDRATES_CANDIDATOS) -> Optional[Tuple[int, int]]:
+    # -> (baudrate, endereco) da primeira sonda que responder; a porta fica nessa velocidade.
+    # Sem resposta, a porta volta à velocidade em que estava
+    original = porta.baudrate
+    enderecos = list(enderecos)
+    for baudrate in baudrates:
+        for endereco in enderecos:
+            if sondar(porta, baudrate, endereco):
+                return baudrate, endereco
+    _trocar_velocidade(porta, original)
+    return None
+
+
+def promover(porta, endereco: int, baudrate: int, baudrates: Iterable[int] = tuple(CODIGOS_BAUD)) -> int:
+    # Grava a maior velocidade suportada e confirma nela -> baudrate em uso ao final
+    alvo = max(b for b in baudrates if b in CODIGOS_BAUD)
+    if alvo <= baudrate:
+        return baudrate
+    _trocar_velocidade(porta, baudrate)
+    try:
+        modbus_rtu.escrever_registrador(porta, endereco, REGISTRADOR_BAUD, CODIGOS_BAUD[alvo],
+                                        temporizador=TemporizadorModbus(baudrate))
+    except modbus_rtu.ErroModbus as e:
+        print(f"Sonda {endereco} não aceitou {alvo} bps: {e}")
+        return baudrate
+    # O eco sai na velocidade antiga; a sonda troca logo depois
+    time.sleep(0.05)
+    if sondar(porta, alvo, endereco):
+        print(f"Sonda {endereco} passou de {baudrate} para {alvo} bps")
+        return alvo
+    if sondar(porta, baudrate, endereco):
+        print(f"Sonda {endereco} gravou {alvo} bps, mas só passa a usá-lo depois de reiniciada")
+        return baudrate
+    encontrado = detectar(porta, (endereco,))
+    if encontrado is None:
+        print(f"Sonda {endereco} parou de responder depois da troca para {alvo} bps")
+        _trocar_velocidade(porta, baudrate)
+        return baudrate
+    return encontrado[0]
+
+
+def main():
+    import argparse
+    import serial
+    import serial.tools.list_ports
+    from perfil_dispositivo import PerfilDispositivos, chave_dispositivo
+
+    parser = argparse.ArgumentParser(description="Detecta baudrate e endereço das sondas numa porta RS485")
+    parser.add_argument('porta')
+    parser.add_argument('--enderecos', type=int, nargs='+', default=[1],
+                        help="Endereços esperados no barramento (um por sonda)")
+    parser.add_argument('--varrer', action='store_true', help="Procura a sonda (a primeira que responder) nos endereços 1-247")
+    parser.add_argument('--promover', action='store_true',
+                        help=f"Passa as sondas para {max(CODIGOS_BAUD)} bps")
+    parser.add_argument('--perfil', default="perfil_sensor.json")
+    args = parser.parse_args()
+
+    perfil = PerfilDispositivos(args.perfil)
+    porta = serial.Serial(args.porta, BAUDRATES_CANDIDATOS[0], bytesize=8, parity=serial.PARITY_NONE, stopbits=1)
+    vid = pid = None
+    for info in serial.tools.list_ports.comports():
+        if info.device == args.porta:
+            vid, pid = info.vid, info.pid
+    try:
+        alvos = [range(1, 248)] if args.varrer else [(e,) for e in args.enderecos]
+        for enderecos in alvos:
+            inicio = time.monotonic()
+            encontrado = detectar(porta, enderecos)
+            if encontrado is None:
+                print(f"Nenhuma sonda respondeu em {', '.join(map(str, BAUDRATES_CANDIDATOS))} bps "
+                      f"({time.monotonic() - inicio:.1f}s)")
+                continue
+            baudrate, endereco = encontrado
+            print(f"Sonda {endereco} a {baudrate} bps ({time.monotonic() - inicio:.1f}s)")
+            if args.promover:
+                baudrate = promover(porta, endereco, baudrate)
+            perfil.definir_comunicacao(chave_dispositivo(endereco, vid, pid, args.porta), baudrate, endereco)
+    finally:
+        porta.close()
+
+
+if __name__ == "__main__":
+    main()
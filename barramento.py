@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Escalonador de vários sensores 7 em 1 num mesmo barramento RS485
+Uma única conexão serial é compartilhada por todos os endereços escravos;
+cada leitura sai no mesmo formato de SensorSolo7em1.ler_todos_dados
+"""
+
+import heapq
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from disjuntor import ABERTO, Disjuntor
+from sensor_solo import SensorSolo7em1
+from perfil_dispositivo import PerfilDispositivos
+from telemetria import TelemetriaBarramento
+from temporizacao import TemporizadorModbus
+
+PARAMETROS = ['umidade', 'temperatura', 'ph', 'condutividade', 'nitrogenio', 'fosforo', 'potassio']
+
+
+def abrir_porta_serial(porta_com: str, baudrate: int = 4800):
+    import serial
+    return serial.Serial(porta_com, baudrate, bytesize=8, parity=serial.PARITY_NONE,
+                         stopbits=1, timeout=2.0)
+
+
+class EscalonadorBarramento:
+    def __init__(self, porta_com: str = None, escravos: Iterable[int] = (1,), baudrate: int = 4800,
+                 serial_port=None, periodos: Optional[Dict[int, float]] = None, tentativas: int = 1,
+                 suspensao_inicial: float = 5.0, suspensao_maxima: float = 300.0,
+                 arquivo_perfil: str = "perfil_sensor.json"):
+        self.porta_com = porta_com
+        self.serial_port = serial_port if serial_port is not None else abrir_porta_serial(porta_com, baudrate)
+        # O silêncio entre quadros é do barramento; o tempo de resposta é aprendido por escravo
+        self.temporizador = TemporizadorModbus(baudrate)
+        self.telemetria = TelemetriaBarramento()
+        self.perfil = PerfilDispositivos(arquivo_perfil)
+        # periodos: intervalo mínimo entre leituras de cada escravo (0 = o mais rápido possível).
+        # Escravos com período menor são lidos com mais frequência
+        self.periodos = periodos or {}
+        self.sensores: Dict[int, SensorSolo7em1] = {}
+        self._agenda = []
+        for ordem, escravo in enumerate(escravos):
+            sensor = SensorSolo7em1(porta_com, escravo, baudrate, serial_port=self.serial_port,
+                                    conectar_agora=False, tentativas=tentativas)
+            sensor.temporizador = self.temporizador
+            sensor.telemetria = self.telemetria
+            sensor.perfil = self.perfil
+            # Escravo mudo fica suspenso pelo disjuntor do próprio sensor (disjuntor.py), com
+            # as esperas do barramento; o escalonador só agenda a leitura de teste
+            sensor.disjuntor = Disjuntor(espera_inicial=suspensao_inicial, espera_maxima=suspensao_maxima)
+            self.sensores[escravo] = sensor
+            heapq.heappush(self._agenda, (0.0, ordem, escravo))
+
+    def suspenso(self, escravo: int, agora: Optional[float] = None) -> bool:
+        disjuntor = self.sensores[escravo].disjuntor
+        agora = time.monotonic() if agora is None else agora
+        return disjuntor.estado == ABERTO and disjuntor.proxima_tentativa > agora
+
+    def _registrar(self, escravo: int, dados: Dict) -> Tuple[Optional[Dict], float]:
+        # Devolve os dados (None se o escravo está mudo) e o próximo instante de leitura:
+        # com o disjuntor aberto, o da leitura de teste
+        agora = time.monotonic()
+        proximo = agora + self.periodos.get(escravo, 0.0)
+        disjuntor = self.sensores[escravo].disjuntor
+        if disjuntor.estado == ABERTO:
+            proximo = max(proximo, disjuntor.proxima_tentativa)
+        if all(dados.get(p) is None for p in PARAMETROS):
+            return None, proximo
+        return dados, proximo
+
+    def ler_proximo(self) -> Tuple[int, Optional[Dict]]:
+        # Lê o escravo com a leitura mais atrasada; empates seguem a ordem da lista (round-robin)
+        devido, ordem, escravo = heapq.heappop(self._agenda)
+        espera = devido - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+        dados, proximo = self._registrar(escravo, self.sensores[escravo].ler_todos_dados())
+        heapq.heappush(self._agenda, (proximo, ordem, escravo))
+        return escravo, dados
+
+    def ler_ciclo(self, parar: Optional[threading.Event] = None) -> Dict[int, Dict]:
+        # Uma leitura de cada escravo que não está suspenso -> {escravo: dados}.
+        # Com parar sinalizado, os escravos que faltam ficam para o próximo ciclo
+        agora = time.monotonic()
+        leituras = {}
+        agenda = []
+        for devido, ordem, escravo in sorted(self._agenda, key=lambda item: item[1]):
+            if self.suspenso(escravo, agora) or (parar is not None and parar.is_set()):
+                agenda.append((devido, ordem, escravo))
+                continue
+            dados, proximo = self._registrar(escravo, self.sensores[escravo].ler_todos_dados())
+            agenda.append((proximo, ordem, escravo))
+            if dados is not None:
+                leituras[escravo] = dados
+        heapq.heapify(agenda)
+        self._agenda = agenda
+        return leituras
+
+    def executar(self, ao_ler: Callable[[int, Dict], None], parar: Optional[threading.Event] = None):
+        while parar is None or not parar.is_set():
+            espera = self._agenda[0][0] - time.monotonic()
+            if espera > 0 and parar is not None and parar.wait(espera):
+                break
+            escravo, dados = self.ler_proximo()
+            if dados is not None:
+                ao_ler(escravo, dados)
+
+    def fechar(self):
+        try:
+            if self.serial_port is not None and self.serial_port.is_open:
+                self.serial_port.close()
+            print("Conexão fechada")
+        except Exception as e:
+            print(f"Erro ao fechar conexão: {e}")
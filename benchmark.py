@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Benchmark de aquisição e armazenamento do Sensor de Solo 7 em 1
+Roda o driver contra o simulador em pseudo-terminal nos modos única, contínuo
+e média, mede a busca de NPK alternativo, o custo de gravação por leitura
+conforme a sessão cresce e a razão de compressão contra a velocidade de leitura
+do arquivo frio. Os resultados saem em JSON para comparar entre commits
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import serial
+
+from armazenamento import ArmazenamentoJSONL
+from arquivo_frio import ArquivadorSessoes, leituras_arquivadas
+from aquisicao import TrabalhadorAquisicao
+from historico import HistoricoLimitado
+from sensor_solo import SensorSolo7em1
+from sessao_binaria import EscritorSessaoBinaria
+from simulador import SimuladorSensor
+
+MODOS = ['unica', 'continuo', 'media', 'npk', 'armazenamento', 'arquivo_frio']
+
+# Métricas em que maior é melhor; nas demais, menor é melhor
+MAIOR_MELHOR = ('leituras_por_segundo', 'razao')
+
+
+def _percentil(valores: List[float], p: float) -> Optional[float]:
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    posicao = min(int(round(p * (len(ordenados) - 1))), len(ordenados) - 1)
+    return ordenados[posicao]
+
+
+def _resumir(latencias: List[float], duracao: float, trafego: Dict[str, int]) -> Dict[str, float]:
+    n = len(latencias)
+    return {
+        'leituras': n,
+        'leituras_por_segundo': round(n / duracao, 3) if duracao > 0 else None,
+        'latencia_p50_ms': round(_percentil(latencias, 0.5) * 1000, 2) if n else None,
+        'latencia_p99_ms': round(_percentil(latencias, 0.99) * 1000, 2) if n else None,
+        'transacoes_por_leitura': round(trafego['requisicoes'] / n, 2) if n else None,
+        'bytes_por_leitura': round((trafego['bytes_recebidos'] + trafego['bytes_enviados']) / n, 1) if n else None,
+    }
+
+
+class Bancada:
+    # Simulador + sensor com perfil e catálogo numa pasta temporária
+
+    def __init__(self, pasta: str, baudrate: int = 4800, latencia: float = 0.02, npk_alternativo: bool = False,
+                 usar_minimalmodbus: bool = False):
+        self.simulador = SimuladorSensor(baudrate=baudrate, latencia=latencia, npk_alternativo=npk_alternativo)
+        caminho = self.simulador.iniciar()
+        self.porta = None
+        if not usar_minimalmodbus:
+            self.porta = serial.Serial(caminho, baudrate, timeout=2.0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.sensor = SensorSolo7em1(porta_com=caminho, baudrate=baudrate,
+                                         arquivo_perfil=os.path.join(pasta, 'perfil.json'),
+                                         arquivo_catalogo=os.path.join(pasta, 'catalogo.db'),
+                                         conectar_agora=usar_minimalmodbus, serial_port=self.porta)
+        self._marca = self.simulador.estatisticas()
+
+    def marcar(self):
+        self._marca = self.simulador.estatisticas()
+
+    def trafego(self) -> Dict[str, int]:
+        atual = self.simulador.estatisticas()
+        return {chave: atual[chave] - self._marca[chave] for chave in atual}
+
+    def fechar(self):
+        if self.sensor.instrumento is not None:
+            self.sensor.instrumento.serial.close()
+        if self.porta is not None:
+            self.porta.close()
+        if self.sensor._catalogo is not None:
+            self.sensor._catalogo.fechar()
+        self.simulador.encerrar()
+
+
+def _aguardar(trabalhador: TrabalhadorAquisicao, geracao: int, tipo: str, prazo: float = 30.0):
+    limite = time.monotonic() + prazo
+    while True:
+        g, t, _, conteudo = trabalhador.resultados.get(timeout=max(limite - time.monotonic(), 0.01))
+        if g != geracao:
+            continue
+        if t == 'erro':
+            raise RuntimeError(conteudo)
+        if t == tipo:
+            return conteudo
+
+
+def medir_unica(bancada: Bancada, leituras: int, pasta: str) -> Dict:
+    # Como o app: comando 'unica' para a thread de aquisição e gravação do .json
+    trabalhador = TrabalhadorAquisicao(bancada.sensor)
+    trabalhador.start()
+    latencias = []
+    base = os.path.join(pasta, 'unica')
+    bancada.marcar()
+    inicio = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(leituras):
+                t0 = time.perf_counter()
+                dados = _aguardar(trabalhador, trabalhador.enviar('unica'), 'leitura')
+                bancada.sensor.salvar_dados(dados, base)
+                latencias.append(time.perf_counter() - t0)
+    finally:
+        trabalhador.parar()
+        trabalhador.join()
+    return _resumir(latencias, time.perf_counter() - inicio, bancada.trafego())
+
+
+def medir_continuo(bancada: Bancada, leituras: int, pasta: str) -> Dict:
+    trabalhador = TrabalhadorAquisicao(bancada.sensor)
+    trabalhador.start()
+    armazenamento = ArmazenamentoJSONL(os.path.join(pasta, 'continuo.jsonl'))
+    historico = HistoricoLimitado(1000, armazenamento, gravar_ao_adicionar=True)
+    latencias = []
+    bancada.marcar()
+    inicio = time.perf_counter()
+    try:
+        geracao = trabalhador.enviar('continuo', intervalo=0.0)
+        anterior = inicio
+        for _ in range(leituras):
+            historico.adicionar(_aguardar(trabalhador, geracao, 'leitura'))
+            agora = time.perf_counter()
+            latencias.append(agora - anterior)
+            anterior = agora
+        # Antes do cancelamento: a thread já pode ter começado a próxima leitura
+        duracao = time.perf_counter() - inicio
+        trafego = bancada.trafego()
+    finally:
+        trabalhador.parar()
+        trabalhador.join()
+        historico.fechar()
+        armazenamento.fechar()
+    return _resumir(latencias, duracao, trafego)
+
+
+def medir_media(bancada: Bancada, leituras: int, pasta: str) -> Dict:
+    trabalhador = TrabalhadorAquisicao(bancada.sensor)
+    trabalhador.start()
+    historico = HistoricoLimitado(1000)
+    latencias = []
+    bancada.marcar()
+    inicio = time.perf_counter()
+    try:
+        geracao = trabalhador.enviar('media', amostras=leituras, intervalo=0.0)
+        anterior = inicio
+        while True:
+            g, tipo, _, conteudo = trabalhador.resultados.get(timeout=30.0)
+            if g != geracao:
+                continue
+            if tipo == 'erro':
+                raise RuntimeError(conteudo)
+            if tipo == 'leitura':
+                historico.adicionar(conteudo)
+                agora = time.perf_counter()
+                latencias.append(agora - anterior)
+                anterior = agora
+            elif tipo == 'concluido':
+                estatisticas = conteudo
+                break
+        media = {'timestamp': datetime.now().isoformat(), **estatisticas.media()}
+        with contextlib.redirect_stdout(io.StringIO()):
+            bancada.sensor.salvar_media(list(historico), media, os.path.join(pasta, 'media'), estatisticas.resumo())
+    finally:
+        trabalhador.parar()
+        trabalhador.join()
+        historico.fechar()
+    resultado = _resumir(latencias, time.perf_counter() - inicio, bancada.trafego())
+    resultado['duracao_total_s'] = round(time.perf_counter() - inicio, 3)
+    return resultado
+
+
+def medir_npk(bancada: Bancada, leituras: int) -> Dict:
+    # Sensor com N, P e K fora do registrador padrão: primeira leitura com busca
+    # (perfil vazio) e leitura seguinte com o mapeamento já aprendido
+    sensor = bancada.sensor
+    resultado = {}
+    for nome, limpar in (('busca', True), ('perfil_aprendido', False)):
+        latencias = []
+        requisicoes = bytes_ = 0
+        duracao = 0.0
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(leituras):
+                if limpar:
+                    for nutriente in sensor.registradores_alternativos:
+                        sensor.perfil.remover_npk(sensor.chave_dispositivo, nutriente)
+                else:
+                    sensor.ler_todos_dados()
+                bancada.marcar()
+                t0 = time.perf_counter()
+                sensor.ler_todos_dados()
+                latencias.append(time.perf_counter() - t0)
+                duracao += latencias[-1]
+                trafego = bancada.trafego()
+                requisicoes += trafego['requisicoes']
+                bytes_ += trafego['bytes_recebidos'] + trafego['bytes_enviados']
+        resultado[nome] = _resumir(latencias, duracao, {'requisicoes': requisicoes, 'bytes_recebidos': bytes_,
+                                                        'bytes_enviados': 0})
+    return resultado
+
+
+def _leitura_exemplo(i: int) -> Dict:
+    return {'umidade': 32.5, 'temperatura': 24.8, 'ph': 6.4, 'condutividade': 420.0, 'nitrogenio': 38.0,
+            'fosforo': 21.0, 'potassio': 95.0, 'timestamp': datetime.fromtimestamp(1.7e9 + 10 * i).isoformat()}
+
+
+def medir_armazenamento(pasta: str, tamanhos: List[int]) -> Dict:
+    # Custo de acrescentar uma leitura a uma sessão que já tem N leituras.
+    # 'legado' é a regravação do {"leituras": [...]} inteiro a cada leitura (antes do JSONL)
+    resultado = {}
+    for formato in ('jsonl', 'binario', 'legado'):
+        resultado[formato] = {}
+        for tamanho in tamanhos:
+            caminho = os.path.join(pasta, f'sessao_{formato}_{tamanho}')
+            amostra = 20 if formato == 'legado' else 500
+            leituras = [_leitura_exemplo(i) for i in range(tamanho)]
+            if formato == 'legado':
+                t0 = time.perf_counter()
+                for dados in [_leitura_exemplo(tamanho + i) for i in range(amostra)]:
+                    leituras.append(dados)
+                    with open(caminho, 'w', encoding='utf-8') as f:
+                        json.dump({'leituras': leituras}, f, indent=2, ensure_ascii=False)
+                duracao = time.perf_counter() - t0
+            else:
+                classe = EscritorSessaoBinaria if formato == 'binario' else ArmazenamentoJSONL
+                escritor = classe(caminho)
+                for dados in leituras:
+                    escritor.adicionar(dados)
+                escritor.flush()
+                t0 = time.perf_counter()
+                for i in range(amostra):
+                    escritor.adicionar(_leitura_exemplo(tamanho + i))
+                duracao = time.perf_counter() - t0
+                escritor.fechar()
+            resultado[formato][str(tamanho)] = {
+                'us_por_leitura': round(duracao / amostra * 1e6, 1),
+                'bytes_por_leitura': round(os.path.getsize(caminho) / (tamanho + amostra), 1),
+            }
+            os.remove(caminho)
+    return resultado
+
+
+def _sessao_campo(leituras: int, inicio: float, rng: random.Random) -> List[Dict]:
+    # Passeio aleatório na resolução do sensor e intervalo de 10 s com jitter, como numa sessão real
+    valores = {'umidade': 32.5, 'temperatura': 24.8, 'ph': 6.4, 'condutividade': 420, 'nitrogenio': 38,
+               'fosforo': 21, 'potassio': 95}
+    passos = {'umidade': 0.1, 'temperatura': 0.1, 'ph': 0.1}
+    sessao = []
+    instante = inicio
+    for _ in range(leituras):
+        instante += 10 + rng.random() * 0.05
+        for parametro in valores:
+            if rng.random() < 0.3:
+                valores[parametro] += rng.choice((-1, 1)) * passos.get(parametro, 1)
+        dados = {p: round(v, 1) * 1.0 for p, v in valores.items()}
+        dados['timestamp'] = datetime.fromtimestamp(instante).isoformat()
+        sessao.append(dados)
+    return sessao
+
+
+def medir_arquivo_frio(pasta: str, sessoes: int = 20, leituras: int = 2880) -> Dict:
+    # Sessões contínuas de 8 h em JSON indentado (como o app grava) contra os segmentos
+    # de cada codec: bytes por leitura, razão sobre o JSON e leituras/s relendo tudo em fluxo
+    rng = random.Random(0)
+    origem = os.path.join(pasta, 'sessoes_frio')
+    os.makedirs(origem)
+    for i in range(sessoes):
+        with open(os.path.join(origem, f'dados_sensor_solo_continuo_{i}.json'), 'w', encoding='utf-8') as f:
+            json.dump({'leituras': _sessao_campo(leituras, 1.7e9 + i * 86400, rng)}, f, indent=2, ensure_ascii=False)
+    arquivos = sorted(os.listdir(origem))
+    bytes_json = sum(os.path.getsize(os.path.join(origem, a)) for a in arquivos)
+    total = sessoes * leituras
+
+    t0 = time.perf_counter()
+    for arquivo in arquivos:
+        with open(os.path.join(origem, arquivo), 'r', encoding='utf-8') as f:
+            for _ in json.load(f)['leituras']:
+                pass
+    resultado = {'json': {'bytes_por_leitura': round(bytes_json / total, 1), 'razao': 1.0,
+                          'leituras_por_segundo': round(total / (time.perf_counter() - t0))}}
+    for codec in ('nenhum', 'gzip', 'lzma'):
+        destino = os.path.join(pasta, f'frio_{codec}')
+        arquivador = ArquivadorSessoes(destino, codec, idade_minima=0, remover_originais=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            resumo = arquivador.arquivar([origem])
+            duracao_arquivar = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        lidas = sum(1 for segmento in resumo['segmentos']
+                    for _ in leituras_arquivadas(os.path.join(destino, segmento)))
+        duracao_leitura = time.perf_counter() - t0
+        resultado[codec] = {
+            'bytes_por_leitura': round(resumo['bytes_arquivo'] / total, 2),
+            'razao': round(bytes_json / resumo['bytes_arquivo'], 1),
+            'leituras_por_segundo': round(lidas / duracao_leitura),
+            'arquivar_us_por_leitura': round(duracao_arquivar / total * 1e6, 1),
+        }
+    return resultado
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executar(modos: List[str] = MODOS, leituras: int = 20, baudrate: int = 4800, latencia: float = 0.02,
+             tamanhos: List[int] = (100, 1000, 10000), usar_minimalmodbus: bool = False) -> Dict:
+    pasta = tempfile.mkdtemp(prefix='benchmark_sensor_')
+    resultados = {}
+    try:
+        for modo in modos:
+            if modo == 'armazenamento':
+                resultados[modo] = medir_armazenamento(pasta, list(tamanhos))
+                continue
+            if modo == 'arquivo_frio':
+                resultados[modo] = medir_arquivo_frio(pasta)
+                continue
+            bancada = Bancada(pasta, baudrate, latencia, npk_alternativo=(modo == 'npk'),
+                              usar_minimalmodbus=usar_minimalmodbus)
+            try:
+                if modo == 'npk':
+                    resultados[modo] = medir_npk(bancada, max(leituras // 4, 1))
+                else:
+                    medir = {'unica': medir_unica, 'continuo': medir_continuo, 'media': medir_media}[modo]
+                    resultados[modo] = medir(bancada, leituras, pasta)
+            finally:
+                bancada.fechar()
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+    return {
+        'versao': 1,
+        'commit': _commit(),
+        'data': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'parametros': {'leituras': leituras, 'baudrate': baudrate, 'latencia': latencia,
+                       'driver': 'minimalmodbus' if usar_minimalmodbus else 'rtu'},
+        'resultados': resultados,
+    }
+
+
+def _metricas(resultados: Dict, prefixo: str = '') -> Dict[str, float]:
+    # Achata {'unica': {'latencia_p50_ms': x}} em {'unica.latencia_p50_ms': x}
+    planas = {}
+    for chave, valor in resultados.items():
+        nome = f"{prefixo}{chave}"
+        if isinstance(valor, dict):
+            planas.update(_metricas(valor, nome + '.'))
+        elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            planas[nome] = valor
+    return planas
+
+
+def comparar(atual: Dict, base: Dict, limite: float = 0.10) -> int:
+    # Imprime as variações e devolve quantas métricas pioraram mais que o limite
+    metricas_atual = _metricas(atual['resultados'])
+    metricas_base = _metricas(base['resultados'])
+    regressoes = 0
+    print(f"{'métrica':<45} {'base':>12} {'atual':>12} {'variação':>9}")
+    for nome in sorted(metricas_atual.keys() & metricas_base.keys()):
+        antes, depois = metricas_base[nome], metricas_atual[nome]
+        if nome.endswith('.leituras') or not antes:
+            continue
+        variacao = (depois - antes) / antes
+        piorou = -variacao if nome.endswith(MAIOR_MELHOR) else variacao
+        marca = ''
+        if piorou > limite:
+            marca = '  <- regressão'
+            regressoes += 1
+        elif piorou < -limite:
+            marca = '  <- melhoria'
+        print(f"{nome:<45} {antes:>12} {depois:>12} {variacao:>+8.1%}{marca}")
+    return regressoes
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description="Benchmark do driver do sensor contra o simulador")
+    parser.add_argument('--modos', nargs='+', choices=MODOS, default=MODOS)
+    parser.add_argument('--leituras', type=int, default=20, help="Leituras por modo")
+    parser.add_argument('--baudrate', type=int, default=4800)
+    parser.add_argument('--latencia', type=float, default=0.02, help="Latência do escravo simulado em segundos")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[100, 1000, 10000],
+                        help="Tamanhos de sessão para o custo de armazenamento")
+    parser.add_argument('--minimalmodbus', action='store_true', help="Usa o caminho minimalmodbus em vez do codec RTU")
+    parser.add_argument('--saida', help="Grava os resultados neste arquivo JSON")
+    parser.add_argument('--comparar', help="Resultado anterior (JSON) para comparar")
+    parser.add_argument('--limite', type=float, default=0.10, help="Piora relativa considerada regressão")
+    args = parser.parse_args()
+
+    resultado = executar(args.modos, args.leituras, args.baudrate, args.latencia, args.tamanhos, args.minimalmodbus)
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            base = json.load(f)
+        if comparar(resultado, base, args.limite):
+            sys.exit(1)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Catálogo das sessões gravadas pelo Sensor de Solo 7 em 1
+Banco SQLite com um registro por arquivo (modo, intervalo de tempo, número de
+leituras, endereço do escravo) e um contador por nome base, para alocar o
+próximo arquivo sem varrer o diretório
+"""
+
+import glob
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+EXTENSOES = ('.json', '.jsonl', '.tsb')
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS contadores (
+    base TEXT PRIMARY KEY,
+    proximo INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    arquivo TEXT NOT NULL UNIQUE,
+    modo TEXT NOT NULL,
+    inicio TEXT,
+    fim TEXT,
+    leituras INTEGER NOT NULL DEFAULT 0,
+    escravo INTEGER,
+    criado_em TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessoes_periodo ON sessoes (inicio, fim);
+CREATE INDEX IF NOT EXISTS idx_sessoes_modo_fim ON sessoes (modo, fim);
+"""
+
+
+class LoteLeituras:
+    # Conta as leituras de uma sessão em andamento e grava no catálogo a cada 'a_cada'
+    # leituras e no fechamento: um commit do SQLite por lote em vez de um por leitura
+
+    def __init__(self, catalogo: 'CatalogoSessoes', sessao_id: int, a_cada: int = 30):
+        self.catalogo = catalogo
+        self.sessao_id = sessao_id
+        self.a_cada = max(a_cada, 1)
+        self._inicio = None
+        self._fim = None
+        self._pendentes = 0
+
+    def adicionar(self, timestamp: Optional[str]):
+        if self._inicio is None:
+            self._inicio = timestamp
+        self._fim = timestamp or self._fim
+        self._pendentes += 1
+        if self._pendentes >= self.a_cada:
+            self.gravar()
+
+    def gravar(self):
+        if not self._pendentes:
+            return
+        self.catalogo.registrar_leituras(self.sessao_id, self._inicio, self._fim, self._pendentes)
+        self._inicio = self._fim = None
+        self._pendentes = 0
+
+    def fechar(self):
+        self.gravar()
+
+
+class CatalogoSessoes:
+    def __init__(self, caminho: str = "catalogo_sessoes.db"):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        # A interface e a thread de aquisição podem salvar; o lock serializa o acesso
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.row_factory = sqlite3.Row
+        with self._conexao:
+            self._conexao.executescript(_ESQUEMA)
+
+    def _proximo_existente(self, base: str) -> int:
+        # Só na primeira alocação de cada base: continua a numeração dos arquivos já existentes
+        padrao = re.compile(re.escape(os.path.basename(base)) + r'_(\d+)(' + '|'.join(map(re.escape, EXTENSOES)) + r')$')
+        maior = 0
+        for caminho in glob.iglob(glob.escape(base) + '_*'):
+            achado = padrao.match(os.path.basename(caminho))
+            if achado:
+                maior = max(maior, int(achado.group(1)))
+        return maior + 1
+
+    def alocar_arquivo(self, base: str, extensao: str, modo: str, escravo: Optional[int] = None) -> Tuple[int, str]:
+        with self._lock, self._conexao:
+            linha = self._conexao.execute("SELECT proximo FROM contadores WHERE base = ?", (base,)).fetchone()
+            numero = linha['proximo'] if linha else self._proximo_existente(base)
+            arquivo = f"{base}_{numero}{extensao}"
+            # Proteção contra arquivos criados fora do app com o mesmo nome
+            while any(os.path.exists(f"{base}_{numero}{ext}") for ext in EXTENSOES):
+                numero += 1
+                arquivo = f"{base}_{numero}{extensao}"
+            self._conexao.execute("INSERT OR REPLACE INTO contadores (base, proximo) VALUES (?, ?)",
+                                  (base, numero + 1))
+            cursor = self._conexao.execute(
+                "INSERT INTO sessoes (arquivo, modo, escravo, criado_em) VALUES (?, ?, ?, ?)",
+                (arquivo, modo, escravo, datetime.now().isoformat()))
+            return cursor.lastrowid, arquivo
+
+    def registrar_leituras(self, sessao_id: int, inicio: Optional[str], fim: Optional[str], quantidade: int = 1):
+        with self._lock, self._conexao:
+            self._conexao.execute(
+                "UPDATE sessoes SET inicio = COALESCE(inicio, ?), fim = COALESCE(?, fim), "
+                "leituras = leituras + ? WHERE id = ?",
+                (inicio, fim, quantidade, sessao_id))
+
+    def remover(self, sessao_id: int):
+        with self._lock, self._conexao:
+            self._conexao.execute("DELETE FROM sessoes WHERE id = ?", (sessao_id,))
+
+    def _consultar(self, sql: str, parametros=()) -> List[Dict]:
+        with self._lock:
+            return [dict(linha) for linha in self._conexao.execute(sql, parametros)]
+
+    def sessoes(self, modo: Optional[str] = None) -> List[Dict]:
+        if modo is None:
+            return self._consultar("SELECT * FROM sessoes ORDER BY id")
+        return self._consultar("SELECT * FROM sessoes WHERE modo = ? ORDER BY id", (modo,))
+
+    def sessoes_entre(self, inicio: str, fim: str, modo: Optional[str] = None) -> List[Dict]:
+        # Sessões com alguma leitura no intervalo [inicio, fim] (timestamps ISO)
+        sql = "SELECT * FROM sessoes WHERE inicio <= ? AND fim >= ?"
+        parametros = [fim, inicio]
+        if modo is not None:
+            sql += " AND modo = ?"
+            parametros.append(modo)
+        return self._consultar(sql + " ORDER BY inicio", parametros)
+
+    def ultima(self, modo: str) -> Optional[Dict]:
+        linhas = self._consultar("SELECT * FROM sessoes WHERE modo = ? AND fim IS NOT NULL "
+                                 "ORDER BY fim DESC LIMIT 1", (modo,))
+        return linhas[0] if linhas else None
+
+    def ultima_media(self) -> Optional[Dict]:
+        return self.ultima('media')
+
+    def fechar(self):
+        with self._lock:
+            self._conexao.close()
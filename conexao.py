@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Gerenciador de conexão do Sensor de Solo 7 em 1
+Detecta a queda da porta (cabo USB removido, erro serial), localiza de novo o
+adaptador pelo VID/PID ou pela descrição e reabre a conexão em segundo plano,
+com espera crescente entre tentativas. No Android, a permissão USB é esperada
+por evento (BroadcastReceiver) e não pedida de novo enquanto continuar válida
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+import modbus_rtu
+
+try:
+    import usb4a.usb as usb
+    ANDROID = True
+except ImportError:
+    usb = None
+    ANDROID = False
+
+try:
+    import minimalmodbus
+except ImportError:
+    minimalmodbus = None
+
+# Conversor USB-RS485 CH340 que acompanha o sensor
+VID_PADRAO = 0x1A86  # 6790
+PID_PADRAO = 0x7523  # 29987
+
+# Ação usada pelo usb4a no PendingIntent do pedido de permissão
+ACAO_PERMISSAO_USB = "com.android.example.USB_PERMISSION"
+ACAO_USB_CONECTADO = "android.hardware.usb.action.USB_DEVICE_ATTACHED"
+ACAO_USB_DESCONECTADO = "android.hardware.usb.action.USB_DEVICE_DETACHED"
+
+DESCONECTADO = 'desconectado'
+AGUARDANDO_PERMISSAO = 'aguardando_permissao'
+CONECTADO = 'conectado'
+
+
+def erro_de_conexao(erro: Exception) -> bool:
+    # Erros de protocolo (timeout, CRC, exceção) são da sonda e ficam com os disjuntores;
+    # erros de E/S e porta ausente (None) são da conexão
+    if isinstance(erro, modbus_rtu.ErroModbus):
+        return False
+    if minimalmodbus is not None and isinstance(erro, minimalmodbus.ModbusException):
+        return False
+    if isinstance(erro, AttributeError) and "'NoneType'" in str(erro):
+        return True
+    return isinstance(erro, OSError)
+
+
+def localizar_porta(vid: Optional[int] = VID_PADRAO, pid: Optional[int] = PID_PADRAO,
+                    descricao: Optional[str] = None) -> Optional[str]:
+    # PC: o adaptador pode voltar com outro nome (ttyUSB0 -> ttyUSB1, COM3 -> COM4)
+    import serial.tools.list_ports
+    portas = list(serial.tools.list_ports.comports())
+    if vid is not None and pid is not None:
+        for porta in portas:
+            if porta.vid == vid and porta.pid == pid:
+                return porta.device
+    if descricao:
+        for porta in portas:
+            if descricao.lower() in (porta.description or '').lower():
+                return porta.device
+    return None
+
+
+def porta_presente(nome: str) -> bool:
+    import os
+    import serial.tools.list_ports
+    return os.path.exists(nome) or any(p.device == nome for p in serial.tools.list_ports.comports())
+
+
+def localizar_dispositivo_android(vid: int = VID_PADRAO, pid: int = PID_PADRAO):
+    for dispositivo in usb.get_usb_device_list() or []:
+        if dispositivo.getVendorId() == vid and dispositivo.getProductId() == pid:
+            return dispositivo
+    return None
+
+
+class PermissaoUSB:
+    # Um pedido por dispositivo de cada vez; a resposta chega pelo BroadcastReceiver.
+    # Sem o receiver (ex.: Pydroid), uma thread consulta a permissão a cada 0,25 s,
+    # sem bloquear quem pediu além do prazo de aguardar()
+
+    def __init__(self, ao_evento_usb: Optional[Callable[[str], None]] = None):
+        self.ao_evento_usb = ao_evento_usb
+        self._respondido = threading.Event()
+        self._pedidos = set()
+        self._receptor = None
+        try:
+            from android.broadcast import BroadcastReceiver
+            self._receptor = BroadcastReceiver(self._ao_receber, actions=[
+                ACAO_PERMISSAO_USB, ACAO_USB_CONECTADO, ACAO_USB_DESCONECTADO])
+            self._receptor.start()
+        except Exception:
+            self._receptor = None
+
+    def _ao_receber(self, contexto, intent):
+        acao = intent.getAction()
+        if acao == ACAO_PERMISSAO_USB:
+            self._respondido.set()
+        elif self.ao_evento_usb is not None:
+            self.ao_evento_usb(acao)
+
+    def _consultar(self, dispositivo, limite: float):
+        while time.monotonic() < limite and not usb.has_usb_permission(dispositivo):
+            if self._respondido.wait(0.25):
+                return
+        self._respondido.set()
+
+    def aguardar(self, dispositivo, prazo: float = 30.0) -> bool:
+        if usb.has_usb_permission(dispositivo):
+            return True
+        nome = dispositivo.getDeviceName()
+        if nome not in self._pedidos:
+            # O Android mostra o diálogo uma vez; repetir o pedido só empilharia diálogos
+            self._pedidos.add(nome)
+            self._respondido.clear()
+            usb.request_usb_permission(dispositivo)
+            if self._receptor is None:
+                threading.Thread(target=self._consultar, args=(dispositivo, time.monotonic() + prazo),
+                                 name="permissao-usb", daemon=True).start()
+        self._respondido.wait(prazo)
+        concedida = usb.has_usb_permission(dispositivo)
+        if concedida or self._respondido.is_set():
+            # Respondido (sim ou não): um novo pedido pode mostrar o diálogo de novo
+            self._pedidos.discard(nome)
+        return concedida
+
+    def encerrar(self):
+        if self._receptor is not None:
+            self._receptor.stop()
+            self._receptor = None
+
+
+class GerenciadorConexao(threading.Thread):
+    # ao_mudar(estado, detalhe) é chamado nesta thread: a interface deve repassar ao seu loop.
+    # Enquanto o adaptador não aparece, a busca se repete a cada intervalo_busca; se ele
+    # aparece mas não abre, a espera dobra de espera_inicial até espera_maxima
+
+    def __init__(self, sensor, vid: int = VID_PADRAO, pid: int = PID_PADRAO, descricao: Optional[str] = None,
+                 intervalo_busca: float = 0.5, espera_inicial: float = 0.5, espera_maxima: float = 30.0,
+                 ao_mudar: Optional[Callable[[str, str], None]] = None):
+        super().__init__(name="conexao-sensor", daemon=True)
+        self.sensor = sensor
+        self.vid = vid
+        self.pid = pid
+        self.descricao = descricao
+        self.intervalo_busca = intervalo_busca
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.ao_mudar = ao_mudar
+        self.estado = DESCONECTADO
+        self.quedas = 0
+        self.conexoes = 0
+        self.ultima_queda = None
+        self._conectado = threading.Event()
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self.permissao = PermissaoUSB(self._ao_evento_usb) if ANDROID else None
+        sensor.conexao = self
+
+    def disponivel(self) -> bool:
+        return self._conectado.is_set()
+
+    def aguardar(self, prazo: Optional[float] = None) -> bool:
+        return self._conectado.wait(prazo)
+
+    def _mudar(self, estado: str, detalhe: str = ""):
+        self.estado = estado
+        if self.ao_mudar is not None:
+            self.ao_mudar(estado, detalhe)
+
+    def queda(self, erro: Exception) -> bool:
+        # Chamado por quem lê: devolve True se o erro é de conexão (e dispara a reconexão)
+        if not erro_de_conexao(erro):
+            return False
+        if self._conectado.is_set():
+            self._conectado.clear()
+            self.quedas += 1
+            self.ultima_queda = time.time()
+            print(f"Conexão perdida: {erro}")
+            self._mudar(DESCONECTADO, str(erro))
+            self._acordar.set()
+        return True
+
+    def _ao_evento_usb(self, acao: str):
+        if acao == ACAO_USB_DESCONECTADO:
+            self.queda(OSError("Adaptador USB removido"))
+        else:
+            self._acordar.set()
+
+    def _localizar(self):
+        # Devolve o dispositivo (Android) ou a porta (PC) a abrir, ou None se não está presente
+        if ANDROID:
+            return localizar_dispositivo_android(self.vid, self.pid)
+        if self.sensor.usb_vid is not None:
+            # Depois da primeira conexão vale o VID/PID que o sensor realmente usou
+            return localizar_porta(self.sensor.usb_vid, self.sensor.usb_pid, self.descricao)
+        porta = localizar_porta(self.vid, self.pid, self.descricao)
+        if porta is None and self.sensor.porta_com and porta_presente(self.sensor.porta_com):
+            # Portas sem VID/PID (ex.: pseudo-terminal do simulador, RS485 nativa) mantêm o nome
+            porta = self.sensor.porta_com
+        return porta
+
+    def _conectar(self) -> Optional[bool]:
+        # True conectou; False falhou (espera crescente); None adaptador ausente (nova busca logo)
+        alvo = self._localizar()
+        if alvo is None:
+            return None
+        if ANDROID:
+            if not self.permissao.aguardar(alvo):
+                self._mudar(AGUARDANDO_PERMISSAO, alvo.getDeviceName())
+                return False
+        else:
+            self.sensor.porta_com = alvo
+        try:
+            self.sensor.desconectar()
+            self.sensor.conectar(alvo if ANDROID else None)
+        except Exception as e:
+            print(f"Falha ao reconectar: {e}")
+            return False
+        return True
+
+    def run(self):
+        espera = self.espera_inicial
+        while not self._parar.is_set():
+            if self._conectado.is_set():
+                self._acordar.wait()
+                self._acordar.clear()
+                continue
+            resultado = self._conectar()
+            if resultado:
+                espera = self.espera_inicial
+                self.conexoes += 1
+                self._conectado.set()
+                self._mudar(CONECTADO)
+                continue
+            if resultado is None:
+                self._acordar.wait(self.intervalo_busca)
+            else:
+                self._acordar.wait(espera)
+                espera = min(espera * 2, self.espera_maxima)
+            self._acordar.clear()
+
+    def parar(self):
+        self._parar.set()
+        self._acordar.set()
+        if self.permissao is not None:
+            self.permissao.encerrar()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Modo daemon do Sensor de Solo 7 em 1, sem interface gráfica
+Leitura contínua, única ou média de uma ou mais portas e escravos, configurada
+pela linha de comando. Não importa o Kivy: inicia rápido e ocupa pouca memória
+em gateways sem tela (ex.: Raspberry Pi)
+"""
+
+import contextlib
+import json
+import os
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from barramento import EscalonadorBarramento
+from catalogo import CatalogoSessoes
+
+
+def _base_arquivo(base: str, porta: str, escravo: int, varios: bool) -> str:
+    # Com mais de uma porta ou escravo, cada origem tem a sua sequência de arquivos
+    if not varios:
+        return base
+    return f"{base}_{os.path.basename(porta)}_e{escravo}"
+
+
+# Destino das leituras em JSON. Com --json, main() manda os avisos do driver, do barramento
+# e do armazenamento para stderr, e a saída padrão fica só com as linhas JSON
+saida_json = None
+
+
+def _imprimir(porta: str, escravo: int, dados: Dict):
+    print(json.dumps({'porta': porta, 'escravo': escravo, **dados}, ensure_ascii=False),
+          file=saida_json or sys.stdout, flush=True)
+
+
+def _por_porta(portas: List[str], funcao: Callable[[str], None]):
+    # Uma thread por adaptador, como no LeitorMultiPorta
+    with ThreadPoolExecutor(max_workers=len(portas), thread_name_prefix="porta") as executor:
+        for futuro in [executor.submit(funcao, porta) for porta in portas]:
+            futuro.result()
+
+
+def executar_continuo(portas: List[str], escravos: List[int], baudrate: int = 4800, intervalo: float = 10.0,
+                      base: str = "dados_sensor_solo", formato: str = 'jsonl', imprimir: bool = False,
+                      arquivo_catalogo: str = "catalogo_sessoes.db", parar: Optional[threading.Event] = None):
+    from multiporta import LeitorMultiPorta
+    if formato == 'binario':
+        from sessao_binaria import EscritorSessaoBinaria as Escritor
+    else:
+        from armazenamento import ArmazenamentoJSONL as Escritor
+    extensao = '.tsb' if formato == 'binario' else '.jsonl'
+    catalogo = CatalogoSessoes(arquivo_catalogo)
+    leitor = LeitorMultiPorta(portas, escravos, baudrate, periodos={e: intervalo for e in escravos})
+    if parar is not None:
+        leitor.parar = parar
+    varios = len(portas) * len(escravos) > 1
+    sessoes = {}
+    try:
+        for porta, escravo, dados in leitor.fluxo():
+            if (porta, escravo) not in sessoes:
+                sessao_id, arquivo = catalogo.alocar_arquivo(
+                    f"{_base_arquivo(base, porta, escravo, varios)}_continuo", extensao, 'continuo', escravo)
+                print(f"Sessão de {porta} escravo {escravo} em {arquivo}")
+                sessoes[(porta, escravo)] = (sessao_id, Escritor(arquivo))
+            sessao_id, escritor = sessoes[(porta, escravo)]
+            escritor.adicionar(dados)
+            catalogo.registrar_leituras(sessao_id, dados['timestamp'], dados['timestamp'])
+            if imprimir:
+                _imprimir(porta, escravo, dados)
+    finally:
+        leitor.encerrar()
+        for _, escritor in sessoes.values():
+            escritor.fechar()
+        catalogo.fechar()
+
+
+def executar_unica(portas: List[str], escravos: List[int], baudrate: int = 4800,
+                   base: str = "dados_sensor_solo", imprimir: bool = False, tentativas: int = 3,
+                   parar: Optional[threading.Event] = None):
+    varios = len(portas) * len(escravos) > 1
+
+    def ler(porta: str):
+        if parar is not None and parar.is_set():
+            return
+        barramento = EscalonadorBarramento(porta, escravos, baudrate, tentativas=tentativas)
+        try:
+            for escravo, dados in barramento.ler_ciclo(parar).items():
+                barramento.sensores[escravo].salvar_dados(dados, _base_arquivo(base, porta, escravo, varios))
+                if imprimir:
+                    _imprimir(porta, escravo, dados)
+        finally:
+            barramento.fechar()
+
+    _por_porta(portas, ler)
+
+
+def executar_media(portas: List[str], escravos: List[int], baudrate: int = 4800, amostras: int = 10,
+                   intervalo: float = 10.0, tolerancia: Optional[float] = None, base: str = "dados_sensor_solo",
+                   imprimir: bool = False, tentativas: int = 3, parar: Optional[threading.Event] = None):
+    from estatisticas import EstatisticasLeituras
+    parar = parar or threading.Event()
+    varios = len(portas) * len(escravos) > 1
+
+    def ler(porta: str):
+        barramento = EscalonadorBarramento(porta, escravos, baudrate, tentativas=tentativas)
+        estatisticas = {e: EstatisticasLeituras() for e in escravos}
+        leituras = {e: [] for e in escravos}
+        try:
+            for i in range(amostras):
+                if i and parar.wait(intervalo):
+                    break
+                for escravo, dados in barramento.ler_ciclo(parar).items():
+                    estatisticas[escravo].adicionar(dados)
+                    leituras[escravo].append(dados)
+                print(f"{porta}: amostra {i + 1}/{amostras}")
+                if tolerancia is not None and all(e.convergiu(tolerancia) for e in estatisticas.values()):
+                    break
+            for escravo, acumulado in estatisticas.items():
+                if not acumulado.amostras:
+                    print(f"{porta}: escravo {escravo} sem leituras, média não salva")
+                    continue
+                media = {'timestamp': datetime.now().isoformat(), **acumulado.media()}
+                barramento.sensores[escravo].salvar_media(leituras[escravo], media,
+                                                          _base_arquivo(base, porta, escravo, varios),
+                                                          acumulado.resumo())
+                if imprimir:
+                    _imprimir(porta, escravo, media)
+        finally:
+            barramento.fechar()
+
+    _por_porta(portas, ler)
+
+
+def main(argumentos: Optional[List[str]] = None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Leitura do sensor de solo 7 em 1 sem interface gráfica")
+    parser.add_argument('modo', choices=['continuo', 'unica', 'media'])
+    parser.add_argument('--portas', nargs='+', required=True, help="Portas seriais, ex.: /dev/ttyUSB0 /dev/ttyUSB1")
+    parser.add_argument('--escravos', type=int, nargs='+', default=[1], help="Endereços Modbus em cada porta")
+    parser.add_argument('--baudrate', type=int, default=4800)
+    parser.add_argument('--intervalo', type=float, default=10.0, help="Segundos entre leituras/amostras")
+    parser.add_argument('--amostras', type=int, default=10, help="Amostras do modo média")
+    parser.add_argument('--tolerancia', type=float, default=None,
+                        help="Encerra a média quando o IC de 95%% fica abaixo desta fração da média")
+    parser.add_argument('--arquivo', default="dados_sensor_solo", help="Nome base dos arquivos")
+    parser.add_argument('--formato', choices=['jsonl', 'binario'], default='jsonl', help="Formato do modo contínuo")
+    parser.add_argument('--json', action='store_true', help="Imprime cada leitura em JSON na saída padrão")
+    args = parser.parse_args(argumentos)
+
+    parar = threading.Event()
+    # Ctrl+C e SIGTERM (systemd, docker stop) terminam a leitura em andamento e
+    # fecham sessões e portas, em vez de interromper as threads no meio
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sinal, lambda *_: parar.set())
+    global saida_json
+    saida_json = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr) if args.json else contextlib.nullcontext():
+        if args.modo == 'continuo':
+            executar_continuo(args.portas, args.escravos, args.baudrate, args.intervalo, args.arquivo,
+                              args.formato, args.json, parar=parar)
+        elif args.modo == 'unica':
+            executar_unica(args.portas, args.escravos, args.baudrate, args.arquivo, args.json, parar=parar)
+        else:
+            executar_media(args.portas, args.escravos, args.baudrate, args.amostras, args.intervalo,
+                           args.tolerancia, args.arquivo, args.json, parar=parar)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Decimação de séries longas do Sensor de Solo 7 em 1 para gráficos
+Pirâmide incremental de baldes mín/máx (custo O(1) amortizado por leitura e
+memória fixa) e Largest-Triangle-Three-Buckets para reduzir ao número de
+pixels do gráfico. O custo de desenhar depende da largura, não da sessão
+"""
+
+import math
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+PARAMETROS = ['umidade', 'temperatura', 'ph', 'condutividade', 'nitrogenio', 'fosforo', 'potassio']
+
+Ponto = Tuple[float, float]
+
+
+def lttb(pontos: Sequence[Ponto], limite: int) -> List[Ponto]:
+    # Sveinn Steinarsson (2013): mantém primeiro e último ponto e, em cada balde,
+    # o ponto que forma o maior triângulo com o escolhido antes e a média do balde seguinte
+    n = len(pontos)
+    if limite >= n or limite < 3:
+        return list(pontos)
+    escolhidos = [pontos[0]]
+    passo = (n - 2) / (limite - 2)
+    anterior = pontos[0]
+    for i in range(limite - 2):
+        inicio = int(i * passo) + 1
+        fim = int((i + 1) * passo) + 1
+        # Média do próximo balde (o último "balde" é o ponto final)
+        prox_inicio, prox_fim = fim, min(int((i + 2) * passo) + 1, n)
+        if prox_inicio >= n - 1 or prox_fim <= prox_inicio:
+            media_x, media_y = pontos[-1]
+        else:
+            quantidade = prox_fim - prox_inicio
+            media_x = sum(p[0] for p in pontos[prox_inicio:prox_fim]) / quantidade
+            media_y = sum(p[1] for p in pontos[prox_inicio:prox_fim]) / quantidade
+        ax, ay = anterior
+        maior_area = -1.0
+        melhor = pontos[inicio]
+        for ponto in pontos[inicio:fim]:
+            area = abs((ax - media_x) * (ponto[1] - ay) - (ax - ponto[0]) * (media_y - ay))
+            if area > maior_area:
+                maior_area = area
+                melhor = ponto
+        escolhidos.append(melhor)
+        anterior = melhor
+    escolhidos.append(pontos[-1])
+    return escolhidos
+
+
+class SerieDecimada:
+    # Até `baldes` baldes de tamanho igual com o mínimo e o máximo de cada um.
+    # Quando enche, baldes vizinhos são unidos e o tamanho dobra: a série inteira
+    # fica sempre representada com no máximo 2 * baldes pontos
+
+    def __init__(self, baldes: int = 1024):
+        self.baldes = max(baldes, 2)
+        self.tamanho_balde = 1
+        # Cada balde: [quantidade, x do mínimo, mínimo, x do máximo, máximo]
+        self._baldes: List[list] = []
+        self.total = 0
+        self.minimo = None
+        self.maximo = None
+        self.inicio = None
+        self.fim = None
+
+    def __len__(self) -> int:
+        return self.total
+
+    def adicionar(self, x: float, y: Optional[float]):
+        if y is None or (isinstance(y, float) and math.isnan(y)):
+            return
+        ultimo = self._baldes[-1] if self._baldes else None
+        if ultimo is not None and ultimo[0] < self.tamanho_balde:
+            ultimo[0] += 1
+            if y < ultimo[2]:
+                ultimo[1], ultimo[2] = x, y
+            if y > ultimo[4]:
+                ultimo[3], ultimo[4] = x, y
+        else:
+            self._baldes.append([1, x, y, x, y])
+            if len(self._baldes) > self.baldes:
+                self._compactar()
+        self.total += 1
+        self.minimo = y if self.minimo is None else min(self.minimo, y)
+        self.maximo = y if self.maximo is None else max(self.maximo, y)
+        if self.inicio is None:
+            self.inicio = x
+        self.fim = x
+
+    def _compactar(self):
+        unidos = []
+        for i in range(0, len(self._baldes), 2):
+            par = self._baldes[i:i + 2]
+            if len(par) == 1:
+                unidos.append(par[0])
+                continue
+            a, b = par
+            minimo = a if a[2] <= b[2] else b
+            maximo = a if a[4] >= b[4] else b
+            unidos.append([a[0] + b[0], minimo[1], minimo[2], maximo[3], maximo[4]])
+        self._baldes = unidos
+        self.tamanho_balde *= 2
+
+    def pontos(self) -> List[Ponto]:
+        # Mínimo e máximo de cada balde na ordem do tempo
+        resultado = []
+        for _, x_min, y_min, x_max, y_max in self._baldes:
+            if x_min == x_max:
+                resultado.append((x_min, y_min))
+            elif x_min < x_max:
+                resultado.append((x_min, y_min))
+                resultado.append((x_max, y_max))
+            else:
+                resultado.append((x_max, y_max))
+                resultado.append((x_min, y_min))
+        return resultado
+
+    def decimar(self, limite: int) -> List[Ponto]:
+        return lttb(self.pontos(), limite)
+
+
+def _epoch(timestamp) -> Optional[float]:
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class SeriesLeituras:
+    # Uma SerieDecimada por parâmetro, alimentada com os dicts de ler_todos_dados
+
+    def __init__(self, parametros: Iterable[str] = PARAMETROS, baldes: int = 1024):
+        self.series: Dict[str, SerieDecimada] = {p: SerieDecimada(baldes) for p in parametros}
+
+    def adicionar(self, dados: Dict):
+        x = _epoch(dados.get('timestamp'))
+        if x is None:
+            return
+        for parametro, serie in self.series.items():
+            valor = dados.get(parametro)
+            if isinstance(valor, (int, float)):
+                serie.adicionar(x, valor)
+
+    def carregar(self, leituras: Iterable[Dict]):
+        for dados in leituras:
+            self.adicionar(dados)
+
+    def __getitem__(self, parametro: str) -> SerieDecimada:
+        return self.series[parametro]
+
+
+def series_de_sessao(caminho: str, baldes: int = 1024) -> SeriesLeituras:
+    from historico import ler_sessao
+    series = SeriesLeituras(baldes=baldes)
+    series.carregar(ler_sessao(caminho))
+    return series
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Disjuntores (circuit breakers) do barramento Modbus do Sensor de Solo 7 em 1
+Depois de N falhas seguidas o disjuntor abre e as leituras voltam None na hora,
+sem transação nem espera. Em intervalos que dobram a cada nova falha, uma
+única leitura de teste (meio aberto) decide se ele fecha ou abre de novo
+"""
+
+import time
+from typing import Dict, Optional
+
+FECHADO = 'fechado'
+ABERTO = 'aberto'
+MEIO_ABERTO = 'meio_aberto'
+
+
+class CircuitoAberto(Exception):
+    pass
+
+
+class Disjuntor:
+    def __init__(self, limite_falhas: int = 3, espera_inicial: float = 2.0, espera_maxima: float = 60.0):
+        self.limite_falhas = max(limite_falhas, 1)
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.estado = FECHADO
+        self.falhas = 0
+        self.sucessos = 0
+        self.aberturas = 0
+        self.rejeitadas = 0
+        self.proxima_tentativa = 0.0
+
+    def permitir(self, agora: Optional[float] = None) -> bool:
+        if self.estado != ABERTO:
+            return True
+        agora = time.monotonic() if agora is None else agora
+        if agora >= self.proxima_tentativa:
+            self.estado = MEIO_ABERTO
+            return True
+        self.rejeitadas += 1
+        return False
+
+    def registrar_sucesso(self):
+        self.estado = FECHADO
+        self.falhas = 0
+        self.aberturas = 0
+        self.sucessos += 1
+
+    def registrar_falha(self, agora: Optional[float] = None) -> bool:
+        # Devolve True quando esta falha abriu o disjuntor
+        self.falhas += 1
+        if self.estado == MEIO_ABERTO or self.falhas >= self.limite_falhas:
+            agora = time.monotonic() if agora is None else agora
+            espera = min(self.espera_inicial * 2 ** self.aberturas, self.espera_maxima)
+            self.aberturas += 1
+            self.estado = ABERTO
+            self.proxima_tentativa = agora + espera
+            return True
+        return False
+
+    def instantaneo(self, agora: Optional[float] = None) -> Dict:
+        agora = time.monotonic() if agora is None else agora
+        return {
+            'estado': self.estado,
+            'falhas': self.falhas,
+            'rejeitadas': self.rejeitadas,
+            'proxima_tentativa_s': round(max(self.proxima_tentativa - agora, 0.0), 1) if self.estado == ABERTO else None,
+        }
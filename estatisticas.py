@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Estatísticas incrementais para o modo Média do Sensor de Solo 7 em 1
+Média e variância de Welford, mínimo/máximo, quantis pelo algoritmo P²,
+rejeição opcional de outliers e intervalo de confiança para parada antecipada.
+Cada amostra custa O(1) em tempo e memória
+"""
+
+import math
+from statistics import NormalDist
+from typing import Dict, Iterable, Optional
+
+PARAMETROS = ['umidade', 'temperatura', 'ph', 'condutividade', 'nitrogenio', 'fosforo', 'potassio']
+
+# Resolução de cada parâmetro: abaixo disso o intervalo de confiança já é tão bom quanto o sensor
+RESOLUCAO = {
+    'umidade': 0.1,
+    'temperatura': 0.1,
+    'ph': 0.1,
+    'condutividade': 1.0,
+    'nitrogenio': 1.0,
+    'fosforo': 1.0,
+    'potassio': 1.0
+}
+
+
+# Quantis bicaudais exatos da t de Student para poucos graus de liberdade (1 a 10),
+# onde a aproximação abaixo subestima o intervalo
+_TABELA_T = {
+    0.90: (6.314, 2.920, 2.353, 2.132, 2.015, 1.943, 1.895, 1.860, 1.833, 1.812),
+    0.95: (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228),
+    0.99: (63.657, 9.925, 5.841, 4.604, 4.032, 3.707, 3.499, 3.355, 3.250, 3.169),
+}
+
+
+def quantil_t(confianca: float, graus_liberdade: int) -> float:
+    tabela = _TABELA_T.get(confianca)
+    if tabela and graus_liberdade <= len(tabela):
+        return tabela[graus_liberdade - 1]
+    # Expansão de Cornish-Fisher a partir do quantil normal
+    z = NormalDist().inv_cdf(0.5 + confianca / 2)
+    v = graus_liberdade
+    return z + (z ** 3 + z) / (4 * v) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * v ** 2)
+
+
+class QuantilP2:
+    # Estimador P² (Jain e Chlamtac, 1985): cinco marcadores, sem guardar as amostras
+
+    def __init__(self, p: float):
+        self.p = p
+        self._iniciais = []
+        self._q = None
+        self._n = None
+        self._desejado = None
+        self._incremento = (0.0, p / 2, p, (1 + p) / 2, 1.0)
+
+    def adicionar(self, x: float):
+        if self._q is None:
+            self._iniciais.append(x)
+            if len(self._iniciais) == 5:
+                self._q = sorted(self._iniciais)
+                self._n = [0, 1, 2, 3, 4]
+                p = self.p
+                self._desejado = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+            return
+        q, n = self._q, self._n
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desejado[i] += self._incremento[i]
+        for i in range(1, 4):
+            d = self._desejado[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                parabolico = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if q[i - 1] < parabolico < q[i + 1]:
+                    q[i] = parabolico
+                else:
+                    q[i] += d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                n[i] += d
+
+    def valor(self) -> Optional[float]:
+        if self._q is not None:
+            return self._q[2]
+        if not self._iniciais:
+            return None
+        # Menos de 5 amostras: quantil exato por interpolação linear
+        ordenados = sorted(self._iniciais)
+        posicao = self.p * (len(ordenados) - 1)
+        abaixo = int(posicao)
+        acima = min(abaixo + 1, len(ordenados) - 1)
+        return ordenados[abaixo] + (ordenados[acima] - ordenados[abaixo]) * (posicao - abaixo)
+
+
+class AcumuladorEstatistico:
+    def __init__(self, quantis: Iterable[float] = (0.1, 0.5, 0.9), rejeitar_outliers: bool = False,
+                 limite_desvios: float = 3.0, minimo_para_rejeitar: int = 5):
+        self.rejeitar_outliers = rejeitar_outliers
+        self.limite_desvios = limite_desvios
+        self.minimo_para_rejeitar = minimo_para_rejeitar
+        self.quantis = {p: QuantilP2(p) for p in quantis}
+        self.n = 0
+        self.media = 0.0
+        self._m2 = 0.0
+        self.minimo = None
+        self.maximo = None
+        self.rejeitados = 0
+
+    @property
+    def variancia(self) -> Optional[float]:
+        return self._m2 / (self.n - 1) if self.n > 1 else None
+
+    @property
+    def desvio_padrao(self) -> Optional[float]:
+        variancia = self.variancia
+        return math.sqrt(variancia) if variancia is not None else None
+
+    def adicionar(self, x: float) -> bool:
+        # Devolve False se a amostra foi descartada como outlier
+        if self.rejeitar_outliers and self.n >= self.minimo_para_rejeitar:
+            desvio = self.desvio_padrao
+            if desvio and abs(x - self.media) > self.limite_desvios * desvio:
+                self.rejeitados += 1
+                return False
+        self.n += 1
+        delta = x - self.media
+        self.media += delta / self.n
+        self._m2 += delta * (x - self.media)
+        self.minimo = x if self.minimo is None else min(self.minimo, x)
+        self.maximo = x if self.maximo is None else max(self.maximo, x)
+        for estimador in self.quantis.values():
+            estimador.adicionar(x)
+        return True
+
+    def quantil(self, p: float) -> Optional[float]:
+        return self.quantis[p].valor()
+
+    @property
+    def mediana(self) -> Optional[float]:
+        return self.quantil(0.5) if 0.5 in self.quantis else None
+
+    def meia_largura_ic(self, confianca: float = 0.95) -> Optional[float]:
+        if self.n < 2:
+            return None
+        return quantil_t(confianca, self.n - 1) * self.desvio_padrao / math.sqrt(self.n)
+
+    def resumo(self, confianca: float = 0.95) -> Dict:
+        def arredondar(valor):
+            return round(valor, 3) if valor is not None else None
+        return {
+            'n': self.n,
+            'media': arredondar(self.media) if self.n else None,
+            'desvio_padrao': arredondar(self.desvio_padrao),
+            'minimo': arredondar(self.minimo),
+            'maximo': arredondar(self.maximo),
+            'mediana': arredondar(self.mediana),
+            'quantis': {str(p): arredondar(e.valor()) for p, e in self.quantis.items()},
+            'ic_meia_largura': arredondar(self.meia_largura_ic(confianca)),
+            'rejeitados': self.rejeitados,
+        }
+
+
+class EstatisticasLeituras:
+    def __init__(self, parametros: Iterable[str] = PARAMETROS, **opcoes):
+        self.acumuladores = {p: AcumuladorEstatistico(**opcoes) for p in parametros}
+        self.amostras = 0
+
+    def adicionar(self, dados: Dict):
+        self.amostras += 1
+        for parametro, acumulador in self.acumuladores.items():
+            valor = dados.get(parametro)
+            if isinstance(valor, (int, float)):
+                acumulador.adicionar(valor)
+
+    def media(self) -> Dict[str, Optional[float]]:
+        # Mesmo formato do antigo calcular_media: média aritmética com 2 casas, None sem leituras
+        return {p: round(a.media, 2) if a.n else None for p, a in self.acumuladores.items()}
+
+    def resumo(self, confianca: float = 0.95) -> Dict[str, Dict]:
+        return {p: a.resumo(confianca) for p, a in self.acumuladores.items()}
+
+    def convergiu(self, tolerancia_relativa: float = 0.02, confianca: float = 0.95, minimo_amostras: int = 3,
+                  tolerancia_absoluta: Optional[Dict[str, float]] = None) -> bool:
+        # Todos os parâmetros lidos têm intervalo de confiança menor que a tolerância
+        # (relativa à média ou, para valores perto de zero, a resolução do sensor)
+        tolerancia_absoluta = tolerancia_absoluta or RESOLUCAO
+        if self.amostras < minimo_amostras:
+            return False
+        for parametro, acumulador in self.acumuladores.items():
+            if acumulador.n == 0:
+                continue
+            meia_largura = acumulador.meia_largura_ic(confianca)
+            if meia_largura is None:
+                return False
+            limite = max(tolerancia_relativa * abs(acumulador.media), tolerancia_absoluta.get(parametro, 0.0))
+            if meia_largura > limite:
+                return False
+        return True
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Histórico limitado de leituras do Sensor de Solo 7 em 1
+Buffer circular em arrays com as últimas N leituras para a interface; as mais
+antigas ficam só no disco. A iteração percorre disco e memória como uma
+sequência única
+"""
+
+import itertools
+import math
+import os
+import tempfile
+from array import array
+from typing import Dict, Iterator, List, Optional
+
+from armazenamento import ArmazenamentoJSONL, ler_jsonl
+
+PARAMETROS = ['umidade', 'temperatura', 'ph', 'condutividade', 'nitrogenio', 'fosforo', 'potassio']
+
+
+def ler_sessao(caminho: str) -> Iterator[Dict]:
+    if caminho.endswith('.tsb'):
+        from sessao_binaria import SessaoBinaria
+        with SessaoBinaria(caminho) as sessao:
+            yield from sessao.registros()
+    else:
+        yield from ler_jsonl(caminho)
+
+
+class HistoricoLimitado:
+    # armazenamento: escritor da sessão (ArmazenamentoJSONL ou EscritorSessaoBinaria).
+    #   gravar_ao_adicionar=True  -> cada leitura vai para o disco na hora (modo contínuo)
+    #   gravar_ao_adicionar=False -> só vai para o disco quando sai do buffer circular
+    # Sem armazenamento, o despejo usa um .jsonl temporário apagado em fechar()
+
+    def __init__(self, capacidade: int = 1000, armazenamento=None, gravar_ao_adicionar: bool = False):
+        self.capacidade = capacidade
+        self.armazenamento = armazenamento
+        self.gravar_ao_adicionar = gravar_ao_adicionar and armazenamento is not None
+        self._temporario = None
+        self._colunas = {p: array('d', [math.nan]) * capacidade for p in PARAMETROS}
+        self._horarios: List[Optional[str]] = [None] * capacidade
+        # Chaves fora dos 7 parâmetros (ex.: marcações extras da leitura), normalmente None
+        self._extras: List[Optional[Dict]] = [None] * capacidade
+        self._inicio = 0
+        self._tamanho = 0
+        self.total = 0
+
+    def __len__(self) -> int:
+        return self.total
+
+    @property
+    def em_memoria(self) -> int:
+        return self._tamanho
+
+    def _registro(self, posicao: int) -> Dict:
+        dados = {}
+        for p in PARAMETROS:
+            valor = self._colunas[p][posicao]
+            dados[p] = None if math.isnan(valor) else valor
+        dados['timestamp'] = self._horarios[posicao]
+        if self._extras[posicao]:
+            dados.update(self._extras[posicao])
+        return dados
+
+    def _despejar(self, dados: Dict):
+        if self.armazenamento is None:
+            descritor, caminho = tempfile.mkstemp(prefix='historico_', suffix='.jsonl')
+            os.close(descritor)
+            self.armazenamento = self._temporario = ArmazenamentoJSONL(caminho, flush_a_cada=64, fsync_a_cada=0)
+        self.armazenamento.adicionar(dados)
+
+    def adicionar(self, dados: Dict):
+        if self.gravar_ao_adicionar:
+            self.armazenamento.adicionar(dados)
+        if self._tamanho == self.capacidade:
+            posicao = self._inicio
+            if not self.gravar_ao_adicionar:
+                self._despejar(self._registro(posicao))
+            self._inicio = (self._inicio + 1) % self.capacidade
+        else:
+            posicao = (self._inicio + self._tamanho) % self.capacidade
+            self._tamanho += 1
+        for p in PARAMETROS:
+            valor = dados.get(p)
+            self._colunas[p][posicao] = math.nan if valor is None else valor
+        self._horarios[posicao] = dados.get('timestamp')
+        extras = {k: v for k, v in dados.items() if k not in self._colunas and k != 'timestamp'}
+        self._extras[posicao] = extras or None
+        self.total += 1
+
+    def _posicoes(self) -> Iterator[int]:
+        for i in range(self._tamanho):
+            yield (self._inicio + i) % self.capacidade
+
+    def ultimos(self, n: Optional[int] = None) -> List[Dict]:
+        posicoes = list(self._posicoes())
+        if n is not None:
+            posicoes = posicoes[-n:] if n else []
+        return [self._registro(p) for p in posicoes]
+
+    def ultimo(self) -> Optional[Dict]:
+        if not self._tamanho:
+            return None
+        return self._registro((self._inicio + self._tamanho - 1) % self.capacidade)
+
+    def coluna(self, parametro: str) -> array:
+        # Valores em memória de um parâmetro, em ordem cronológica (NaN para ausentes)
+        valores = self._colunas[parametro]
+        fim = self._inicio + self._tamanho
+        if fim <= self.capacidade:
+            return valores[self._inicio:fim]
+        return valores[self._inicio:] + valores[:fim - self.capacidade]
+
+    def __iter__(self) -> Iterator[Dict]:
+        no_disco = self.total - self._tamanho
+        if no_disco:
+            if hasattr(self.armazenamento, 'flush'):
+                self.armazenamento.flush()
+            yield from itertools.islice(ler_sessao(self.armazenamento.caminho), no_disco)
+        for posicao in list(self._posicoes()):
+            yield self._registro(posicao)
+
+    def fechar(self):
+        if self._temporario is not None:
+            self._temporario.fechar()
+            os.remove(self._temporario.caminho)
+            self._temporario = None
+            self.armazenamento = None
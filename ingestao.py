@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Ingestão em lote do arquivo de leituras do Sensor de Solo 7 em 1
+Reconhece os layouts gravados pelo app (leitura única, contínuo e média, além de
+.jsonl e .tsb), interpreta os arquivos num pool de processos e gera um único
+conjunto ordenado pelo tempo em CSV e no formato binário .tsb. Um manifesto
+guarda o que já foi ingerido para que as execuções seguintes só leiam arquivos
+novos ou alterados
+"""
+
+import csv
+import glob
+import heapq
+import json
+import lzma
+import math
+import os
+import struct
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sessao_binaria import PARAMETROS, SessaoBinaria, gravar_tuplas
+
+PADROES = ['*.json', '*.jsonl', '*.tsb']
+ARQUIVO_MANIFESTO = 'manifesto.json'
+ARQUIVO_CSV = 'leituras.csv'
+ARQUIVO_BINARIO = 'leituras.tsb'
+# Índice (no manifesto) do arquivo de origem de cada registro do .tsb, um uint32 por registro
+ARQUIVO_ORIGEM = 'leituras.origem'
+
+# Registros novos que ficam na memória antes de irem para uma rodada ordenada em disco
+REGISTROS_POR_RODADA = 1_000_000
+
+# (epoch, umidade, ..., potassio, origem)
+Registro = Tuple[float, ...]
+_RODADA = struct.Struct('<' + 'd' * (len(PARAMETROS) + 1) + 'I')
+
+
+def detectar_layout(conteudo) -> Optional[str]:
+    # salvar_media: {"media", "leituras", "timestamp"}; salvar_dados_continuo: {"leituras": [...]};
+    # salvar_dados: dict plano de ler_todos_dados
+    if isinstance(conteudo, dict):
+        if isinstance(conteudo.get('leituras'), list):
+            return 'media' if isinstance(conteudo.get('media'), dict) else 'continuo'
+        if 'timestamp' in conteudo and any(p in conteudo for p in PARAMETROS):
+            return 'unica'
+    elif isinstance(conteudo, list):
+        return 'continuo'
+    return None
+
+
+def _epoch(timestamp) -> Optional[float]:
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _valor(valor) -> float:
+    return float(valor) if isinstance(valor, (int, float)) and not isinstance(valor, bool) else math.nan
+
+
+def _tuplas(leituras: Iterable) -> List[Tuple[float, ...]]:
+    tuplas = []
+    for dados in leituras:
+        if not isinstance(dados, dict):
+            continue
+        instante = _epoch(dados.get('timestamp'))
+        if instante is not None:
+            tuplas.append((instante, *(_valor(dados.get(p)) for p in PARAMETROS)))
+    return tuplas
+
+
+def interpretar_arquivo(caminho: str,
+                        segmento: Optional[str] = None) -> Tuple[Optional[str], List[Tuple[float, ...]]]:
+    # Executado nos processos do pool: devolve o layout e as tuplas (epoch + 7 valores) ordenadas.
+    # Com segmento, o original já foi para o arquivo frio e a sessão é lida de lá
+    if segmento is not None:
+        from arquivo_frio import LeitorSegmento
+        with LeitorSegmento(segmento) as leitor:
+            for sessao in leitor.sessoes():
+                if sessao.info['arquivo'] == caminho:
+                    layout = sessao.info['layout']
+                    tuplas = _tuplas(sessao.leituras())
+                    break
+            else:
+                raise ValueError(f"{caminho} não está em {segmento}")
+    elif caminho.endswith('.tsb'):
+        with SessaoBinaria(caminho) as sessao:
+            tuplas = list(sessao.tuplas())
+        layout = 'continuo'
+    elif caminho.endswith('.jsonl'):
+        from armazenamento import ler_jsonl
+        tuplas = _tuplas(ler_jsonl(caminho))
+        layout = 'continuo'
+    else:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            conteudo = json.load(f)
+        layout = detectar_layout(conteudo)
+        if layout is None:
+            return None, []
+        if layout == 'unica':
+            tuplas = _tuplas([conteudo])
+        else:
+            tuplas = _tuplas(conteudo['leituras'] if isinstance(conteudo, dict) else conteudo)
+    tuplas.sort(key=lambda t: t[0])
+    return layout, tuplas
+
+
+def _tentar_interpretar(caminho: str, segmento: Optional[str] = None):
+    try:
+        return interpretar_arquivo(caminho, segmento)
+    except (OSError, ValueError, UnicodeDecodeError, EOFError, struct.error, lzma.LZMAError) as e:
+        # Um arquivo ruim vira falha no manifesto; não derruba a ingestão inteira
+        return 'erro', str(e) or type(e).__name__
+
+
+def _gravar_rodada(caminho: str, registros: List[Registro]):
+    with open(caminho, 'wb') as f:
+        for i in range(0, len(registros), 4096):
+            f.write(b''.join(_RODADA.pack(*r) for r in registros[i:i + 4096]))
+
+
+def _ler_rodada(caminho: str) -> Iterator[Registro]:
+    with open(caminho, 'rb') as f:
+        while True:
+            dados = f.read(_RODADA.size * 4096)
+            if not dados:
+                return
+            yield from _RODADA.iter_unpack(dados)
+
+
+def _assinatura(caminho: str) -> Dict:
+    info = os.stat(caminho)
+    return {'mtime': info.st_mtime, 'tamanho': info.st_size}
+
+
+class IngestorLeituras:
+    def __init__(self, pasta_saida: str = "ingestao", processos: Optional[int] = None,
+                 ao_progresso: Optional[Callable[[int, int, str], None]] = None):
+        self.pasta_saida = pasta_saida
+        self.processos = processos
+        self.ao_progresso = ao_progresso or self._imprimir_progresso
+        self.caminho_manifesto = os.path.join(pasta_saida, ARQUIVO_MANIFESTO)
+        self.caminho_csv = os.path.join(pasta_saida, ARQUIVO_CSV)
+        self.caminho_binario = os.path.join(pasta_saida, ARQUIVO_BINARIO)
+        self.caminho_origem = os.path.join(pasta_saida, ARQUIVO_ORIGEM)
+        self._ultimo_progresso = 0.0
+
+    def _imprimir_progresso(self, feitos: int, total: int, caminho: str):
+        # No máximo duas atualizações por segundo, para não inundar logs
+        agora = time.monotonic()
+        if feitos < total and agora - self._ultimo_progresso < 0.5:
+            return
+        self._ultimo_progresso = agora
+        print(f"\r[{feitos}/{total}] {100 * feitos // total}% {os.path.basename(caminho)[:50]:<50}",
+              end='\n' if feitos == total else '', flush=True)
+
+    def _carregar_manifesto(self) -> Dict:
+        try:
+            with open(self.caminho_manifesto, 'r', encoding='utf-8') as f:
+                manifesto = json.load(f)
+        except (OSError, ValueError):
+            return {'proximo_id': 0, 'arquivos': {}}
+        # Sem o conjunto anterior não há o que reaproveitar
+        if not all(os.path.exists(c) for c in (self.caminho_binario, self.caminho_origem)):
+            return {'proximo_id': 0, 'arquivos': {}}
+        return manifesto
+
+    def _gravar_manifesto(self, manifesto: Dict):
+        temporario = f"{self.caminho_manifesto}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(manifesto, f, indent=2, ensure_ascii=False)
+        os.replace(temporario, self.caminho_manifesto)
+
+    def listar(self, entradas: Iterable[str], padroes: Iterable[str] = PADROES) -> List[str]:
+        # Pastas são varridas (recursivamente) com os padrões; arquivos entram como estão
+        encontrados = set()
+        for entrada in entradas:
+            if os.path.isdir(entrada):
+                for padrao in padroes:
+                    encontrados.update(glob.glob(os.path.join(entrada, '**', padrao), recursive=True))
+            elif os.path.isfile(entrada):
+                encontrados.add(entrada)
+        # Saídas desta ou de outras ingestões não voltam a ser ingeridas
+        pasta_saida = os.path.abspath(self.pasta_saida) + os.sep
+        return sorted(os.path.abspath(c) for c in encontrados
+                      if os.path.basename(c) not in (ARQUIVO_MANIFESTO, ARQUIVO_BINARIO)
+                      and not os.path.abspath(c).startswith(pasta_saida))
+
+    def _sessoes_arquivadas(self, entradas: Iterable[str], pastas_arquivo: Iterable[str]) -> Dict[str, Dict]:
+        # Sessões do arquivo frio (arquivo_frio.py) nas pastas dadas ou dentro das entradas:
+        # caminho original -> item do índice, com o caminho do segmento
+        from arquivo_frio import ARQUIVO_INDICE
+        indices = {os.path.join(pasta, ARQUIVO_INDICE) for pasta in pastas_arquivo}
+        for entrada in entradas:
+            if os.path.isdir(entrada):
+                indices.update(glob.glob(os.path.join(entrada, '**', ARQUIVO_INDICE), recursive=True))
+        sessoes = {}
+        for indice in sorted({os.path.abspath(c) for c in indices}):
+            try:
+                with open(indice, 'r', encoding='utf-8') as f:
+                    conteudo = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Erro ao ler {indice}: {e}")
+                continue
+            if not isinstance(conteudo, dict) or not isinstance(conteudo.get('sessoes'), dict):
+                continue
+            pasta = os.path.dirname(indice)
+            for caminho, item in conteudo['sessoes'].items():
+                sessoes[caminho] = {**item, 'segmento': os.path.join(pasta, item['segmento'])}
+        return sessoes
+
+    def _anteriores(self, descartar: set) -> Iterator[Registro]:
+        # Registros da execução anterior, menos os dos arquivos alterados ou removidos, em fluxo
+        origens = array('I')
+        with SessaoBinaria(self.caminho_binario) as sessao:
+            total = len(sessao)
+        if os.path.getsize(self.caminho_origem) != total * origens.itemsize:
+            raise ValueError(f"{self.caminho_origem} não corresponde a {self.caminho_binario}")
+
+        def registros():
+            with SessaoBinaria(self.caminho_binario) as sessao, open(self.caminho_origem, 'rb') as f:
+                tuplas = sessao.tuplas()
+                while True:
+                    lote = array('I')
+                    lote.frombytes(f.read(origens.itemsize * 4096))
+                    if not lote:
+                        return
+                    for origem, valores in zip(lote, tuplas):
+                        if origem not in descartar:
+                            yield (*valores, origem)
+        return registros()
+
+    def ingerir(self, entradas: Iterable[str], completo: bool = False, padroes: Iterable[str] = PADROES,
+                pastas_arquivo: Iterable[str] = ()) -> Dict:
+        inicio = time.perf_counter()
+        os.makedirs(self.pasta_saida, exist_ok=True)
+        manifesto = {'proximo_id': 0, 'arquivos': {}} if completo else self._carregar_manifesto()
+        conhecidos = manifesto['arquivos']
+        entradas = list(entradas)
+        arquivadas = self._sessoes_arquivadas(entradas, pastas_arquivo)
+        # O índice do arquivo frio não é sessão; um original restaurado vale mais que a cópia arquivada
+        pastas_frias = {os.path.dirname(item['segmento']) + os.sep for item in arquivadas.values()}
+        arquivos = [c for c in self.listar(entradas, padroes)
+                    if not any(c.startswith(pasta) for pasta in pastas_frias)]
+        for caminho in arquivos:
+            arquivadas.pop(caminho, None)
+        arquivos += sorted(arquivadas)
+
+        def assinatura(caminho: str) -> Dict:
+            if caminho in arquivadas:
+                return {k: arquivadas[caminho][k] for k in ('mtime', 'tamanho')}
+            return _assinatura(caminho)
+
+        pendentes = []
+        descartar = set()
+        for caminho in arquivos:
+            anterior = conhecidos.get(caminho)
+            if anterior is not None and {k: anterior[k] for k in ('mtime', 'tamanho')} == assinatura(caminho):
+                continue
+            pendentes.append(caminho)
+            if anterior is not None:
+                descartar.add(anterior['id'])
+        presentes = set(arquivos)
+        for caminho, anterior in list(conhecidos.items()):
+            if caminho not in presentes:
+                descartar.add(anterior['id'])
+                del conhecidos[caminho]
+
+        if not pendentes and not descartar:
+            print(f"Nada novo em {len(arquivos)} arquivos")
+            return self._resumo(manifesto, arquivos, [], [], inicio)
+
+        anteriores = self._anteriores(descartar) if conhecidos else iter(())
+        reaproveitadas = sum(info['leituras'] for info in conhecidos.values() if info['id'] not in descartar)
+        print(f"{len(pendentes)} de {len(arquivos)} arquivos para interpretar, "
+              f"{reaproveitadas} leituras reaproveitadas")
+
+        # Cada processo devolve as tuplas de um arquivo já ordenadas; a união é um merge em fluxo
+        # das listas ordenadas. Acima de REGISTROS_POR_RODADA, os novos vão para rodadas em disco
+        novos = []
+        rodadas = []
+        ignorados = []
+        falhas = []
+        try:
+            self._interpretar(pendentes, arquivadas, assinatura, manifesto, novos, rodadas, ignorados, falhas)
+            registros = heapq.merge(anteriores, *map(_ler_rodada, rodadas), *novos, key=lambda r: r[0])
+            self._gravar(registros, manifesto)
+        finally:
+            for rodada in rodadas:
+                if os.path.exists(rodada):
+                    os.remove(rodada)
+        for caminho, erro in falhas:
+            print(f"Erro ao ler {caminho}: {erro}")
+        return self._resumo(manifesto, arquivos, ignorados, falhas, inicio)
+
+    def _interpretar(self, pendentes: List[str], arquivadas: Dict[str, Dict], assinatura: Callable[[str], Dict],
+                     manifesto: Dict, novos: List[List[Registro]], rodadas: List[str], ignorados: List[str],
+                     falhas: List):
+        if not pendentes:
+            return
+        conhecidos = manifesto['arquivos']
+        na_memoria = 0
+        processos = self.processos or os.cpu_count() or 1
+        lote = max(1, min(64, len(pendentes) // (processos * 4)))
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            segmentos = [arquivadas[c]['segmento'] if c in arquivadas else None for c in pendentes]
+            resultados = executor.map(_tentar_interpretar, pendentes, segmentos, chunksize=lote)
+            for feitos, (caminho, (layout, conteudo)) in enumerate(zip(pendentes, resultados), 1):
+                self.ao_progresso(feitos, len(pendentes), caminho)
+                # Arquivos com erro ou layout desconhecido também vão para o manifesto:
+                # só são tentados de novo quando mudarem
+                if layout == 'erro':
+                    falhas.append((caminho, conteudo))
+                    conteudo = []
+                elif layout is None:
+                    ignorados.append(caminho)
+                    layout = 'desconhecido'
+                identificador = manifesto['proximo_id']
+                manifesto['proximo_id'] += 1
+                conhecidos[caminho] = {'id': identificador, 'layout': layout,
+                                       'leituras': len(conteudo), **assinatura(caminho)}
+                if conteudo:
+                    novos.append([(*valores, identificador) for valores in conteudo])
+                    na_memoria += len(conteudo)
+                if na_memoria >= REGISTROS_POR_RODADA:
+                    rodada = os.path.join(self.pasta_saida, f"rodada_{len(rodadas):04d}.tmp")
+                    rodadas.append(rodada)
+                    _gravar_rodada(rodada, list(heapq.merge(*novos, key=lambda r: r[0])))
+                    novos.clear()
+                    na_memoria = 0
+
+    def _gravar(self, registros: Iterable[Registro], manifesto: Dict):
+        # Uma passada pelos registros alimenta o .tsb, o .origem e o CSV ao mesmo tempo.
+        # Tudo vai para temporários: os arquivos anteriores ainda estão sendo lidos no merge
+        layouts = {info['id']: (info['layout'], caminho) for caminho, info in manifesto['arquivos'].items()}
+        # .tsb e .origem primeiro, manifesto por último: uma execução interrompida é refeita do zero
+        if os.path.exists(self.caminho_manifesto):
+            os.remove(self.caminho_manifesto)
+        destinos = (self.caminho_binario, self.caminho_origem, self.caminho_csv)
+        with open(f"{self.caminho_origem}.tmp", 'wb') as origens, \
+                open(f"{self.caminho_csv}.tmp", 'w', encoding='utf-8', newline='') as f:
+            escritor = csv.writer(f)
+            escritor.writerow(['timestamp'] + PARAMETROS + ['modo', 'arquivo'])
+            lote = array('I')
+
+            def valores():
+                for registro in registros:
+                    lote.append(registro[-1])
+                    if len(lote) == 4096:
+                        lote.tofile(origens)
+                        del lote[:]
+                    layout, caminho = layouts[registro[-1]]
+                    colunas = ['' if math.isnan(v) else round(v, 3) for v in registro[1:-1]]
+                    escritor.writerow([datetime.fromtimestamp(registro[0]).isoformat(), *colunas, layout, caminho])
+                    yield registro[:-1]
+            gravar_tuplas(f"{self.caminho_binario}.tmp", valores())
+            lote.tofile(origens)
+        for destino in destinos:
+            os.replace(f"{destino}.tmp", destino)
+        self._gravar_manifesto(manifesto)
+
+    def _resumo(self, manifesto: Dict, arquivos: List[str], ignorados: List[str], falhas: List,
+                inicio: float) -> Dict:
+        por_layout = {}
+        leituras = 0
+        for info in manifesto['arquivos'].values():
+            por_layout[info['layout']] = por_layout.get(info['layout'], 0) + 1
+            leituras += info['leituras']
+        return {
+            'arquivos': len(arquivos),
+            'por_layout': por_layout,
+            'ignorados': ignorados,
+            'falhas': [caminho for caminho, _ in falhas],
+            'leituras': leituras,
+            'segundos': round(time.perf_counter() - inicio, 3),
+        }
+
+
+def main(argumentos: Optional[List[str]] = None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Reúne os arquivos de leituras do sensor num conjunto ordenado")
+    parser.add_argument('entradas', nargs='*', default=['.'], help="Pastas (varridas recursivamente) ou arquivos")
+    parser.add_argument('--saida', default="ingestao", help="Pasta do CSV, do .tsb e do manifesto")
+    parser.add_argument('--processos', type=int, default=None, help="Processos do pool (padrão: núcleos da CPU)")
+    parser.add_argument('--padroes', nargs='+', default=PADROES, help="Padrões de nome nas pastas")
+    parser.add_argument('--completo', action='store_true', help="Ignora o manifesto e refaz tudo")
+    parser.add_argument('--arquivo-frio', nargs='+', default=[], metavar='PASTA',
+                        help="Pastas do arquivo frio fora das entradas (as de dentro são achadas sozinhas)")
+    args = parser.parse_args(argumentos)
+
+    resumo = IngestorLeituras(args.saida, args.processos).ingerir(args.entradas, args.completo, args.padroes,
+                                                                  args.arquivo_frio)
+    for caminho in resumo['ignorados']:
+        print(f"Layout não reconhecido: {caminho}")
+    print(f"{resumo['leituras']} leituras de {resumo['arquivos']} arquivos "
+          f"({json.dumps(resumo['por_layout'], ensure_ascii=False)}) em {resumo['segundos']} s")
+
+
+if __name__ == "__main__":
+    main()
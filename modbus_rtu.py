@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Codec Modbus RTU usado pelo leitor do Sensor de Solo 7 em 1
+CRC16 por tabela, montagem de requisições, parser incremental de respostas
+e decodificação de quadros de exceção
+"""
+
+import struct
+import time
+from typing import List, NamedTuple, Optional
+
+
+def _gerar_tabela_crc():
+    tabela = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            if crc & 0x0001:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+        tabela.append(crc)
+    return tuple(tabela)
+
+
+# Calculada uma única vez na importação: validar um quadro custa uma consulta por byte
+TABELA_CRC = _gerar_tabela_crc()
+
+CODIGOS_EXCECAO = {
+    0x01: "Função ilegal",
+    0x02: "Endereço de dados ilegal",
+    0x03: "Valor de dados ilegal",
+    0x04: "Falha no dispositivo escravo",
+    0x05: "Reconhecido, processamento em andamento",
+    0x06: "Dispositivo escravo ocupado",
+    0x08: "Erro de paridade na memória",
+    0x0A: "Caminho do gateway indisponível",
+    0x0B: "Dispositivo alvo do gateway não respondeu",
+}
+
+# Funções cuja resposta tem comprimento fixo (eco de endereço + valor/quantidade)
+FUNCOES_RESPOSTA_FIXA = (0x05, 0x06, 0x0F, 0x10)
+FUNCOES_LEITURA = (0x01, 0x02, 0x03, 0x04)
+
+
+class ErroModbus(Exception):
+    pass
+
+
+class ErroCRC(ErroModbus):
+    pass
+
+
+class ErroQuadro(ErroModbus):
+    pass
+
+
+class ErroTimeout(ErroModbus):
+    pass
+
+
+class ExcecaoModbus(ErroModbus):
+    def __init__(self, escravo: int, funcao: int, codigo: int):
+        self.escravo = escravo
+        self.funcao = funcao
+        self.codigo = codigo
+        descricao = CODIGOS_EXCECAO.get(codigo, "Código desconhecido")
+        super().__init__(f"Escravo {escravo} respondeu exceção 0x{codigo:02X} "
+                         f"na função 0x{funcao:02X}: {descricao}")
+
+
+class QuadroRTU(NamedTuple):
+    escravo: int
+    funcao: int
+    dados: bytes
+
+    @property
+    def excecao(self) -> bool:
+        return bool(self.funcao & 0x80)
+
+
+def crc16(dados) -> int:
+    crc = 0xFFFF
+    tabela = TABELA_CRC
+    for byte in dados:
+        crc = (crc >> 8) ^ tabela[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def crc_valido(quadro) -> bool:
+    # O CRC de um quadro íntegro, calculado incluindo os dois bytes finais, é zero
+    return len(quadro) >= 4 and crc16(quadro) == 0
+
+
+def criar_requisicao(escravo: int, funcao: int, endereco: int, quantidade: int = 1) -> bytearray:
+    cmd = bytearray(struct.pack('>BBHH', escravo, funcao, endereco, quantidade))
+    cmd.extend(crc16(cmd).to_bytes(2, byteorder='little'))
+    return cmd
+
+
+def tamanho_resposta(funcao: int, quantidade: int = 1) -> int:
+    if funcao & 0x80:
+        return 5
+    if funcao in (0x03, 0x04):
+        return 5 + 2 * quantidade
+    if funcao in (0x01, 0x02):
+        return 5 + (quantidade + 7) // 8
+    if funcao in FUNCOES_RESPOSTA_FIXA:
+        return 8
+    raise ErroQuadro(f"Função 0x{funcao:02X} não suportada")
+
+
+class ParserRTU:
+    # Monta quadros de resposta a partir de pedaços de qualquer tamanho lidos da serial.
+    # O comprimento de cada quadro vem do cabeçalho (função e contagem de bytes),
+    # então o chamador pode pedir à porta exatamente o que ainda falta.
+
+    def __init__(self, escravo: Optional[int] = None):
+        self.escravo = escravo
+        self.buffer = bytearray()
+
+    def limpar(self):
+        self.buffer.clear()
+
+    def _tamanho_quadro(self) -> Optional[int]:
+        if len(self.buffer) < 2:
+            return None
+        funcao = self.buffer[1]
+        if funcao & 0x80:
+            return 5
+        if funcao in FUNCOES_LEITURA:
+            if len(self.buffer) < 3:
+                return None
+            return 5 + self.buffer[2]
+        if funcao in FUNCOES_RESPOSTA_FIXA:
+            return 8
+        raise ErroQuadro(f"Função 0x{funcao:02X} inesperada na resposta: {bytes(self.buffer).hex()}")
+
+    def faltam(self) -> int:
+        tamanho = self._tamanho_quadro()
+        if tamanho is None:
+            return 3 - len(self.buffer)
+        return max(tamanho - len(self.buffer), 0)
+
+    def alimentar(self, pedaco) -> Optional[QuadroRTU]:
+        if pedaco:
+            self.buffer.extend(pedaco)
+        if self.escravo is not None:
+            # Descarta ruído de comutação da linha antes do início do quadro
+            inicio = self.buffer.find(self.escravo)
+            if inicio < 0:
+                self.buffer.clear()
+                return None
+            if inicio:
+                del self.buffer[:inicio]
+        tamanho = self._tamanho_quadro()
+        if tamanho is None or len(self.buffer) < tamanho:
+            return None
+        quadro = bytes(self.buffer[:tamanho])
+        del self.buffer[:tamanho]
+        if not crc_valido(quadro):
+            raise ErroCRC(f"CRC inválido na resposta: {quadro.hex()}")
+        if quadro[1] & 0x80 or quadro[1] in FUNCOES_RESPOSTA_FIXA:
+            dados = quadro[2:-2]
+        else:
+            dados = quadro[3:-2]
+        return QuadroRTU(quadro[0], quadro[1], dados)
+
+
+def decodificar_registradores(quadro: QuadroRTU, escravo: int, funcao: int, quantidade: int) -> List[int]:
+    if quadro.excecao:
+        raise ExcecaoModbus(quadro.escravo, quadro.funcao & 0x7F, quadro.dados[0])
+    if quadro.escravo != escravo or quadro.funcao != funcao:
+        raise ErroQuadro(f"Resposta do escravo {quadro.escravo} função 0x{quadro.funcao:02X}, "
+                         f"esperado escravo {escravo} função 0x{funcao:02X}")
+    if len(quadro.dados) != 2 * quantidade:
+        raise ErroQuadro(f"Esperados {2 * quantidade} bytes de dados, recebidos {len(quadro.dados)}")
+    return list(struct.unpack(f'>{quantidade}H', quadro.dados))
+
+
+def receber_quadro(porta, parser: ParserRTU, prazo: Optional[float] = None) -> QuadroRTU:
+    # Pede à porta exatamente os bytes que faltam: a leitura volta assim que o
+    # quadro chega, sem esperas fixas. prazo é um instante de time.monotonic()
+    while True:
+        pedaco = porta.read(parser.faltam() or 1)
+        if pedaco:
+            quadro = parser.alimentar(pedaco)
+            if quadro is not None:
+                return quadro
+        if not pedaco or (prazo is not None and time.monotonic() > prazo):
+            recebido = bytes(parser.buffer)
+            raise ErroTimeout(f"Resposta incompleta: {recebido.hex() if recebido else 'vazia'}")
+
+
+def _transacao(porta, escravo: int, requisicao: bytearray, tamanho: int, temporizador=None) -> QuadroRTU:
+    # Transação completa sobre qualquer porta com write/read no estilo pyserial.
+    # Com um TemporizadorModbus, respeita o silêncio do barramento e usa prazo de resposta aprendido
+    prazo = None
+    if temporizador is not None:
+        temporizador.aguardar_silencio()
+        espera = temporizador.prazo_resposta(escravo, len(requisicao), tamanho)
+        if hasattr(porta, 'timeout'):
+            porta.timeout = espera
+    inicio = time.monotonic()
+    porta.write(requisicao)
+    if temporizador is not None:
+        prazo = inicio + espera
+    try:
+        quadro = receber_quadro(porta, ParserRTU(escravo), prazo)
+    except ErroTimeout:
+        if temporizador is not None:
+            temporizador.registrar_timeout(escravo)
+        raise
+    finally:
+        if temporizador is not None:
+            temporizador.marcar_trafego()
+    if temporizador is not None:
+        temporizador.registrar_resposta(escravo, time.monotonic() - inicio, len(requisicao),
+                                        tamanho_resposta(quadro.funcao) if quadro.excecao else tamanho)
+    return quadro
+
+
+def ler_registradores(porta, escravo: int, endereco: int, quantidade: int = 1, funcao: int = 0x03,
+                      temporizador=None) -> List[int]:
+    requisicao = criar_requisicao(escravo, funcao, endereco, quantidade)
+    quadro = _transacao(porta, escravo, requisicao, tamanho_resposta(funcao, quantidade), temporizador)
+    return decodificar_registradores(quadro, escravo, funcao, quantidade)
+
+
+def escrever_registrador(porta, escravo: int, endereco: int, valor: int, temporizador=None):
+    # Função 06: a resposta é o eco do endereço e do valor gravados
+    requisicao = criar_requisicao(escravo, 0x06, endereco, valor)
+    quadro = _transacao(porta, escravo, requisicao, tamanho_resposta(0x06), temporizador)
+    if quadro.excecao:
+        raise ExcecaoModbus(quadro.escravo, quadro.funcao & 0x7F, quadro.dados[0])
+    if quadro.escravo != escravo or quadro.funcao != 0x06 or quadro.dados != bytes(requisicao[2:6]):
+        raise ErroQuadro(f"Eco inválido na escrita do registrador {endereco}: "
+                         f"escravo {quadro.escravo} função 0x{quadro.funcao:02X} dados {quadro.dados.hex()}")
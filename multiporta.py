@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Leitura em paralelo de vários adaptadores USB-RS485
+Cada porta tem a sua thread com um EscalonadorBarramento próprio; as leituras
+de todas as portas são entregues num único fluxo em ordem de horário
+"""
+
+import heapq
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from barramento import EscalonadorBarramento
+
+_FIM = object()
+
+
+class LeitorMultiPorta:
+    def __init__(self, portas: List[str], escravos: Iterable[int] = (1,), baudrate: int = 4800,
+                 periodos: Optional[Dict[int, float]] = None, atraso_maximo: float = 2.0):
+        self.portas = list(portas)
+        self.escravos = list(escravos)
+        self.baudrate = baudrate
+        self.periodos = periodos
+        # Quanto tempo uma leitura pode ficar retida esperando portas mais lentas
+        # antes de ser entregue fora da ordem global
+        self.atraso_maximo = atraso_maximo
+        self.parar = threading.Event()
+        self._saida = queue.Queue()
+        self._executor = None
+
+    def _trabalhar(self, porta: str):
+        barramento = None
+        try:
+            barramento = EscalonadorBarramento(porta, self.escravos, self.baudrate, periodos=self.periodos)
+
+            def ao_ler(escravo, dados):
+                instante = datetime.fromisoformat(dados['timestamp']).timestamp()
+                self._saida.put((instante, porta, escravo, dados))
+
+            barramento.executar(ao_ler, self.parar)
+        except Exception as e:
+            print(f"Erro na porta {porta}: {e}")
+        finally:
+            if barramento is not None:
+                barramento.fechar()
+            self._saida.put((None, porta, None, _FIM))
+
+    def iniciar(self):
+        # I/O serial libera o GIL: uma thread por porta basta para escalar com o número de adaptadores
+        self._executor = ThreadPoolExecutor(max_workers=len(self.portas), thread_name_prefix="porta")
+        for porta in self.portas:
+            self._executor.submit(self._trabalhar, porta)
+
+    def fluxo(self) -> Iterator[Tuple[str, int, Dict]]:
+        # Junta as portas por horário: uma leitura sai quando todas as portas ativas
+        # já produziram algo mais novo, ou quando passou de atraso_maximo
+        if self._executor is None:
+            self.iniciar()
+        ultimo = {porta: float('-inf') for porta in self.portas}
+        pendentes = []
+        sequencia = 0
+        while ultimo or pendentes:
+            try:
+                instante, porta, escravo, dados = self._saida.get(timeout=0.1)
+                if dados is _FIM:
+                    ultimo.pop(porta, None)
+                else:
+                    ultimo[porta] = instante
+                    heapq.heappush(pendentes, (instante, sequencia, porta, escravo, dados))
+                    sequencia += 1
+            except queue.Empty:
+                pass
+            marca = min(ultimo.values()) if ultimo else float('inf')
+            limite = max(marca, time.time() - self.atraso_maximo)
+            while pendentes and pendentes[0][0] <= limite:
+                _, _, porta, escravo, dados = heapq.heappop(pendentes)
+                yield porta, escravo, dados
+
+    def encerrar(self):
+        self.parar.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+def executar_multiporta(portas: List[str], escravos: Iterable[int] = (1,), baudrate: int = 4800):
+    leitor = LeitorMultiPorta(portas, escravos, baudrate)
+    try:
+        for porta, escravo, dados in leitor.fluxo():
+            print(json.dumps({'porta': porta, 'escravo': escravo, **dados}, ensure_ascii=False), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        leitor.encerrar()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Lê vários barramentos RS485 em paralelo")
+    parser.add_argument('portas', nargs='+', help="Portas seriais, ex.: /dev/ttyUSB0 /dev/ttyUSB1")
+    parser.add_argument('--escravos', type=int, nargs='+', default=[1], help="Endereços Modbus em cada barramento")
+    parser.add_argument('--baudrate', type=int, default=4800)
+    args = parser.parse_args()
+    executar_multiporta(args.portas, args.escravos, args.baudrate)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Perfil persistente por dispositivo do Sensor de Solo 7 em 1
+Guarda o registrador e o fator de escala de N, P e K descobertos em cada sensor
+e o baudrate/endereço detectados, para que as buscas aconteçam uma única vez
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+
+def chave_dispositivo(endereco_slave: int, vid: Optional[int] = None, pid: Optional[int] = None,
+                      porta: Optional[str] = None) -> str:
+    if vid is not None and pid is not None:
+        return f"{endereco_slave}@{vid:04X}:{pid:04X}"
+    return f"{endereco_slave}@{porta or 'desconhecida'}"
+
+
+class PerfilDispositivos:
+    def __init__(self, caminho: str = "perfil_sensor.json"):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._dados = self._carregar()
+
+    def _carregar(self) -> Dict:
+        try:
+            with open(self.caminho, 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+            if isinstance(dados, dict) and isinstance(dados.get('dispositivos'), dict):
+                return dados
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Erro ao carregar perfil {self.caminho}: {e}")
+        return {'dispositivos': {}}
+
+    def salvar(self):
+        try:
+            temporario = f"{self.caminho}.tmp"
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump(self._dados, f, indent=2, ensure_ascii=False)
+            os.replace(temporario, self.caminho)
+        except OSError as e:
+            print(f"Erro ao salvar perfil {self.caminho}: {e}")
+
+    def dispositivo(self, chave: str) -> Dict:
+        return self._dados['dispositivos'].setdefault(chave, {})
+
+    def mapeamento_npk(self, chave: str, nutriente: str) -> Optional[Tuple[int, float]]:
+        with self._lock:
+            item = self._dados['dispositivos'].get(chave, {}).get('npk', {}).get(nutriente)
+        if not item:
+            return None
+        return item['registrador'], item['fator']
+
+    def definir_npk(self, chave: str, nutriente: str, registrador: int, fator: float):
+        with self._lock:
+            npk = self.dispositivo(chave).setdefault('npk', {})
+            if npk.get(nutriente) == {'registrador': registrador, 'fator': fator}:
+                return
+            npk[nutriente] = {'registrador': registrador, 'fator': fator}
+            self.salvar()
+
+    def remover_npk(self, chave: str, nutriente: str):
+        with self._lock:
+            npk = self._dados['dispositivos'].get(chave, {}).get('npk', {})
+            if nutriente in npk:
+                del npk[nutriente]
+                self.salvar()
+
+    def comunicacao(self, chave: str) -> Optional[Tuple[int, int]]:
+        # -> (baudrate, endereco) detectados para quem se conecta com esta chave
+        with self._lock:
+            item = self._dados['dispositivos'].get(chave, {}).get('comunicacao')
+        if not item:
+            return None
+        return item['baudrate'], item['endereco']
+
+    def definir_comunicacao(self, chave: str, baudrate: int, endereco: int):
+        with self._lock:
+            dispositivo = self.dispositivo(chave)
+            if dispositivo.get('comunicacao') == {'baudrate': baudrate, 'endereco': endereco}:
+                return
+            dispositivo['comunicacao'] = {'baudrate': baudrate, 'endereco': endereco}
+            self.salvar()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Amostragem adaptativa por parâmetro do Sensor de Solo 7 em 1
+Cada parâmetro tem o seu período, que cai para o mínimo quando o valor sai da
+banda morta, encurta quando a taxa de variação prevê que vai sair e recua até o
+máximo quando fica parado. Um orçamento de transações por minuto limita o
+barramento; parâmetros não lidos no ciclo repetem o último valor e ficam fora
+de 'frescos'
+"""
+
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+PARAMETROS = ['umidade', 'temperatura', 'ph', 'condutividade', 'nitrogenio', 'fosforo', 'potassio']
+
+
+class RegraAmostragem:
+    # periodo_minimo / periodo_maximo em segundos; banda_morta na unidade do parâmetro.
+    # fator_recuo: quanto o período cresce a cada leitura sem variação
+    def __init__(self, periodo_minimo: float, periodo_maximo: float, banda_morta: float, fator_recuo: float = 1.5):
+        self.periodo_minimo = periodo_minimo
+        self.periodo_maximo = max(periodo_maximo, periodo_minimo)
+        self.banda_morta = banda_morta
+        self.fator_recuo = fator_recuo
+
+
+# Umidade e temperatura mudam em minutos; pH e NPK em horas. As bandas ficam
+# acima da resolução do sensor (0,1) para o ruído de um dígito não contar como evento
+REGRAS_PADRAO = {
+    'umidade': RegraAmostragem(10, 60, 0.5),
+    'temperatura': RegraAmostragem(10, 120, 0.3),
+    'condutividade': RegraAmostragem(30, 600, 10),
+    'ph': RegraAmostragem(60, 1800, 0.1),
+    'nitrogenio': RegraAmostragem(120, 3600, 2),
+    'fosforo': RegraAmostragem(120, 3600, 2),
+    'potassio': RegraAmostragem(120, 3600, 2),
+}
+
+
+class _EstadoParametro:
+    def __init__(self, regra: RegraAmostragem):
+        self.regra = regra
+        self.periodo = regra.periodo_minimo
+        self.devido = 0.0
+        self.valor = None
+        self.instante = None
+        # Último valor que saiu da banda morta: a variação é medida contra ele
+        self.referencia = None
+
+    def registrar(self, valor: Optional[float], agora: float) -> bool:
+        # Devolve True quando a leitura é um evento (saiu da banda morta)
+        regra = self.regra
+        evento = False
+        if valor is None:
+            # Falha de leitura: mantém o período, sem acelerar contra um sensor mudo
+            pass
+        elif self.referencia is None or abs(valor - self.referencia) > regra.banda_morta:
+            evento = self.referencia is not None
+            self.referencia = valor
+            self.periodo = regra.periodo_minimo
+        else:
+            periodo = self.periodo * regra.fator_recuo
+            if self.valor is not None and agora > self.instante:
+                # Tempo até a tendência atual cruzar a banda morta
+                inclinacao = abs(valor - self.valor) / (agora - self.instante)
+                restante = regra.banda_morta - abs(valor - self.referencia)
+                if inclinacao > 0:
+                    periodo = min(periodo, restante / inclinacao)
+            self.periodo = min(max(periodo, regra.periodo_minimo), regra.periodo_maximo)
+        if valor is not None:
+            self.valor = valor
+            self.instante = agora
+        self.devido = agora + self.periodo
+        return evento
+
+
+class AmostragemAdaptativa:
+    # orcamento: transações Modbus por minuto (None = sem limite). Parâmetros no
+    # mesmo bloco de registradores de um parâmetro devido são lidos junto, sem custo extra
+
+    def __init__(self, sensor, regras: Optional[Dict[str, RegraAmostragem]] = None,
+                 orcamento: Optional[float] = None, propagar_eventos: bool = True):
+        # Abaixo de uma transação por minuto as fichas nunca pagam uma leitura
+        if orcamento is not None and orcamento < 1:
+            raise ValueError(f"Orçamento de {orcamento} transações por minuto: o mínimo é 1")
+        self.sensor = sensor
+        regras = {**REGRAS_PADRAO, **(regras or {})}
+        self.estados = {p: _EstadoParametro(regras[p]) for p in PARAMETROS}
+        self.orcamento = orcamento
+        # Um evento num parâmetro (ex.: irrigação mexe na umidade) antecipa os demais
+        self.propagar_eventos = propagar_eventos
+        self._fichas = orcamento if orcamento is not None else 0.0
+        self._recarga = None
+        self.transacoes = 0
+        self.leituras = 0
+
+    def _custo(self, parametros: Iterable[str]) -> int:
+        return len(self.sensor.planejar_leitura(parametros))
+
+    def _completar_blocos(self, parametros: List[str]) -> List[str]:
+        cobertos = {p for _, _, incluidos in self.sensor.planejar_leitura(parametros) for p in incluidos}
+        return [p for p in PARAMETROS if p in parametros or p in cobertos]
+
+    def _recarregar(self, agora: float):
+        if self.orcamento is None:
+            return
+        if self._recarga is not None:
+            self._fichas = min(self.orcamento, self._fichas + (agora - self._recarga) * self.orcamento / 60)
+        self._recarga = agora
+
+    def devidos(self, agora: Optional[float] = None) -> List[str]:
+        # Mais atrasados (em frações do próprio período) primeiro, até onde o orçamento deixa
+        agora = time.monotonic() if agora is None else agora
+        self._recarregar(agora)
+        atrasados = sorted((p for p, e in self.estados.items() if e.devido <= agora),
+                           key=lambda p: (self.estados[p].devido - agora) / self.estados[p].periodo)
+        if self.orcamento is None:
+            return atrasados
+        escolhidos = []
+        for parametro in atrasados:
+            if self._custo(escolhidos + [parametro]) <= self._fichas:
+                escolhidos.append(parametro)
+        return escolhidos
+
+    def espera(self, agora: Optional[float] = None) -> float:
+        agora = time.monotonic() if agora is None else agora
+        espera = max(min(e.devido for e in self.estados.values()) - agora, 0.0)
+        if self.orcamento is not None and self._fichas < 1:
+            espera = max(espera, (1 - self._fichas) * 60 / self.orcamento)
+        return espera
+
+    def ler(self, agora: Optional[float] = None) -> Optional[Dict]:
+        # Lê o que está devido -> dict com os sete parâmetros e 'frescos'; None se nada está devido
+        agora = time.monotonic() if agora is None else agora
+        devidos = self.devidos(agora)
+        if not devidos:
+            return None
+        parametros = self._completar_blocos(devidos)
+        custo = self._custo(parametros)
+        lidos = self.sensor.ler_todos_dados(parametros)
+        self.transacoes += custo
+        self.leituras += 1
+        if self.orcamento is not None:
+            self._fichas -= custo
+
+        evento = False
+        for parametro in parametros:
+            evento |= self.estados[parametro].registrar(lidos.get(parametro), agora)
+        if evento and self.propagar_eventos:
+            for estado in self.estados.values():
+                estado.devido = min(estado.devido, agora + estado.regra.periodo_minimo)
+
+        dados = {p: lidos[p] if p in lidos else self.estados[p].valor for p in PARAMETROS}
+        dados['frescos'] = [p for p in PARAMETROS if lidos.get(p) is not None]
+        dados['timestamp'] = lidos.get('timestamp') or datetime.now().isoformat()
+        return dados
+
+    def antecipar(self):
+        # Todos os parâmetros devidos já (ex.: depois de uma reconexão)
+        for estado in self.estados.values():
+            estado.devido = 0.0
+
+    def periodos(self) -> Dict[str, float]:
+        return {p: round(e.periodo, 1) for p, e in self.estados.items()}
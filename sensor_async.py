@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Driver asyncio do Sensor de Solo 7 em 1
+Mesma lógica de SensorSolo7em1 (blocos, perfil de NPK, tentativas) sobre um
+descritor serial não bloqueante, para um único loop de eventos atender vários
+sensores. Usa termios: funciona com portas seriais e pty no Linux/macOS
+"""
+
+import asyncio
+import os
+import termios
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import modbus_rtu
+from sensor_solo import SensorSolo7em1
+
+
+class PortaSerialAsync:
+    # Porta serial em modo raw (8N1) lida com loop.add_reader, sem threads.
+    # Vários sensores podem compartilhar a mesma porta; o lock serializa as transações
+
+    def __init__(self, caminho: str, baudrate: int = 4800):
+        self.caminho = caminho
+        self.baudrate = baudrate
+        self.fd = None
+        self.lock = asyncio.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.fd is not None
+
+    def abrir(self):
+        fd = os.open(self.caminho, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        try:
+            iflag, oflag, cflag, lflag, ispeed, ospeed, cc = termios.tcgetattr(fd)
+            velocidade = getattr(termios, f"B{self.baudrate}")
+            cflag = (cflag & ~(termios.CSIZE | termios.PARENB | termios.CSTOPB)) | termios.CS8 | termios.CREAD | termios.CLOCAL
+            # VMIN 1: sem dados, read() falha com EAGAIN e a espera vai para o add_reader.
+            # Com VMIN 0 ele devolveria b'' na hora e a corrotina giraria sem ceder o loop
+            cc[termios.VMIN] = 1
+            cc[termios.VTIME] = 0
+            termios.tcsetattr(fd, termios.TCSANOW, [0, 0, cflag, 0, velocidade, velocidade, cc])
+            termios.tcflush(fd, termios.TCIOFLUSH)
+        except Exception:
+            os.close(fd)
+            raise
+        self.fd = fd
+
+    def limpar_entrada(self):
+        try:
+            termios.tcflush(self.fd, termios.TCIFLUSH)
+        except (termios.error, OSError) as e:
+            raise ConnectionError(f"Porta {self.caminho} indisponível: {e}") from e
+
+    async def escrever(self, dados: bytes):
+        loop = asyncio.get_running_loop()
+        enviados = 0
+        while enviados < len(dados):
+            try:
+                enviados += os.write(self.fd, dados[enviados:])
+            except BlockingIOError:
+                pronto = loop.create_future()
+                loop.add_writer(self.fd, self._sinalizar, pronto)
+                try:
+                    await pronto
+                finally:
+                    loop.remove_writer(self.fd)
+            except OSError as e:
+                raise ConnectionError(f"Porta {self.caminho} indisponível: {e}") from e
+
+    async def ler(self, n: int) -> bytes:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                dados = os.read(self.fd, n)
+            except BlockingIOError:
+                pass
+            except OSError as e:
+                # EIO: o pty ou o adaptador USB sumiu. O descritor segue "legível" para sempre,
+                # então esperar de novo no add_reader só giraria o loop a 100% de CPU
+                raise ConnectionError(f"Porta {self.caminho} indisponível: {e}") from e
+            else:
+                if not dados:
+                    # Fim de arquivo: a linha foi desligada (hangup)
+                    raise ConnectionError(f"Porta {self.caminho} desligada")
+                return dados
+            pronto = loop.create_future()
+            loop.add_reader(self.fd, self._sinalizar, pronto)
+            try:
+                await pronto
+            finally:
+                loop.remove_reader(self.fd)
+
+    def _sinalizar(self, pronto: asyncio.Future):
+        # O callback pode disparar de novo antes de o reader ser removido
+        if not pronto.done():
+            pronto.set_result(None)
+
+    def fechar(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class SensorSolo7em1Async(SensorSolo7em1):
+    def __init__(self, porta_com: str = None, endereco_slave: int = 1, baudrate: int = 4800,
+                 porta: Optional[PortaSerialAsync] = None, **kwargs):
+        super().__init__(porta_com, endereco_slave, baudrate, conectar_agora=False, **kwargs)
+        self.porta = porta
+
+    async def conectar(self):
+        if self.porta is None:
+            self.porta = PortaSerialAsync(self.porta_com, self.baudrate)
+        if not self.porta.is_open:
+            try:
+                self.porta.abrir()
+            except Exception as e:
+                print(f"Erro ao conectar: {e}")
+                raise
+            print(f"Conectado ao sensor na porta {self.porta.caminho}")
+
+    async def _transacao(self, endereco: int, quantidade: int) -> List[int]:
+        requisicao = modbus_rtu.criar_requisicao(self.endereco_slave, 3, endereco, quantidade)
+        tamanho = modbus_rtu.tamanho_resposta(3, quantidade)
+        async with self.porta.lock:
+            await asyncio.sleep(self.temporizador.silencio_restante())
+            self.porta.limpar_entrada()
+            prazo = self.temporizador.prazo_resposta(self.endereco_slave, len(requisicao), tamanho)
+            parser = modbus_rtu.ParserRTU(self.endereco_slave)
+            loop = asyncio.get_running_loop()
+            inicio = loop.time()
+            try:
+                await self.porta.escrever(requisicao)
+                quadro = await asyncio.wait_for(self._receber(parser), prazo)
+            except asyncio.TimeoutError:
+                self.temporizador.registrar_timeout(self.endereco_slave)
+                recebido = bytes(parser.buffer)
+                raise modbus_rtu.ErroTimeout(f"Resposta incompleta: {recebido.hex() if recebido else 'vazia'}")
+            finally:
+                self.temporizador.marcar_trafego()
+            self.temporizador.registrar_resposta(self.endereco_slave, loop.time() - inicio,
+                                                 len(requisicao), tamanho)
+        return modbus_rtu.decodificar_registradores(quadro, self.endereco_slave, 3, quantidade)
+
+    async def _receber(self, parser: modbus_rtu.ParserRTU) -> modbus_rtu.QuadroRTU:
+        while True:
+            quadro = parser.alimentar(await self.porta.ler(parser.faltam() or 1))
+            if quadro is not None:
+                return quadro
+
+    async def ler_registradores(self, endereco: int, quantidade: int = 1, tentativas: Optional[int] = None) -> Optional[List[int]]:
+        tentativas = self._tentativas_liberadas(endereco, quantidade, tentativas)
+        for i in range(tentativas):
+            inicio = time.monotonic()
+            try:
+                valores = await self._transacao(endereco, quantidade)
+                self.telemetria.registrar_sucesso(self.endereco_slave, endereco, time.monotonic() - inicio, i > 0)
+                self._registrar_resultado(endereco, quantidade)
+                return valores
+            except Exception as e:
+                self.ultimo_erro = e
+                self.telemetria.registrar_erro(self.endereco_slave, endereco, e, i > 0)
+                if not self._registrar_resultado(endereco, quantidade, e) or i == tentativas - 1:
+                    self.telemetria.registrar_falha(self.endereco_slave, endereco)
+                    print(f"Erro ao ler registradores {endereco} (+{quantidade}): {e}")
+                    return None
+                atraso = self.temporizador.atraso_nova_tentativa(i)
+                self.telemetria.registrar_espera(self.endereco_slave, endereco, atraso)
+                await asyncio.sleep(atraso)
+        return None
+
+    async def ler_registrador(self, endereco: int, fator_escala: float = 0.1, tentativas: Optional[int] = None) -> Optional[float]:
+        valores = await self.ler_registradores(endereco, 1, tentativas)
+        if valores is None:
+            return None
+        return valores[0] * fator_escala
+
+    async def _ler_blocos(self, enderecos) -> Dict[int, int]:
+        enderecos = set(enderecos)
+        brutos = {}
+        for inicio, quantidade in self._planejar_blocos(enderecos):
+            valores = await self.ler_registradores(inicio, quantidade)
+            if valores is None and not brutos and self._sem_resposta():
+                break
+            if valores is None and quantidade > 1:
+                for endereco in enderecos:
+                    if inicio <= endereco < inicio + quantidade:
+                        valor = await self.ler_registradores(endereco, 1)
+                        if valor is not None:
+                            brutos[endereco] = valor[0]
+                continue
+            if valores is not None:
+                for j, valor in enumerate(valores):
+                    brutos[inicio + j] = valor
+        return brutos
+
+    async def ler_npk_alternativo(self, nutriente: str) -> Optional[float]:
+        if nutriente not in self.registradores_alternativos:
+            return None
+        for reg in self._busca_npk(nutriente):
+            valores = await self.ler_registradores(reg, 1)
+            if valores is not None:
+                valor = self._avaliar_npk(nutriente, reg, valores[0])
+                if valor is not None:
+                    return valor
+        self._candidatos_npk.pop(nutriente, None)
+        return 0.0
+
+    async def ler_todos_dados(self) -> Dict[str, float]:
+        dados = {}
+        mapa = self._registradores_leitura()
+        brutos = await self._ler_blocos(endereco for endereco, _ in mapa.values())
+
+        for parametro, (endereco, fator) in mapa.items():
+            valor = brutos.get(endereco)
+            dados[parametro] = valor * fator if valor is not None else None
+
+        for nutriente in ['nitrogenio', 'fosforo', 'potassio'] if brutos else []:
+            if dados[nutriente] is None or dados[nutriente] == 0:
+                dados[nutriente] = await self.ler_npk_alternativo(nutriente)
+
+        dados['timestamp'] = datetime.now().isoformat()
+        return dados
+
+    async def desconectar(self):
+        try:
+            if self.porta is not None:
+                self.porta.fechar()
+            print("Conexão fechada")
+        except Exception as e:
+            print(f"Erro ao fechar conexão: {e}")
@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+"""
+Driver do Sensor de Solo RS485 Modbus 7 em 1
+Lê umidade, temperatura, pH, condutividade elétrica, N, P e K e salva as
+leituras. Não depende do Kivy: serve à interface, ao daemon e aos scripts
+"""
+
+import time
+import json
+from datetime import datetime
+from typing import Dict, Iterable, Optional, List, Tuple
+
+import autobaud
+import modbus_rtu
+from temporizacao import TemporizadorModbus
+from perfil_dispositivo import PerfilDispositivos, chave_dispositivo
+from catalogo import CatalogoSessoes
+from telemetria import TelemetriaBarramento, classificar_erro
+from disjuntor import ABERTO, FECHADO, MEIO_ABERTO, CircuitoAberto, Disjuntor
+
+# Importações para Android
+try:
+    import usb4a.usb as usb
+    import usbserial4a.serial4a as serial4a
+    ANDROID = True
+except ImportError:
+    import serial
+    import serial.tools.list_ports
+    import minimalmodbus
+    ANDROID = False
+
+# Faixa de N, P e K dos sensores 7 em 1 (mg/kg): acima dela o fator de escala está errado
+NPK_MAXIMO = 1999.0
+
+
+class SensorSolo7em1:
+    # Limite do protocolo para a função 03 (leitura de registradores)
+    MAX_REGISTROS_BLOCO = 125
+
+    def __init__(self, porta_com: str = None, endereco_slave: int = 1, baudrate: int = 4800,
+                 max_intervalo_bloco: int = 4, arquivo_perfil: str = "perfil_sensor.json",
+                 conectar_agora: bool = True, serial_port=None, tentativas: int = 3,
+                 arquivo_catalogo: str = "catalogo_sessoes.db", autobaud: bool = False,
+                 promover_baud: bool = False):
+        self.porta_com = porta_com
+        self.endereco_slave = endereco_slave
+        self.baudrate = baudrate
+        # Com autobaud, conectar() usa o baudrate/endereço do perfil (confirmado com uma leitura)
+        # ou varre os candidatos; promover_baud passa a sonda para a maior velocidade suportada
+        self.endereco_configurado = endereco_slave
+        self.autobaud = autobaud
+        self.promover_baud = promover_baud
+        # Maior quantidade de registradores não usados que pode ser lida "de carona"
+        # para juntar dois registradores em uma única transação
+        self.max_intervalo_bloco = max_intervalo_bloco
+        self.instrumento = None
+        # Uma porta já aberta (estilo pyserial) pode ser compartilhada por vários
+        # escravos no mesmo barramento; nesse caso a leitura usa o codec RTU direto
+        self.serial_port = serial_port
+        self.tentativas = tentativas
+        self.ultimo_erro = None
+        self.dados = {}
+        self.temporizador = TemporizadorModbus(baudrate)
+        self.telemetria = TelemetriaBarramento()
+        self.perfil = PerfilDispositivos(arquivo_perfil)
+        self.usb_vid = None
+        self.usb_pid = None
+        self.arquivo_catalogo = arquivo_catalogo
+        self._catalogo = None
+        # GerenciadorConexao (conexao.py), quando houver: sem conexão a leitura volta None na hora
+        self.conexao = None
+        # Disjuntores: um do escravo (sonda desligada ou mudo) e um por leitura (endereço, quantidade)
+        # para registradores que o firmware não tem. Aberto, a leitura volta None sem transação
+        self.disjuntor = Disjuntor(espera_inicial=2.0, espera_maxima=60.0)
+        self.disjuntores_registradores: Dict[Tuple[int, int], Disjuntor] = {}
+        # NPK achado num registrador alternativo e ainda não confirmado: {nutriente: (registrador, fator)}
+        self._candidatos_npk: Dict[str, Tuple[int, float]] = {}
+
+        self.registradores = {
+            'umidade': 0x0015,
+            'temperatura': 0x0001,
+            'ph': 0x0024,
+            'condutividade': 0x0064,
+            'nitrogenio': 0x0012,
+            'fosforo': 0x0013,
+            'potassio': 0x0014
+        }
+
+        self.registradores_alternativos = {
+            'nitrogenio': [0x0004, 0x0012, 0x0025, 0x0030],
+            'fosforo': [0x0005, 0x0013, 0x0026, 0x0031],
+            'potassio': [0x0006, 0x0014, 0x0027, 0x0032]
+        }
+
+        self.fatores_escala = {
+            'umidade': 0.1,
+            'temperatura': 0.1,
+            'ph': 0.1,
+            'condutividade': 1.0,
+            'nitrogenio': 1.0,
+            'fosforo': 1.0,
+            'potassio': 1.0
+        }
+
+        if conectar_agora:
+            self.conectar()
+
+    def conectar(self, device=None):
+        # device: UsbDevice já localizado (Android); sem ele, procura o CH340 na lista USB.
+        # Falhas levantam ConnectionError: com GerenciadorConexao, a reconexão é automática
+        try:
+            if ANDROID:
+                from conexao import PermissaoUSB, localizar_dispositivo_android
+                if device is None:
+                    device = localizar_dispositivo_android()
+                
+                if not device:
+                    raise ConnectionError("Dispositivo alvo (Vendor ID=6790, Product ID=29987) não encontrado")
+                
+                permissao = self.conexao.permissao if self.conexao is not None else PermissaoUSB()
+                if not usb.has_usb_permission(device):
+                    print("Solicitando permissão para acessar o dispositivo USB...")
+                if not permissao.aguardar(device):
+                    raise ConnectionError("Permissão USB não concedida")
+                
+                print("Permissão USB concedida.")
+                self.usb_vid = device.getVendorId()
+                self.usb_pid = device.getProductId()
+                
+                self.serial_port = serial4a.get_serial_port(
+                    device.getDeviceName(),
+                    self.baudrate,
+                    8,
+                    'N',
+                    1,
+                    timeout=2.0
+                )
+                self.serial_port.DEFAULT_READ_BUFFER_SIZE = 16 * 1024
+                self.serial_port.USB_READ_TIMEOUT_MILLIS = 100
+                
+                if not self.serial_port.is_open:
+                    self.serial_port.open()
+                
+                print(f"Conectado ao sensor via USB no Android em {device.getDeviceName()}")
+            else:
+                self.instrumento = minimalmodbus.Instrument(self.porta_com, self.endereco_slave)
+                self.instrumento.serial.baudrate = self.baudrate
+                self.instrumento.serial.bytesize = 8
+                self.instrumento.serial.parity = serial.PARITY_NONE
+                self.instrumento.serial.stopbits = 1
+                self.instrumento.serial.timeout = 2.0
+                self.instrumento.mode = minimalmodbus.MODE_RTU
+                self.instrumento.clear_buffers_before_each_transaction = True
+                # O minimalmodbus reaproveita a porta de um Instrument anterior, que pode estar fechada
+                if not self.instrumento.serial.is_open:
+                    self.instrumento.serial.open()
+                for porta in serial.tools.list_ports.comports():
+                    if porta.device == self.porta_com:
+                        self.usb_vid, self.usb_pid = porta.vid, porta.pid
+                        break
+                print(f"Conectado ao sensor na porta {self.porta_com}")
+
+        except Exception as e:
+            print(f"Erro ao conectar: {e}")
+            raise
+        self._restaurar_comunicacao()
+
+    def _porta_serial(self):
+        # Porta no estilo pyserial da transação: a própria ou a do minimalmodbus
+        if ANDROID or self.serial_port is not None:
+            return self.serial_port
+        return self.instrumento.serial if self.instrumento is not None else None
+
+    def _usar_comunicacao(self, baudrate: int, endereco: int):
+        self.baudrate = baudrate
+        self.temporizador.baudrate = baudrate
+        porta = self._porta_serial()
+        if porta is not None and porta.baudrate != baudrate:
+            porta.baudrate = baudrate
+        self.endereco_slave = endereco
+        if self.instrumento is not None:
+            self.instrumento.address = endereco
+
+    @property
+    def chave_comunicacao(self) -> str:
+        # Sob o endereço configurado: é com ele que a próxima conexão procura, mesmo que a sonda esteja em outro
+        return chave_dispositivo(self.endereco_configurado, self.usb_vid, self.usb_pid, self.porta_com)
+
+    def detectar_comunicacao(self, enderecos: Optional[Iterable[int]] = None, promover: bool = False) -> bool:
+        # Varre os baudrates candidatos nos endereços dados (padrão: só o configurado) e guarda no perfil
+        porta = self._porta_serial()
+        encontrado = autobaud.detectar(porta, enderecos or (self.endereco_configurado,))
+        if encontrado is None:
+            print(f"Sonda {self.endereco_configurado} não respondeu em "
+                  f"{', '.join(map(str, autobaud.BAUDRATES_CANDIDATOS))} bps")
+            return False
+        baudrate, endereco = encontrado
+        if promover:
+            baudrate = autobaud.promover(porta, endereco, baudrate)
+        self._usar_comunicacao(baudrate, endereco)
+        self.perfil.definir_comunicacao(self.chave_comunicacao, baudrate, endereco)
+        print(f"Sonda {endereco} a {baudrate} bps")
+        return True
+
+    def _restaurar_comunicacao(self):
+        salvo = self.perfil.comunicacao(self.chave_comunicacao)
+        if salvo is not None and (not self.autobaud or autobaud.sondar(self._porta_serial(), *salvo)):
+            self._usar_comunicacao(*salvo)
+        elif self.autobaud:
+            # Sem perfil, ou a sonda não está mais onde o perfil diz (reconfigurada, trocada)
+            self.detectar_comunicacao(promover=self.promover_baud)
+
+    def _calcular_crc16(self, data):
+        return modbus_rtu.crc16(data).to_bytes(2, byteorder='little')
+
+    def _criar_comando_modbus(self, slave_addr, function_code, register_addr, register_count=1):
+        return modbus_rtu.criar_requisicao(slave_addr, function_code, register_addr, register_count)
+
+    def _planejar_blocos(self, enderecos) -> List[Tuple[int, int]]:
+        # Agrupa os endereços em blocos (inicio, quantidade) lidos numa única transação
+        blocos = []
+        for endereco in sorted(set(enderecos)):
+            if blocos:
+                inicio, quantidade = blocos[-1]
+                fim = inicio + quantidade - 1
+                nova_quantidade = endereco - inicio + 1
+                if (endereco - fim - 1 <= self.max_intervalo_bloco
+                        and nova_quantidade <= self.MAX_REGISTROS_BLOCO):
+                    blocos[-1] = (inicio, nova_quantidade)
+                    continue
+            blocos.append((endereco, 1))
+        return blocos
+
+    def _disjuntor_registrador(self, endereco: int, quantidade: int) -> Disjuntor:
+        chave = (endereco, quantidade)
+        disjuntor = self.disjuntores_registradores.get(chave)
+        if disjuntor is None:
+            disjuntor = self.disjuntores_registradores[chave] = Disjuntor(espera_inicial=60.0, espera_maxima=3600.0)
+        return disjuntor
+
+    def _tentativas_liberadas(self, endereco: int, quantidade: int, tentativas: Optional[int]) -> int:
+        # 0 com algum disjuntor aberto; 1 na leitura de teste de um disjuntor meio aberto
+        registrador = self._disjuntor_registrador(endereco, quantidade)
+        if not self.disjuntor.permitir() or not registrador.permitir():
+            self.ultimo_erro = CircuitoAberto(f"Circuito aberto para o registrador {endereco} (+{quantidade})")
+            return 0
+        if MEIO_ABERTO in (self.disjuntor.estado, registrador.estado):
+            return 1
+        return tentativas or self.tentativas
+
+    def _registrar_resultado(self, endereco: int, quantidade: int, erro: Optional[Exception] = None) -> bool:
+        # Atribui a falha ao escravo ou ao registrador; devolve False se a leitura não deve ser repetida
+        registrador = self._disjuntor_registrador(endereco, quantidade)
+        if erro is None:
+            self.disjuntor.registrar_sucesso()
+            registrador.registrar_sucesso()
+            return True
+        if classificar_erro(erro) == 'excecoes':
+            # O escravo respondeu: o problema é só deste registrador
+            self.disjuntor.registrar_sucesso()
+            if registrador.registrar_falha():
+                print(f"Registrador {endereco} (+{quantidade}) desativado por "
+                      f"{registrador.proxima_tentativa - time.monotonic():.0f}s")
+        elif registrador.sucessos or not self.disjuntor.sucessos:
+            # Registrador que já respondeu (ou escravo que nunca respondeu) ficou mudo: a sonda caiu
+            if self.disjuntor.registrar_falha():
+                print(f"Escravo {self.endereco_slave} sem resposta: leituras suspensas por "
+                      f"{self.disjuntor.proxima_tentativa - time.monotonic():.0f}s")
+        elif registrador.registrar_falha():
+            print(f"Registrador {endereco} (+{quantidade}) desativado por "
+                  f"{registrador.proxima_tentativa - time.monotonic():.0f}s")
+        return self.disjuntor.estado != ABERTO and registrador.estado != ABERTO
+
+    def estado_disjuntores(self) -> Dict:
+        # Escravo e só os registradores que não estão fechados
+        return {
+            'escravo': self.disjuntor.instantaneo(),
+            'registradores': {f"0x{endereco:04X}+{quantidade}": d.instantaneo()
+                              for (endereco, quantidade), d in sorted(list(self.disjuntores_registradores.items()))
+                              if d.estado != FECHADO},
+        }
+
+    def ler_registradores(self, endereco: int, quantidade: int = 1, tentativas: Optional[int] = None) -> Optional[List[int]]:
+        if self.conexao is not None and not self.conexao.disponivel():
+            return None
+        tentativas = self._tentativas_liberadas(endereco, quantidade, tentativas)
+        for i in range(tentativas):
+            inicio = time.monotonic()
+            try:
+                if ANDROID or self.serial_port is not None:
+                    self.serial_port.reset_input_buffer()
+                    self.serial_port.reset_output_buffer()
+                    valores = modbus_rtu.ler_registradores(self.serial_port, self.endereco_slave, endereco,
+                                                           quantidade, temporizador=self.temporizador)
+                else:
+                    valores = self._ler_registradores_minimalmodbus(endereco, quantidade)
+                self.telemetria.registrar_sucesso(self.endereco_slave, endereco, time.monotonic() - inicio, i > 0)
+                self._registrar_resultado(endereco, quantidade)
+                return valores
+            except Exception as e:
+                self.ultimo_erro = e
+                self.telemetria.registrar_erro(self.endereco_slave, endereco, e, i > 0)
+                if self.conexao is not None and self.conexao.queda(e):
+                    # Porta caiu: o gerenciador reabre em segundo plano, repetir agora não adianta
+                    return None
+                if not self._registrar_resultado(endereco, quantidade, e) or i == tentativas - 1:
+                    self.telemetria.registrar_falha(self.endereco_slave, endereco)
+                    print(f"Erro ao ler registradores {endereco} (+{quantidade}): {e}")
+                    return None
+                atraso = self.temporizador.atraso_nova_tentativa(i)
+                self.telemetria.registrar_espera(self.endereco_slave, endereco, atraso)
+                time.sleep(atraso)
+        return None
+
+    def _sem_resposta(self) -> bool:
+        # Distingue "escravo mudo" de "escravo respondeu com erro" na última falha
+        if self.disjuntor.estado == ABERTO or isinstance(self.ultimo_erro, modbus_rtu.ErroTimeout):
+            return True
+        if self.conexao is not None and not self.conexao.disponivel():
+            return True
+        return not ANDROID and isinstance(self.ultimo_erro, minimalmodbus.NoResponseError)
+
+    def _ler_registradores_minimalmodbus(self, endereco: int, quantidade: int) -> List[int]:
+        # O minimalmodbus já respeita o silêncio de 3,5 caracteres e lê o tamanho
+        # exato da resposta; aqui só ajustamos o timeout ao prazo aprendido
+        tamanho_resposta = modbus_rtu.tamanho_resposta(3, quantidade)
+        self.instrumento.serial.timeout = self.temporizador.prazo_resposta(self.endereco_slave, 8, tamanho_resposta)
+        inicio = time.monotonic()
+        try:
+            valores = self.instrumento.read_registers(endereco, quantidade)
+        except minimalmodbus.NoResponseError:
+            self.temporizador.registrar_timeout(self.endereco_slave)
+            raise
+        self.temporizador.registrar_resposta(self.endereco_slave, time.monotonic() - inicio, 8, tamanho_resposta)
+        return valores
+
+    def ler_registrador(self, endereco: int, fator_escala: float = 0.1, tentativas: Optional[int] = None) -> Optional[float]:
+        valores = self.ler_registradores(endereco, 1, tentativas)
+        if valores is None:
+            return None
+        return valores[0] * fator_escala
+
+    def _ler_blocos(self, enderecos) -> Dict[int, int]:
+        # Lê os endereços pedidos com o menor número de transações -> {endereco: valor bruto}
+        enderecos = set(enderecos)
+        brutos = {}
+        for inicio, quantidade in self._planejar_blocos(enderecos):
+            valores = self.ler_registradores(inicio, quantidade)
+            if valores is None and not brutos and self._sem_resposta():
+                # Nenhuma resposta à primeira transação: não insiste nos demais blocos
+                break
+            if valores is None and quantidade > 1:
+                # Alguns sensores recusam blocos que cruzam registradores não mapeados:
+                # nesse caso volta para a leitura individual só deste bloco
+                for endereco in enderecos:
+                    if inicio <= endereco < inicio + quantidade:
+                        valor = self.ler_registradores(endereco, 1)
+                        if valor is not None:
+                            brutos[endereco] = valor[0]
+                continue
+            if valores is not None:
+                for j, valor in enumerate(valores):
+                    brutos[inicio + j] = valor
+        return brutos
+
+    @property
+    def chave_dispositivo(self) -> str:
+        return chave_dispositivo(self.endereco_slave, self.usb_vid, self.usb_pid, self.porta_com)
+
+    def _registradores_leitura(self) -> Dict[str, Tuple[int, float]]:
+        # Registrador e fator de cada parâmetro, já com o mapeamento de NPK salvo no perfil
+        mapa = {}
+        for parametro, endereco in self.registradores.items():
+            mapa[parametro] = (endereco, self.fatores_escala.get(parametro, 1.0))
+            if parametro in self.registradores_alternativos:
+                descoberto = self.perfil.mapeamento_npk(self.chave_dispositivo, parametro)
+                if descoberto:
+                    mapa[parametro] = descoberto
+        return mapa
+
+    def planejar_leitura(self, parametros: Iterable[str]) -> List[Tuple[int, int, List[str]]]:
+        # Transações que ler_todos_dados(parametros) faria -> [(inicio, quantidade, parâmetros no bloco)].
+        # Cada bloco lista também os parâmetros que vêm "de carona" nele
+        mapa = self._registradores_leitura()
+        blocos = self._planejar_blocos(mapa[p][0] for p in parametros if p in mapa)
+        return [(inicio, quantidade,
+                 [p for p, (endereco, _) in mapa.items() if inicio <= endereco < inicio + quantidade])
+                for inicio, quantidade in blocos]
+
+    def _busca_npk(self, nutriente: str) -> List[int]:
+        # Registradores alternativos, sem o que acabou de voltar vazio ou zero
+        atual = self._registradores_leitura()[nutriente][0]
+        return [reg for reg in self.registradores_alternativos[nutriente] if reg != atual]
+
+    def _avaliar_npk(self, nutriente: str, registrador: int, bruto: int) -> Optional[float]:
+        # Fator do mapa principal primeiro; os outros só quando ele dá um valor fora da faixa.
+        # O par só vai para o perfil quando a busca seguinte o confirma
+        for fator in dict.fromkeys((self.fatores_escala.get(nutriente, 1.0), 0.1, 10.0)):
+            valor = bruto * fator
+            if 0 < valor <= NPK_MAXIMO:
+                break
+        else:
+            return None
+        if self._candidatos_npk.get(nutriente) == (registrador, fator):
+            del self._candidatos_npk[nutriente]
+            print(f"Confirmado {nutriente} no registrador 0x{registrador:04X} com fator {fator}: {valor}")
+            self.perfil.definir_npk(self.chave_dispositivo, nutriente, registrador, fator)
+        else:
+            self._candidatos_npk[nutriente] = (registrador, fator)
+            print(f"Encontrado {nutriente} no registrador 0x{registrador:04X} com fator {fator}: {valor}")
+        return valor
+
+    def ler_npk_alternativo(self, nutriente: str) -> Optional[float]:
+        if nutriente not in self.registradores_alternativos:
+            return None
+        for reg in self._busca_npk(nutriente):
+            # O fator não muda o valor bruto: basta uma leitura por registrador
+            valores = self.ler_registradores(reg, 1)
+            if valores is not None:
+                valor = self._avaliar_npk(nutriente, reg, valores[0])
+                if valor is not None:
+                    return valor
+        # Nada encontrado não muda o perfil: pode ser só um zero passageiro
+        self._candidatos_npk.pop(nutriente, None)
+        return 0.0
+
+    def ler_todos_dados(self, parametros: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        # parametros: só estes são lidos (e aparecem no dict); None lê os sete
+        dados = {}
+        mapa = self._registradores_leitura()
+        if parametros is not None:
+            mapa = {p: mapa[p] for p in parametros if p in mapa}
+        brutos = self._ler_blocos(endereco for endereco, _ in mapa.values())
+
+        for parametro, (endereco, fator) in mapa.items():
+            valor = brutos.get(endereco)
+            dados[parametro] = valor * fator if valor is not None else None
+
+        # Só procura nos registradores alternativos quando a leitura atual não é válida
+        # e o sensor está respondendo
+        for nutriente in [n for n in ('nitrogenio', 'fosforo', 'potassio') if n in dados] if brutos else []:
+            if dados[nutriente] is None or dados[nutriente] == 0:
+                dados[nutriente] = self.ler_npk_alternativo(nutriente)
+
+        dados['timestamp'] = datetime.now().isoformat()
+        return dados
+
+    @property
+    def catalogo(self) -> CatalogoSessoes:
+        # Aberto só quando algo é salvo: instâncias usadas apenas para leitura não tocam no banco
+        if self._catalogo is None:
+            self._catalogo = CatalogoSessoes(self.arquivo_catalogo)
+        return self._catalogo
+
+    def _salvar_json(self, conteudo, arquivo_base: str, modo: str, leituras: List[Dict]) -> str:
+        sessao_id, arquivo = self.catalogo.alocar_arquivo(arquivo_base, '.json', modo, self.endereco_slave)
+        try:
+            with open(arquivo, 'w', encoding='utf-8') as f:
+                json.dump(conteudo, f, indent=2, ensure_ascii=False)
+        except Exception:
+            self.catalogo.remover(sessao_id)
+            raise
+        horarios = [d['timestamp'] for d in leituras if d.get('timestamp')]
+        self.catalogo.registrar_leituras(sessao_id, min(horarios, default=None), max(horarios, default=None),
+                                         len(leituras))
+        return arquivo
+
+    def salvar_dados(self, dados: Dict[str, float], arquivo_base: str = "dados_sensor_solo"):
+        try:
+            arquivo = self._salvar_json(dados, arquivo_base, 'unica', [dados])
+            print(f"Dados salvos em {arquivo}")
+            return arquivo
+        except Exception as e:
+            print(f"Erro ao salvar dados: {e}")
+            return None
+
+    def salvar_dados_continuo(self, dados: Dict[str, float], arquivo_base: str = "dados_sensor_solo_continuo"):
+        try:
+            leituras = dados.get('leituras', [dados]) if isinstance(dados, dict) else dados
+            arquivo = self._salvar_json(dados, arquivo_base, 'continuo', leituras)
+            print(f"Dados salvos em {arquivo}")
+            return arquivo
+        except Exception as e:
+            print(f"Erro ao salvar dados contínuos: {e}")
+            return None
+
+    def salvar_media(self, leituras: List[Dict], media: Dict, arquivo_base: str = "dados_sensor_solo",
+                     estatisticas: Optional[Dict] = None):
+        try:
+            media_completa = {'media': media, 'leituras': leituras, 'timestamp': media['timestamp']}
+            if estatisticas is not None:
+                media_completa['estatisticas'] = estatisticas
+            arquivo = self._salvar_json(media_completa, f"{arquivo_base}_media", 'media', leituras)
+            print(f"Média salva em {arquivo}")
+            return arquivo
+        except Exception as e:
+            print(f"Erro ao salvar média: {e}")
+            return None
+
+    def desconectar(self):
+        try:
+            if ANDROID and self.serial_port and self.serial_port.is_open:
+                self.serial_port.close()
+            elif self.instrumento and self.instrumento.serial.is_open:
+                self.instrumento.serial.close()
+            print("Conexão fechada")
+        except Exception as e:
+            print(f"Erro ao fechar conexão: {e}")
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Formato binário compacto para sessões do Sensor de Solo 7 em 1
+Registros de largura fixa (timestamp epoch float64 + 7 parâmetros float32,
+NaN para None) após um cabeçalho pequeno. O leitor mapeia o arquivo em memória
+e devolve colunas NumPy sem cópia
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PARAMETROS = ['umidade', 'temperatura', 'ph', 'condutividade', 'nitrogenio', 'fosforo', 'potassio']
+
+MAGICO = b'TSB1'
+VERSAO = 1
+TAMANHO_CABECALHO = 128
+# Cabeçalho: mágico, versão, tamanho do cabeçalho, tamanho do registro, número de colunas,
+# seguido dos nomes das colunas separados por vírgula (preenchido com zeros)
+_CABECALHO = struct.Struct('<4sHHHH')
+_REGISTRO = struct.Struct('<d' + 'f' * len(PARAMETROS))
+
+if np is not None:
+    DTYPE = np.dtype([('timestamp', '<f8')] + [(p, '<f4') for p in PARAMETROS])
+
+
+def _cabecalho() -> bytes:
+    nomes = ','.join(['timestamp'] + PARAMETROS).encode('ascii')
+    fixo = _CABECALHO.pack(MAGICO, VERSAO, TAMANHO_CABECALHO, _REGISTRO.size, len(PARAMETROS) + 1)
+    return (fixo + nomes).ljust(TAMANHO_CABECALHO, b'\0')
+
+
+def _validar_cabecalho(dados: bytes, caminho: str):
+    # Sessão interrompida antes do primeiro flush: arquivo vazio ou com o cabeçalho pela metade
+    if len(dados) < _CABECALHO.size:
+        raise ValueError(f"{caminho}: cabeçalho incompleto ({len(dados)} bytes)")
+    magico, versao, tamanho, registro, _ = _CABECALHO.unpack_from(dados)
+    if magico != MAGICO or versao != VERSAO or tamanho != TAMANHO_CABECALHO or registro != _REGISTRO.size:
+        raise ValueError(f"{caminho} não é uma sessão binária compatível")
+
+
+def _epoch(timestamp) -> float:
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    return datetime.fromisoformat(timestamp).timestamp()
+
+
+class EscritorSessaoBinaria:
+    def __init__(self, caminho: str, flush_a_cada: int = 1):
+        self.caminho = caminho
+        self.flush_a_cada = max(flush_a_cada, 1)
+        self._arquivo = open(caminho, 'ab')
+        if self._arquivo.tell() == 0:
+            self._arquivo.write(_cabecalho())
+        else:
+            with open(caminho, 'rb') as f:
+                _validar_cabecalho(f.read(TAMANHO_CABECALHO), caminho)
+        self._sem_flush = 0
+        self.total = 0
+
+    def adicionar(self, dados: Dict):
+        valores = [dados.get(p) for p in PARAMETROS]
+        self._arquivo.write(_REGISTRO.pack(_epoch(dados['timestamp']),
+                                           *[math.nan if v is None else v for v in valores]))
+        self.total += 1
+        self._sem_flush += 1
+        if self._sem_flush >= self.flush_a_cada:
+            self._arquivo.flush()
+            self._sem_flush = 0
+
+    def flush(self):
+        self._arquivo.flush()
+        self._sem_flush = 0
+
+    def fechar(self):
+        if not self._arquivo.closed:
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+            self._arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fechar()
+
+
+class SessaoBinaria:
+    # Leitura por mapeamento em memória; sessao['umidade'] é uma view NumPy do arquivo.
+    # Um registro incompleto no fim (queda durante a escrita) é ignorado
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._arquivo = open(caminho, 'rb')
+        try:
+            _validar_cabecalho(self._arquivo.read(TAMANHO_CABECALHO), caminho)
+        except ValueError:
+            self._arquivo.close()
+            raise
+        tamanho = os.fstat(self._arquivo.fileno()).st_size
+        self.total = (tamanho - TAMANHO_CABECALHO) // _REGISTRO.size
+        self._mapa = None
+        self.registros_np = None
+        if self.total:
+            self._mapa = mmap.mmap(self._arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+            if np is not None:
+                self.registros_np = np.frombuffer(self._mapa, dtype=DTYPE, count=self.total,
+                                                  offset=TAMANHO_CABECALHO)
+        elif np is not None:
+            self.registros_np = np.zeros(0, dtype=DTYPE)
+
+    def __len__(self) -> int:
+        return self.total
+
+    def __getitem__(self, coluna: str):
+        if self.registros_np is None:
+            raise RuntimeError("NumPy não instalado: use registros() para iterar")
+        return self.registros_np[coluna]
+
+    def tuplas(self) -> Iterator[Tuple[float, ...]]:
+        # Registros crus: (epoch, umidade, ..., potassio), NaN para ausentes
+        por_bloco = 4096
+        for primeiro in range(0, self.total, por_bloco):
+            inicio = TAMANHO_CABECALHO + primeiro * _REGISTRO.size
+            fim = TAMANHO_CABECALHO + min(primeiro + por_bloco, self.total) * _REGISTRO.size
+            yield from _REGISTRO.iter_unpack(self._mapa[inicio:fim])
+
+    def registros(self) -> Iterator[Dict]:
+        # Float32 volta arredondado a 3 casas: a resolução do sensor é 0,1
+        for valores in self.tuplas():
+            dados = {p: None if math.isnan(v) else round(v, 3) for p, v in zip(PARAMETROS, valores[1:])}
+            dados['timestamp'] = datetime.fromtimestamp(valores[0]).isoformat()
+            yield dados
+
+    def fechar(self):
+        # As views NumPy precisam ser liberadas antes do mmap
+        self.registros_np = None
+        if self._mapa is not None:
+            try:
+                self._mapa.close()
+            except BufferError:
+                # Ainda há colunas em uso fora daqui: o mapa é liberado junto com elas
+                pass
+            self._mapa = None
+        self._arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fechar()
+
+
+def gravar_tuplas(caminho: str, tuplas: Iterable[Tuple[float, ...]]) -> int:
+    # Escrita em lote de registros crus (epoch + 7 valores), sem passar por dicts
+    total = 0
+    with open(caminho, 'wb') as f:
+        f.write(_cabecalho())
+        lote = []
+        for valores in tuplas:
+            lote.append(_REGISTRO.pack(*valores))
+            if len(lote) == 4096:
+                f.write(b''.join(lote))
+                total += len(lote)
+                lote = []
+        f.write(b''.join(lote))
+        total += len(lote)
+    return total
+
+
+def leituras_do_json(caminho: str) -> List[Dict]:
+    # Aceita os três layouts gravados pelo app e também sessões .jsonl
+    if caminho.endswith('.jsonl'):
+        from armazenamento import ler_jsonl
+        return list(ler_jsonl(caminho))
+    with open(caminho, 'r', encoding='utf-8') as f:
+        conteudo = json.load(f)
+    if isinstance(conteudo, dict) and isinstance(conteudo.get('leituras'), list):
+        return conteudo['leituras']
+    if isinstance(conteudo, list):
+        return conteudo
+    return [conteudo]
+
+
+def importar_json(caminho_json: str, caminho_binario: Optional[str] = None) -> str:
+    if caminho_binario is None:
+        caminho_binario = os.path.splitext(caminho_json)[0] + '.tsb'
+    if os.path.exists(caminho_binario):
+        os.remove(caminho_binario)
+    with EscritorSessaoBinaria(caminho_binario, flush_a_cada=1024) as escritor:
+        for dados in leituras_do_json(caminho_json):
+            if dados.get('timestamp'):
+                escritor.adicionar(dados)
+    return caminho_binario
+
+
+def exportar_json(caminho_binario: str, caminho_json: Optional[str] = None) -> str:
+    if caminho_json is None:
+        caminho_json = os.path.splitext(caminho_binario)[0] + '.json'
+    with SessaoBinaria(caminho_binario) as sessao:
+        leituras = list(sessao.registros())
+    with open(caminho_json, 'w', encoding='utf-8') as f:
+        json.dump({'leituras': leituras}, f, indent=2, ensure_ascii=False)
+    return caminho_json
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Converte sessões entre JSON e o formato binário .tsb")
+    parser.add_argument('arquivos', nargs='+', help="Arquivos .json/.jsonl para importar ou .tsb para exportar")
+    args = parser.parse_args()
+    for arquivo in args.arquivos:
+        destino = exportar_json(arquivo) if arquivo.endswith('.tsb') else importar_json(arquivo)
+        print(f"{arquivo} -> {destino}")
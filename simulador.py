@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Simulador Modbus RTU do Sensor de Solo 7 em 1
+Emula um ou mais escravos num par de pseudo-terminais (Linux): responde à
+função 03 com valores configuráveis e à função 06 nos registradores de endereço
+e baudrate, ignora quadros enviados em outra velocidade e pode injetar latência,
+ruído, CRC corrompido e quadros perdidos. O driver abre o lado escravo como uma porta serial
+"""
+
+import os
+import random
+import select
+import struct
+import termios
+import threading
+import time
+import tty
+from typing import Dict, Iterable, List, Optional
+
+import modbus_rtu
+from autobaud import CODIGOS_BAUD, REGISTRADOR_BAUD, REGISTRADOR_ENDERECO
+
+# Mesmo mapa do SensorSolo7em1: parâmetro -> (registrador, fator de escala)
+REGISTRADORES = {
+    'umidade': (0x0015, 0.1),
+    'temperatura': (0x0001, 0.1),
+    'ph': (0x0024, 0.1),
+    'condutividade': (0x0064, 1.0),
+    'nitrogenio': (0x0012, 1.0),
+    'fosforo': (0x0013, 1.0),
+    'potassio': (0x0014, 1.0)
+}
+
+# Variante de firmware com N, P e K nos registradores alternativos 0x0004-0x0006
+REGISTRADORES_NPK_ALTERNATIVO = {'nitrogenio': 0x0004, 'fosforo': 0x0005, 'potassio': 0x0006}
+
+VALORES_PADRAO = {
+    'umidade': 32.5,
+    'temperatura': 24.8,
+    'ph': 6.4,
+    'condutividade': 420,
+    'nitrogenio': 38,
+    'fosforo': 21,
+    'potassio': 95
+}
+
+
+class EscravoSimulado:
+    # ruido: desvio padrão relativo aplicado a cada leitura (0.01 = 1%)
+
+    def __init__(self, endereco: int, valores: Optional[Dict[str, float]] = None, ruido: float = 0.0,
+                 npk_alternativo: bool = False, rng: Optional[random.Random] = None):
+        self.endereco = endereco
+        self.valores = dict(VALORES_PADRAO)
+        if valores:
+            self.valores.update(valores)
+        self.ruido = ruido
+        self.rng = rng or random.Random()
+        self.mapa = {}
+        for parametro, (registrador, fator) in REGISTRADORES.items():
+            if npk_alternativo and parametro in REGISTRADORES_NPK_ALTERNATIVO:
+                registrador = REGISTRADORES_NPK_ALTERNATIVO[parametro]
+            self.mapa[registrador] = (parametro, fator)
+
+    def registrador(self, endereco: int) -> int:
+        # Registradores sem parâmetro respondem 0, como no sensor real
+        if endereco not in self.mapa:
+            return 0
+        parametro, fator = self.mapa[endereco]
+        valor = self.valores[parametro]
+        if self.ruido:
+            valor += self.rng.gauss(0, abs(valor) * self.ruido)
+        return max(0, min(0xFFFF, int(round(valor / fator))))
+
+    def ler(self, inicio: int, quantidade: int) -> List[int]:
+        return [self.registrador(endereco) for endereco in range(inicio, inicio + quantidade)]
+
+
+class SimuladorSensor:
+    # latencia: tempo de processamento do escravo antes de responder (s)
+    # prob_crc / prob_perda: probabilidade de corromper o CRC ou não responder
+    # simular_linha: atrasa a resposta pelo tempo de transmissão no baudrate
+    # baud_apos_reinicio: o baudrate gravado pela função 06 só vale depois de reiniciar()
+
+    def __init__(self, escravos: Iterable[int] = (1,), baudrate: int = 4800, latencia: float = 0.02,
+                 ruido: float = 0.0, prob_crc: float = 0.0, prob_perda: float = 0.0,
+                 valores: Optional[Dict[str, float]] = None, npk_alternativo: bool = False,
+                 simular_linha: bool = True, semente: Optional[int] = None, baud_apos_reinicio: bool = False):
+        self.rng = random.Random(semente)
+        self.escravos = {e: EscravoSimulado(e, valores, ruido, npk_alternativo, self.rng) for e in escravos}
+        self.baudrate = baudrate
+        self.latencia = latencia
+        self.prob_crc = prob_crc
+        self.prob_perda = prob_perda
+        self.simular_linha = simular_linha
+        self.baud_apos_reinicio = baud_apos_reinicio
+        self.baud_gravado = baudrate
+        self.requisicoes = 0
+        self.respostas = 0
+        self.perdidas = 0
+        self.corrompidas = 0
+        self.velocidade_errada = 0
+        self.bytes_recebidos = 0
+        self.bytes_enviados = 0
+        self.caminho = None
+        self._mestre = None
+        self._escravo_fd = None
+        self._thread = None
+        self._parar = threading.Event()
+
+    def iniciar(self) -> str:
+        self._mestre, self._escravo_fd = os.openpty()
+        tty.setraw(self._mestre)
+        tty.setraw(self._escravo_fd)
+        self.caminho = os.ttyname(self._escravo_fd)
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name="simulador-modbus", daemon=True)
+        self._thread.start()
+        return self.caminho
+
+    def _tempo_linha(self, tamanho: int) -> float:
+        return tamanho * 11 / self.baudrate if self.simular_linha else 0.0
+
+    def _velocidade_cliente(self) -> Optional[int]:
+        # Os dois lados do pseudo-terminal compartilham o termios: é a velocidade em que o driver abriu a porta
+        try:
+            velocidade = termios.tcgetattr(self._mestre)[4]
+        except (termios.error, OSError):
+            return None
+        return next((b for b in CODIGOS_BAUD if getattr(termios, f"B{b}", None) == velocidade), None)
+
+    def _executar(self):
+        buffer = bytearray()
+        while not self._parar.is_set():
+            prontos, _, _ = select.select([self._mestre], [], [], 0.1)
+            if not prontos:
+                # Silêncio na linha: restos de quadro incompleto são descartados
+                buffer.clear()
+                continue
+            try:
+                pedaco = os.read(self._mestre, 256)
+            except OSError:
+                return
+            self.bytes_recebidos += len(pedaco)
+            buffer.extend(pedaco)
+            while len(buffer) >= 8:
+                quadro = bytes(buffer[:8])
+                if not modbus_rtu.crc_valido(quadro):
+                    # Fora de sincronia: procura o início do próximo quadro
+                    del buffer[0]
+                    continue
+                del buffer[:8]
+                if self._velocidade_cliente() not in (None, self.baudrate):
+                    # No fio, um quadro em outra velocidade chega como lixo
+                    self.velocidade_errada += 1
+                    continue
+                resposta = self._responder(quadro)
+                if resposta is not None:
+                    self._enviar(resposta)
+
+    def _responder(self, quadro: bytes) -> Optional[bytes]:
+        escravo, funcao, inicio, quantidade = struct.unpack('>BBHH', quadro[:6])
+        simulado = self.escravos.get(escravo)
+        if simulado is None:
+            return None
+        self.requisicoes += 1
+        if self.prob_perda and self.rng.random() < self.prob_perda:
+            self.perdidas += 1
+            return None
+        if funcao == 0x06:
+            return self._configurar(simulado, quadro)
+        if funcao not in (0x03, 0x04):
+            resposta = bytearray([escravo, funcao | 0x80, 0x01])
+        elif not 1 <= quantidade <= 125 or inicio + quantidade > 0x10000:
+            resposta = bytearray([escravo, funcao | 0x80, 0x03])
+        else:
+            valores = simulado.ler(inicio, quantidade)
+            if inicio <= REGISTRADOR_BAUD and inicio + quantidade > REGISTRADOR_ENDERECO:
+                configuracao = {REGISTRADOR_ENDERECO: escravo, REGISTRADOR_BAUD: CODIGOS_BAUD[self.baud_gravado]}
+                for registrador, valor in configuracao.items():
+                    if inicio <= registrador < inicio + quantidade:
+                        valores[registrador - inicio] = valor
+            resposta = bytearray(struct.pack(f'>BBB{quantidade}H', escravo, funcao, 2 * quantidade, *valores))
+        resposta.extend(modbus_rtu.crc16(resposta).to_bytes(2, byteorder='little'))
+        if self.prob_crc and self.rng.random() < self.prob_crc:
+            self.corrompidas += 1
+            resposta[-1] ^= 0xFF
+        return bytes(resposta)
+
+    def _configurar(self, simulado: EscravoSimulado, quadro: bytes) -> Optional[bytes]:
+        # Função 06: responde o eco na configuração atual e só então aplica a nova
+        _, _, registrador, valor = struct.unpack('>BBHH', quadro[:6])
+        if registrador == REGISTRADOR_ENDERECO and 1 <= valor <= 247 and valor not in self.escravos:
+            self._enviar(quadro)
+            del self.escravos[simulado.endereco]
+            simulado.endereco = valor
+            self.escravos[valor] = simulado
+            return None
+        codigos = {c: b for b, c in CODIGOS_BAUD.items()}
+        if registrador == REGISTRADOR_BAUD and valor in codigos:
+            self._enviar(quadro)
+            self.baud_gravado = codigos[valor]
+            if not self.baud_apos_reinicio:
+                self.baudrate = self.baud_gravado
+            return None
+        codigo = 0x03 if registrador in (REGISTRADOR_ENDERECO, REGISTRADOR_BAUD) else 0x02
+        resposta = bytearray([simulado.endereco, 0x86, codigo])
+        resposta.extend(modbus_rtu.crc16(resposta).to_bytes(2, byteorder='little'))
+        return bytes(resposta)
+
+    def reiniciar(self):
+        # Sonda desligada e ligada de novo: passa a usar o baudrate gravado
+        self.baudrate = self.baud_gravado
+
+    def _enviar(self, resposta: bytes):
+        # A requisição já levou o tempo de linha até chegar; a resposta leva o dela
+        espera = self.latencia + self._tempo_linha(8) + self._tempo_linha(len(resposta))
+        if espera > 0:
+            time.sleep(espera)
+        os.write(self._mestre, resposta)
+        self.respostas += 1
+        self.bytes_enviados += len(resposta)
+
+    def definir_valor(self, parametro: str, valor: float, escravo: Optional[int] = None):
+        alvos = [self.escravos[escravo]] if escravo is not None else self.escravos.values()
+        for simulado in alvos:
+            simulado.valores[parametro] = valor
+
+    def estatisticas(self) -> Dict[str, int]:
+        return {
+            'requisicoes': self.requisicoes,
+            'respostas': self.respostas,
+            'perdidas': self.perdidas,
+            'corrompidas': self.corrompidas,
+            'velocidade_errada': self.velocidade_errada,
+            'bytes_recebidos': self.bytes_recebidos,
+            'bytes_enviados': self.bytes_enviados
+        }
+
+    def encerrar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        for fd in (self._mestre, self._escravo_fd):
+            if fd is not None:
+                os.close(fd)
+        self._mestre = self._escravo_fd = None
+
+    def __enter__(self):
+        self.iniciar()
+        return self
+
+    def __exit__(self, *args):
+        self.encerrar()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Simula sensores de solo 7 em 1 num pseudo-terminal")
+    parser.add_argument('--escravos', type=int, nargs='+', default=[1], help="Endereços Modbus simulados")
+    parser.add_argument('--baudrate', type=int, default=4800)
+    parser.add_argument('--latencia', type=float, default=0.02, help="Atraso de processamento em segundos")
+    parser.add_argument('--ruido', type=float, default=0.0, help="Desvio padrão relativo das leituras")
+    parser.add_argument('--crc', type=float, default=0.0, help="Probabilidade de CRC corrompido")
+    parser.add_argument('--perda', type=float, default=0.0, help="Probabilidade de não responder")
+    parser.add_argument('--npk-alternativo', action='store_true', help="N, P e K nos registradores 0x0004-0x0006")
+    parser.add_argument('--semente', type=int, default=None)
+    args = parser.parse_args()
+    simulador = SimuladorSensor(args.escravos, args.baudrate, args.latencia, args.ruido, args.crc, args.perda,
+                                npk_alternativo=args.npk_alternativo, semente=args.semente)
+    print(f"Simulador em {simulador.iniciar()} (Ctrl+C para sair)", flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(simulador.estatisticas())
+        simulador.encerrar()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Telemetria do barramento Modbus do Sensor de Solo 7 em 1
+Contadores por escravo e por registrador (requisições, novas tentativas,
+timeouts, respostas inválidas, quadros de exceção) e histogramas de latência,
+com instantâneo em dict e exportação no formato texto do Prometheus
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+
+import modbus_rtu
+
+try:
+    import minimalmodbus
+except ImportError:
+    minimalmodbus = None
+
+# Limites superiores (s) das faixas do histograma de latência; a última faixa é +Inf
+LIMITES_LATENCIA = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0)
+
+CONTADORES = ('requisicoes', 'sucessos', 'novas_tentativas', 'timeouts', 'respostas_invalidas',
+              'excecoes', 'outros_erros', 'falhas')
+
+_DESCRICOES = {
+    'requisicoes': "Transações enviadas, incluindo novas tentativas",
+    'sucessos': "Transações com resposta válida",
+    'novas_tentativas': "Transações repetidas após uma falha",
+    'timeouts': "Transações sem resposta dentro do prazo",
+    'respostas_invalidas': "Respostas com CRC ou formato inválido",
+    'excecoes': "Quadros de exceção Modbus recebidos",
+    'outros_erros': "Falhas de porta ou erros não classificados",
+    'falhas': "Leituras que esgotaram as tentativas",
+}
+
+
+def classificar_erro(erro: Exception) -> str:
+    if isinstance(erro, modbus_rtu.ErroTimeout):
+        return 'timeouts'
+    if isinstance(erro, modbus_rtu.ExcecaoModbus):
+        return 'excecoes'
+    if isinstance(erro, (modbus_rtu.ErroCRC, modbus_rtu.ErroQuadro)):
+        return 'respostas_invalidas'
+    if minimalmodbus is not None:
+        if isinstance(erro, minimalmodbus.NoResponseError):
+            return 'timeouts'
+        if isinstance(erro, minimalmodbus.SlaveReportedException):
+            return 'excecoes'
+        if isinstance(erro, minimalmodbus.InvalidResponseError):
+            return 'respostas_invalidas'
+    return 'outros_erros'
+
+
+class Histograma:
+    def __init__(self, limites: Iterable[float] = LIMITES_LATENCIA):
+        self.limites = tuple(limites)
+        self.contagens = [0] * (len(self.limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        for i, limite in enumerate(self.limites):
+            if valor <= limite:
+                self.contagens[i] += 1
+                break
+        else:
+            self.contagens[-1] += 1
+        self.soma += valor
+        self.total += 1
+
+    def instantaneo(self) -> Dict:
+        return {
+            'limites': list(self.limites),
+            'contagens': list(self.contagens),
+            'soma': round(self.soma, 6),
+            'total': self.total,
+            'media': round(self.soma / self.total, 6) if self.total else None,
+        }
+
+
+class _Metricas:
+    def __init__(self, limites):
+        self.contadores = dict.fromkeys(CONTADORES, 0)
+        self.espera_novas_tentativas = 0.0
+        self.latencia = Histograma(limites)
+        self.ultimo_erro = None
+
+    def instantaneo(self) -> Dict:
+        return {
+            **self.contadores,
+            'espera_novas_tentativas_s': round(self.espera_novas_tentativas, 3),
+            'latencia': self.latencia.instantaneo(),
+            'ultimo_erro': self.ultimo_erro,
+        }
+
+
+class TelemetriaBarramento:
+    # Compartilhada pelos sensores de um mesmo barramento, como o TemporizadorModbus.
+    # O registrador de uma leitura em bloco é o endereço inicial do bloco
+
+    def __init__(self, limites: Iterable[float] = LIMITES_LATENCIA):
+        self.limites = tuple(limites)
+        self._lock = threading.Lock()
+        self._escravos: Dict[int, _Metricas] = {}
+        self._registradores: Dict[Tuple[int, int], _Metricas] = {}
+        self.inicio = time.time()
+
+    def _metricas(self, escravo: int, registrador: int) -> Tuple[_Metricas, _Metricas]:
+        por_escravo = self._escravos.get(escravo)
+        if por_escravo is None:
+            por_escravo = self._escravos[escravo] = _Metricas(self.limites)
+        por_registrador = self._registradores.get((escravo, registrador))
+        if por_registrador is None:
+            por_registrador = self._registradores[(escravo, registrador)] = _Metricas(self.limites)
+        return por_escravo, por_registrador
+
+    def registrar_sucesso(self, escravo: int, registrador: int, latencia: float, nova_tentativa: bool = False):
+        with self._lock:
+            for metricas in self._metricas(escravo, registrador):
+                metricas.contadores['requisicoes'] += 1
+                metricas.contadores['sucessos'] += 1
+                metricas.contadores['novas_tentativas'] += nova_tentativa
+                metricas.latencia.observar(latencia)
+
+    def registrar_erro(self, escravo: int, registrador: int, erro: Exception, nova_tentativa: bool = False):
+        tipo = classificar_erro(erro)
+        with self._lock:
+            for metricas in self._metricas(escravo, registrador):
+                metricas.contadores['requisicoes'] += 1
+                metricas.contadores[tipo] += 1
+                metricas.contadores['novas_tentativas'] += nova_tentativa
+                metricas.ultimo_erro = str(erro)
+
+    def registrar_espera(self, escravo: int, registrador: int, segundos: float):
+        with self._lock:
+            for metricas in self._metricas(escravo, registrador):
+                metricas.espera_novas_tentativas += segundos
+
+    def registrar_falha(self, escravo: int, registrador: int):
+        with self._lock:
+            for metricas in self._metricas(escravo, registrador):
+                metricas.contadores['falhas'] += 1
+
+    def instantaneo(self) -> Dict:
+        with self._lock:
+            return {
+                'inicio': self.inicio,
+                'instante': time.time(),
+                'escravos': {escravo: m.instantaneo() for escravo, m in sorted(self._escravos.items())},
+                'registradores': {f"{escravo}:0x{registrador:04X}": m.instantaneo()
+                                  for (escravo, registrador), m in sorted(self._registradores.items())},
+            }
+
+    def zerar(self):
+        with self._lock:
+            self._escravos.clear()
+            self._registradores.clear()
+            self.inicio = time.time()
+
+    def prometheus(self, prefixo: str = "sensor_solo_modbus") -> str:
+        # Séries por escravo e registrador; os totais por escravo saem de sum by (escravo)
+        with self._lock:
+            itens = sorted(self._registradores.items())
+            linhas = []
+            for contador in CONTADORES:
+                nome = f"{prefixo}_{contador}_total"
+                linhas.append(f"# HELP {nome} {_DESCRICOES[contador]}")
+                linhas.append(f"# TYPE {nome} counter")
+                for (escravo, registrador), m in itens:
+                    linhas.append(f'{nome}{{escravo="{escravo}",registrador="0x{registrador:04X}"}} '
+                                  f'{m.contadores[contador]}')
+            nome = f"{prefixo}_espera_novas_tentativas_segundos_total"
+            linhas.append(f"# HELP {nome} Tempo parado entre novas tentativas")
+            linhas.append(f"# TYPE {nome} counter")
+            for (escravo, registrador), m in itens:
+                linhas.append(f'{nome}{{escravo="{escravo}",registrador="0x{registrador:04X}"}} '
+                              f'{m.espera_novas_tentativas:.6f}')
+            nome = f"{prefixo}_latencia_segundos"
+            linhas.append(f"# HELP {nome} Tempo entre o envio da requisição e a resposta válida")
+            linhas.append(f"# TYPE {nome} histogram")
+            for (escravo, registrador), m in itens:
+                rotulos = f'escravo="{escravo}",registrador="0x{registrador:04X}"'
+                acumulado = 0
+                for limite, contagem in zip(m.latencia.limites, m.latencia.contagens):
+                    acumulado += contagem
+                    linhas.append(f'{nome}_bucket{{{rotulos},le="{limite}"}} {acumulado}')
+                linhas.append(f'{nome}_bucket{{{rotulos},le="+Inf"}} {m.latencia.total}')
+                linhas.append(f'{nome}_sum{{{rotulos}}} {m.latencia.soma:.6f}')
+                linhas.append(f'{nome}_count{{{rotulos}}} {m.latencia.total}')
+        return '\n'.join(linhas) + '\n'
+
+    def gravar_prometheus(self, caminho: str):
+        # Troca atômica: o coletor (ex.: textfile do node_exporter) nunca lê um arquivo pela metade
+        temporario = f"{caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus())
+        os.replace(temporario, caminho)
+
+
+class ExportadorMetricas(threading.Thread):
+    def __init__(self, telemetria: TelemetriaBarramento, caminho: str, periodo: float = 15.0):
+        super().__init__(name="exportador-metricas", daemon=True)
+        self.telemetria = telemetria
+        self.caminho = caminho
+        self.periodo = periodo
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.periodo):
+            self._gravar()
+        self._gravar()
+
+    def _gravar(self):
+        try:
+            self.telemetria.gravar_prometheus(self.caminho)
+        except OSError as e:
+            print(f"Erro ao gravar métricas em {self.caminho}: {e}")
+
+    def parar(self):
+        self._parar.set()
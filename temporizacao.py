@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Temporização Modbus RTU derivada do baudrate
+Intervalo de silêncio de 3,5 caracteres, prazos de resposta calculados a partir
+do tempo de transmissão e tempo de resposta de cada escravo aprendido em campo
+"""
+
+import threading
+import time
+from typing import Dict
+
+
+class TemporizadorModbus:
+    def __init__(self, baudrate: int = 4800, bits_por_caractere: int = 11,
+                 resposta_inicial: float = 0.3, resposta_minima: float = 0.02,
+                 timeout_maximo: float = 2.0, alfa: float = 0.125, beta: float = 0.25):
+        # 8N1 usa 10 bits por caractere; 11 cobre também paridade e é o valor da norma
+        self.bits_por_caractere = bits_por_caractere
+        self.resposta_inicial = resposta_inicial
+        self.resposta_minima = resposta_minima
+        self.timeout_maximo = timeout_maximo
+        self.alfa = alfa
+        self.beta = beta
+        self._media: Dict[int, float] = {}
+        self._desvio: Dict[int, float] = {}
+        self._ultimo_trafego = 0.0
+        self._lock = threading.Lock()
+        self.baudrate = baudrate
+
+    @property
+    def baudrate(self) -> int:
+        return self._baudrate
+
+    @baudrate.setter
+    def baudrate(self, valor: int):
+        self._baudrate = valor
+        self.tempo_caractere = self.bits_por_caractere / valor
+        # Acima de 19200 bps a norma fixa o silêncio em 1,75 ms
+        self.intervalo_silencio = 3.5 * self.tempo_caractere if valor <= 19200 else 0.00175
+
+    def tempo_transmissao(self, n_bytes: int) -> float:
+        return n_bytes * self.tempo_caractere
+
+    def marcar_trafego(self):
+        self._ultimo_trafego = time.monotonic()
+
+    def silencio_restante(self) -> float:
+        return max(self._ultimo_trafego + self.intervalo_silencio - time.monotonic(), 0.0)
+
+    def aguardar_silencio(self):
+        # Dorme só o que falta do intervalo de 3,5 caracteres desde o último byte no barramento
+        restante = self.silencio_restante()
+        if restante > 0:
+            time.sleep(restante)
+
+    def tempo_resposta(self, escravo: int) -> float:
+        # Estimativa conservadora no estilo do RTO do TCP: média + 4 desvios,
+        # com folga mínima de metade da média para escravos muito regulares
+        with self._lock:
+            media = self._media.get(escravo)
+            if media is None:
+                return self.resposta_inicial * 2
+            return media + max(4 * self._desvio[escravo], media / 2)
+
+    def prazo_resposta(self, escravo: int, bytes_requisicao: int, bytes_resposta: int) -> float:
+        prazo = (self.tempo_transmissao(bytes_requisicao + bytes_resposta)
+                 + max(self.tempo_resposta(escravo), self.resposta_minima))
+        return min(prazo, self.timeout_maximo)
+
+    def registrar_resposta(self, escravo: int, decorrido: float, bytes_requisicao: int, bytes_resposta: int):
+        amostra = max(decorrido - self.tempo_transmissao(bytes_requisicao + bytes_resposta), 0.0)
+        with self._lock:
+            media = self._media.get(escravo)
+            if media is None:
+                self._media[escravo] = amostra
+                self._desvio[escravo] = amostra / 2
+            else:
+                self._desvio[escravo] += self.beta * (abs(amostra - media) - self._desvio[escravo])
+                self._media[escravo] = media + self.alfa * (amostra - media)
+
+    def registrar_timeout(self, escravo: int):
+        # Sem resposta no prazo: dobra a estimativa para não repetir o erro em sequência
+        with self._lock:
+            if escravo in self._media:
+                self._media[escravo] = min(self._media[escravo] * 2 + self.resposta_minima, self.timeout_maximo)
+
+    def atraso_nova_tentativa(self, tentativa: int) -> float:
+        return self.intervalo_silencio + min(0.05 * (2 ** tentativa), 0.5)